@@ -0,0 +1,158 @@
+# arb_scanner.py — scan des cycles d'arbitrage (3 ou 4 jambes) sur le graphe de symboles KuCoin
+# Mode rapport uniquement (aucun ordre). Usage: MODE=arb_scan python main.py | python arb_scanner.py --bench
+import os, math, time, random, argparse
+os.environ.setdefault("MODE", "arb_scan")
+from router import QuoteRouter
+from config import CFG
+try:
+    import numpy as np
+except ImportError:  # repli pur Python, même résultat, plus lent
+    np = None
+
+class CycleIndex:
+    # index pré-calculé: table des arêtes (pair, side) + cycles = tuples d'indices d'arêtes
+    def __init__(self, adj, starts, max_len=3):
+        self.edges = []; eid = {}
+        for cur, nbrs in adj.items():
+            for to, (pair, side) in nbrs.items():
+                eid[(cur, to)] = len(self.edges); self.edges.append((pair, side))
+        self.pairs = sorted({p for p, _ in self.edges})
+        pidx = {p: i for i, p in enumerate(self.pairs)}
+        self.edge_pair = [pidx[p] for p, _ in self.edges]
+        self.edge_sell = [side == "sell" for _, side in self.edges]
+        self.cycles = []; self.paths = []
+        for q in starts:
+            for a in adj.get(q, {}):
+                for b in adj.get(a, {}):
+                    if b == q: continue
+                    if q in adj.get(b, {}):
+                        self._add([q, a, b, q], eid)
+                    if max_len >= 4:
+                        for c in adj.get(b, {}):
+                            if c in (q, a) or q not in adj.get(c, {}): continue
+                            self._add([q, a, b, c, q], eid)
+        if np is not None:
+            self.edge_pair = np.array(self.edge_pair, dtype=np.int32)
+            self.edge_sell = np.array(self.edge_sell, dtype=bool)
+            # longueurs mélangées (3 et 4): jambe fictive → arête "taux 1" en fin de table
+            L = max((len(c) for c in self.cycles), default=3)
+            self.idx = np.full((len(self.cycles), L), len(self.edges), dtype=np.int32)
+            for i, c in enumerate(self.cycles): self.idx[i, :len(c)] = c
+
+    def _add(self, path, eid):
+        self.cycles.append(tuple(eid[(path[i], path[i+1])] for i in range(len(path)-1)))
+        self.paths.append(path)
+
+    def __len__(self):
+        return len(self.cycles)
+
+    def rates(self, tickers, fee):
+        # taux par arête, frais taker déduits (0 si pas de prix)
+        if np is not None:
+            bid = np.array([float((tickers.get(p) or {}).get("bestBid") or 0) for p in self.pairs])
+            ask = np.array([float((tickers.get(p) or {}).get("bestAsk") or 0) for p in self.pairs])
+            b = bid[self.edge_pair]; a = ask[self.edge_pair]
+            inv = np.divide(1.0, a, out=np.zeros_like(a), where=a > 0)
+            r = np.where(self.edge_sell, b, inv)*(1-fee)
+            return np.append(r, 1.0)
+        out = []
+        for p, side in self.edges:
+            t = tickers.get(p)
+            out.append(QuoteRouter.rate(t, side, fee))
+        return out + [1.0]
+
+    def scan(self, tickers, fee, min_edge=0.0):
+        # produit des taux de chaque cycle; retourne [(i, produit)] > 1 + min_edge, du meilleur au pire
+        R = self.rates(tickers, fee)
+        if np is not None:
+            prod = R[self.idx].prod(axis=1)
+            hit = np.nonzero(prod > 1.0 + min_edge)[0]
+            return sorted(((int(i), float(prod[i])) for i in hit), key=lambda x: -x[1])
+        res = []
+        for i, c in enumerate(self.cycles):
+            p = 1.0
+            for e in c: p *= R[e]
+            if p > 1.0 + min_edge: res.append((i, p))
+        return sorted(res, key=lambda x: -x[1])
+
+def depth_limit(ex, idx, i, fee):
+    # taille max (devise de départ) servie par le meilleur niveau de chaque jambe
+    max_in, m = math.inf, 1.0
+    for e in idx.cycles[i]:
+        pair, side = idx.edges[e]
+        t = ex.call("get_ticker", pair)   # ticker REST direct: seul à donner les tailles bid/ask
+        if side == "sell": cap = float(t["bestBidSize"])                          # en base = devise courante
+        else:              cap = float(t["bestAskSize"])*float(t["bestAsk"])      # en quote = devise courante
+        max_in = min(max_in, cap/m)
+        m *= QuoteRouter.rate(t, side, fee)
+    return max_in, m
+
+def run(ex, logger):
+    router = QuoteRouter(); idx = None
+    fee = CFG["TAKER_FEE_PCT"]/100.0
+    while True:
+        try:
+            if router.refresh(ex) or idx is None:
+                t0 = time.time()
+                idx = CycleIndex(router.adj, CFG["QUOTES"], CFG["ARB_MAX_LEN"])
+                logger.info(f"[Arb] index: {len(idx)} cycles, {len(idx.edges)} arêtes ({time.time()-t0:.2f}s)")
+            ex.invalidate("all_tickers")
+            tickers = ex.all_tickers()
+            t0 = time.perf_counter()
+            opps = idx.scan(tickers, fee, CFG["ARB_MIN_EDGE_PCT"]/100.0)
+            dt = (time.perf_counter()-t0)*1000
+            logger.info(f"[Arb] {len(idx)} cycles scannés en {dt:.1f} ms, {len(opps)} opportunités nettes de frais")
+            for i, prod in opps[:CFG["ARB_DEPTH_CHECK"]]:
+                try:
+                    size, prod_now = depth_limit(ex, idx, i, fee)
+                    start = idx.paths[i][0]
+                    logger.info(f"[Arb] {'→'.join(idx.paths[i])} edge={(prod-1)*100:.3f}% "
+                                f"(recheck {(prod_now-1)*100:.3f}%) taille max≈{size:.6g} {start} "
+                                f"gain≈{size*(prod_now-1):.6g} {start}")
+                except Exception as e:
+                    logger.warning(f"[Arb] profondeur {idx.paths[i]}: {e}")
+            time.sleep(CFG["ARB_SCAN_SEC"])
+        except KeyboardInterrupt:
+            logger.info("Arrêt manuel."); break
+        except Exception as e:
+            logger.error(f"[Arb] erreur: {e}"); time.sleep(5)
+
+# ========= Benchmark =========
+def synthetic(n_coins, quotes=("USDT", "BTC", "ETH"), seed=0):
+    rng = random.Random(seed)
+    usd = {"USDT": 1.0, "BTC": 60000.0, "ETH": 3000.0}
+    adj, tickers = {}, {}
+    def add(base, quote, px):
+        sym = f"{base}-{quote}"
+        adj.setdefault(base, {})[quote] = (sym, "sell"); adj.setdefault(quote, {})[base] = (sym, "buy")
+        tickers[sym] = {"bestBid": px*(1-0.0005*rng.random()), "bestAsk": px*(1+0.0005*rng.random())}
+    add("BTC", "USDT", 60000.0); add("ETH", "USDT", 3000.0); add("ETH", "BTC", 0.05)
+    for k in range(n_coins):
+        p = 10**rng.uniform(-3, 3); c = f"C{k}"
+        for q in quotes:
+            if q == "USDT" or rng.random() < 0.4:
+                add(c, q, p/usd[q]*(1+rng.gauss(0, 0.001)))
+    return adj, tickers
+
+def benchmark(sizes=(100, 300, 900, 2000), max_len=3, repeat=20):
+    rows = []
+    for n in sizes:
+        adj, tickers = synthetic(n)
+        t0 = time.perf_counter(); idx = CycleIndex(adj, ("USDT", "BTC", "ETH"), max_len); t_idx = time.perf_counter()-t0
+        t0 = time.perf_counter()
+        for _ in range(repeat): idx.scan(tickers, 0.001)
+        t_scan = (time.perf_counter()-t0)/repeat
+        rows.append({"pairs": len(tickers), "cycles": len(idx), "index_ms": t_idx*1000, "scan_ms": t_scan*1000,
+                     "cycles_per_sec": len(idx)/t_scan if t_scan > 0 else 0})
+    return rows
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark du scanner d'arbitrage")
+    ap.add_argument("--bench", action="store_true")
+    ap.add_argument("--sizes", default="100,300,900,2000")
+    ap.add_argument("--max-len", type=int, default=3)
+    a = ap.parse_args()
+    print(f"backend: {'numpy' if np is not None else 'python'}")
+    for r in benchmark([int(x) for x in a.sizes.split(",")], a.max_len):
+        print(f"{r['pairs']:>6} paires {r['cycles']:>9} cycles | index {r['index_ms']:8.1f} ms | "
+              f"scan {r['scan_ms']:8.2f} ms | {r['cycles_per_sec']/1e6:6.2f} M cycles/s")
@@ -0,0 +1,329 @@
+# backtest.py — rejoue des bougies historiques dans run_cycle via un Ku simulé
+# Usage: python backtest.py data/ --cash USDT=1000 --fee 0.1 --spread 0.02 --slippage 0.05 --set REGIME_ADX_MIN=20
+import os, csv, json, math, time, argparse, logging
+os.environ.setdefault("MODE", "backtest")
+from collections import defaultdict
+from config import CFG
+from indicators import IndicatorState
+import indicators_np
+import strategy
+from candle_store import INTERVAL_SEC, resample
+
+# ========= Chargement des bougies =========
+# Format interne = format KuCoin: [time, open, close, high, low, volume, turnover] (floats), oldest->newest
+def _row(t, o, h, l, c, v):
+    return (float(t), float(o), float(c), float(h), float(l), float(v), 0.0)
+
+def load_csv(path, symbol=None):
+    out = defaultdict(list)
+    with open(path, newline="") as f:
+        for r in csv.DictReader(f):
+            out[r.get("symbol") or symbol].append(_row(r["time"], r["open"], r["high"], r["low"], r["close"], r.get("volume", 0)))
+    return out
+
+def load_npz(path):
+    # une entrée par symbole: tableau (n, 6) [t, o, h, l, c, v] (même disposition qu'indicators_np)
+    import numpy as np
+    with np.load(path) as z:
+        return {sym: [_row(*r) for r in z[sym].tolist()] for sym in z.files}
+
+def load_parquet(path):
+    import pandas as pd   # optionnel
+    df = pd.read_parquet(path)
+    out = defaultdict(list)
+    for r in df.itertuples(index=False):
+        out[r.symbol].append(_row(r.time, r.open, r.high, r.low, r.close, r.volume))
+    return out
+
+def load_store(path, ktype="15min"):
+    from candle_store import CandleStore
+    st = CandleStore(path)
+    return {sym: [tuple(float(x) for x in r) for r in st.read(sym, ktype)] for sym in st.symbols(ktype)}
+
+def load_candles(path, ktype="15min"):
+    # fichier .csv/.npz/.parquet, store SQLite (.sqlite/.db), ou dossier de <SYMBOL>[_<interval>].csv
+    if path.endswith((".sqlite", ".db")): return load_store(path, ktype)
+    if os.path.isdir(path):
+        data = {}
+        for fn in sorted(os.listdir(path)):
+            if fn.endswith(".csv"):
+                data.update(load_csv(os.path.join(path, fn), fn[:-4].split("_")[0]))
+            elif fn.endswith((".npz", ".parquet")):
+                data.update(load_candles(os.path.join(path, fn)))
+    elif path.endswith(".npz"): data = load_npz(path)
+    elif path.endswith(".parquet"): data = load_parquet(path)
+    else: data = load_csv(path, os.path.basename(path)[:-4].split("_")[0])
+    return {s: sorted(rows) for s, rows in data.items() if s and rows}
+
+# ========= Indicateurs pré-calculés =========
+class TapeState:
+    # indicateurs enregistrés barre par barre: mêmes lectures qu'IndicatorState, update() = simple déplacement.
+    # window=N: valeurs recalculées sur les N dernières barres (comme run_cycle en live); None: état continu (INDICATOR_STREAM).
+    # Ne dépend que des bougies et des périodes des features → réutilisable entre combinaisons de paramètres.
+    def __init__(self, rows, ema_periods, window=None, **periods):
+        st = IndicatorState(ema_periods, **periods)
+        self.periods = {p: i for i, p in enumerate(st.ema_periods)}
+        self.rsi_i = {p: i for i, p in enumerate(st.rsi_ps)}; self.hl_i = {p: i for i, p in enumerate(st.hl_ps)}
+        self.rsi_p, self.hl_p = st.rsi_p, st.hl_p
+        self.pos = {r[0]: i for i, r in enumerate(rows)}; self.rec = []; self.cur = None
+        windowed = bool(window) and len(rows) >= window
+        for r in rows[:window-1] if windowed else rows:
+            st.update((r,))   # tant que i < window, la fenêtre = tout l'historique → mêmes valeurs
+            self.rec.append(self._read(st, st))
+        if not windowed: return
+        if indicators_np.available():
+            for res in indicators_np.windows(indicators_np.parse_klines(rows), window, ema_periods=st.ema_periods,
+                                             rsi_period=st.rsi_p, rsi_periods=st.rsi_ps, hl_period=st.hl_p, hl_periods=st.hl_ps):
+                self.rec.extend(self._columns(res, st))
+        else:   # repli pur Python: un IndicatorState par fenêtre
+            for i in range(window-1, len(rows)):
+                self.rec.append(self._read(IndicatorState(ema_periods, **periods).update(rows[i-window+1:i+1]), st))
+
+    @staticmethod
+    def _read(v, st):
+        return (v.n, v.close, tuple((v.ema(p, True), v.ema(p)) for p in st.ema_periods),
+                tuple(v.rsi_at(p) for p in st.rsi_ps), v.adx, v.atr_pct,
+                tuple(v.hh_at(p) for p in st.hl_ps), tuple(v.ll_at(p) for p in st.hl_ps))
+
+    @staticmethod
+    def _columns(res, st):
+        # même enregistrement que _read, colonne par colonne depuis un bloc indicators_np.compute (pas d'objet par barre)
+        col = lambda a: a.tolist()
+        nan = lambda a: [None if v != v else v for v in a.tolist()]
+        ema = list(zip(*(zip(col(res["ema"][p][:, 0]), col(res["ema"][p][:, 1])) for p in st.ema_periods)))
+        rsi = list(zip(*(nan(res["rsi"][p]) for p in st.rsi_ps)))
+        hh = list(zip(*(col(res["hh"][p]) for p in st.hl_ps))); ll = list(zip(*(col(res["ll"][p]) for p in st.hl_ps)))
+        return zip([res["bars"]]*len(ema), col(res["close"]), ema, rsi, col(res["adx"]), col(res["atr_pct"]), hh, ll)
+
+    def update(self, kl):
+        if kl: self.cur = self.rec[self.pos[kl[-1][0]]]
+        return self
+
+    @property
+    def n(self): return self.cur[0] if self.cur else 0
+    @property
+    def close(self): return self.cur[1]
+    def ema(self, period, prev=False): return self.cur[2][self.periods[period]][0 if prev else 1]
+    @property
+    def rsi(self): return self.cur[3][self.rsi_i[self.rsi_p]]
+    def rsi_at(self, period): return self.cur[3][self.rsi_i[period]]
+    @property
+    def adx(self): return self.cur[4]
+    @property
+    def atr_pct(self): return self.cur[5]
+    @property
+    def hh(self): return self.cur[6][self.hl_i[self.hl_p]]
+    @property
+    def ll(self): return self.cur[7][self.hl_i[self.hl_p]]
+    def hh_at(self, period): return self.cur[6][self.hl_i[period]]
+    def ll_at(self, period): return self.cur[7][self.hl_i[period]]
+
+def make_tapes(candles, reg_ema=None, strat=None):
+    # mêmes indicateurs que run_cycle en live: fenêtre de main.WINDOW barres, ou état continu si INDICATOR_STREAM
+    import main
+    spec = strategy.state_spec(reg_ema or int(CFG.get("REGIME_EMA_PERIOD", 200)), strat)
+    window = None if CFG["INDICATOR_STREAM"] else main.WINDOW
+    return {s: TapeState(rows, window=window, **spec) for s, rows in candles.items()}
+
+# ========= Ku simulé =========
+class SimKu:
+    def __init__(self, candles, cash, fee_pct=0.1, spread_pct=0.02, slippage_pct=0.05):
+        self.candles = candles
+        self.bal = defaultdict(float, cash)
+        self.fee = fee_pct/100.0; self.half_spread = spread_pct/200.0; self.slip = slippage_pct/100.0
+        self.feed = None
+        self.now = 0.0
+        self.idx = {s: -1 for s in candles}     # dernière barre visible
+        self.vol = {s: 0.0 for s in candles}    # volume quote des 96 dernières barres visibles (somme glissante)
+        self._tick = None                       # all_tickers de la barre courante
+        self.sent = {s: -1 for s in candles}    # dernière barre déjà livrée par prefetch/klines
+        self.trades = []; self.equity = []; self.fees_paid = 0.0; self.orders = {}
+        self._smap = {}
+        for s in candles:
+            base, quote = s.split("-")
+            self._smap[s] = {"symbol": s, "baseCurrency": base, "quoteCurrency": quote,
+                             "baseIncrement": "0.00000001", "priceIncrement": "0.00000001", "minFunds": "0.1"}
+
+    def timeline(self):
+        return sorted({r[0] for rows in self.candles.values() for r in rows})
+
+    def step(self, ts):
+        self.now = ts; self._tick = None
+        for s, rows in self.candles.items():
+            j = self.idx[s]
+            while j+1 < len(rows) and rows[j+1][0] <= ts:
+                j += 1; r = rows[j]; self.vol[s] += r[5]*r[2]
+                if j >= 96: r = rows[j-96]; self.vol[s] -= r[5]*r[2]
+            self.idx[s] = j
+
+    # ========= Surface Ku =========
+    def time_ok(self): return 0
+    def new_cycle(self): pass
+    def invalidate(self, endpoint=None, key=None): pass
+    def cache_stats(self): return {}
+
+    def accounts(self):
+        return {"trade": [{"currency": c, "balance": str(b), "type": "trade"} for c, b in self.bal.items()]}
+
+    def balance(self, typ, currency):
+        return self.bal[currency] if typ == "trade" else 0.0
+
+    def symbols_map(self):
+        return {s: m for s, m in self._smap.items() if self.idx[s] >= 0}
+
+    def _close(self, symbol):
+        j = self.idx.get(symbol, -1)
+        if j < 0: raise Exception(f"400-{symbol} pas de données à {self.now}")
+        return self.candles[symbol][j][2]
+
+    def ticker(self, symbol):
+        c = self._close(symbol)
+        return {"price": c, "bestBid": c*(1-self.half_spread), "bestAsk": c*(1+self.half_spread)}
+
+    def all_tickers(self):
+        # volValue ≈ volume quote des 96 dernières barres (24h en 15min), pour le screener; une fois par barre
+        if self._tick is None:
+            self._tick = {s: dict(self.ticker(s), volValue=self.vol[s]) for s, j in self.idx.items() if j >= 0}
+        return self._tick
+
+    def klines(self, symbol, ktype="15min", limit=150):
+        if ktype != "15min": return self.htf_klines(symbol, ktype, limit)
+        # INDICATOR_STREAM: seulement les barres pas encore livrées (+ la dernière livrée), IndicatorState ignore ce
+        # qu'il a déjà ingéré; sinon la fenêtre complète, comme Ku en live
+        j = self.idx[symbol]; k = self.sent[symbol] if CFG["INDICATOR_STREAM"] else 0
+        self.sent[symbol] = j
+        return list(self.candles[symbol][max(0, k, j-limit+1):j+1])
+
+    def htf_klines(self, symbol, ktype, limit):
+        # intervalle supérieur agrégé depuis les barres visibles (même agrégation que Ku en live)
+        j = self.idx[symbol]; r = INTERVAL_SEC[ktype]//INTERVAL_SEC["15min"]
+        return resample(self.candles[symbol][max(0, j-(limit+1)*r+1):j+1], INTERVAL_SEC[ktype])[-limit:]
+
+    def prefetch(self, symbols, ktype="15min", limit=150):
+        return {s: {"kl": self.klines(s, ktype, limit), "ticker": self.ticker(s)} for s in symbols if self.idx.get(s, -1) >= 0}
+
+    def snap_qty(self, qty, step):
+        return math.floor(qty / step) * step
+
+    def sleep(self, sec): pass   # barre figée pendant l'exécution: TWAP/polling sans attente réelle
+
+    def place_order(self, symbol, side, size=None, price=None, type_="limit", client_oid=None, post_only=False):
+        # ordres traités comme market au prix de clôture ± demi-spread ± slippage, exécutés en entier
+        base, quote = symbol.split("-")
+        t = self.ticker(symbol); size = float(size)
+        if side == "buy":
+            px = t["bestAsk"]*(1+self.slip); cost = size*px; fee = cost*self.fee
+            if cost+fee > self.bal[quote]+1e-12:
+                raise Exception(f"200-insufficient {quote}: {cost+fee} > {self.bal[quote]}")
+            self.bal[quote] -= cost+fee; self.bal[base] += size
+        else:
+            size = min(size, self.bal[base])
+            px = t["bestBid"]*(1-self.slip); gross = size*px; fee = gross*self.fee
+            self.bal[base] -= size; self.bal[quote] += gross-fee
+        self.fees_paid += fee
+        self.trades.append({"ts": self.now, "symbol": symbol, "side": side, "price": px, "size": size, "fee": fee})
+        oid = f"SIM{len(self.trades)}"
+        self.orders[oid] = {"id": oid, "dealSize": size, "dealFunds": size*px, "fee": fee, "isActive": False}
+        return {"orderId": oid}
+
+    def order_details(self, order_id): return self.orders[order_id]
+
+    def cancel_order(self, order_id): return True
+
+    # ========= Résultats =========
+    def mark(self, ccy):
+        eq = 0.0
+        for c, b in self.bal.items():
+            if b == 0: continue
+            if c == ccy: eq += b
+            elif f"{c}-{ccy}" in self.idx and self.idx[f"{c}-{ccy}"] >= 0: eq += b*self._close(f"{c}-{ccy}")
+        self.equity.append((self.now, eq))
+        return eq
+
+def metrics(ex, bar_sec):
+    eq = [e for _, e in ex.equity]
+    if len(eq) < 2: return {}
+    rets = [eq[i]/eq[i-1]-1 for i in range(1, len(eq)) if eq[i-1] > 0]
+    mean = sum(rets)/len(rets); var = sum((r-mean)**2 for r in rets)/max(1, len(rets)-1)
+    peak, mdd = eq[0], 0.0
+    for e in eq:
+        peak = max(peak, e); mdd = max(mdd, (peak-e)/peak if peak > 0 else 0.0)
+    # PnL par aller-retour (achat puis vente du même symbole)
+    open_cost, wins, rounds = {}, 0, 0
+    for t in ex.trades:
+        if t["side"] == "buy": open_cost[t["symbol"]] = t["price"]*t["size"]+t["fee"]
+        elif t["symbol"] in open_cost:
+            rounds += 1; wins += (t["price"]*t["size"]-t["fee"]) > open_cost.pop(t["symbol"])
+    return {"start_equity": eq[0], "end_equity": eq[-1], "return_pct": (eq[-1]/eq[0]-1)*100 if eq[0] else 0.0,
+            "max_drawdown_pct": mdd*100,
+            "sharpe": (mean/math.sqrt(var))*math.sqrt(365*86400/bar_sec) if var > 0 else 0.0,
+            "trades": len(ex.trades), "round_trips": rounds, "win_rate_pct": (wins/rounds*100) if rounds else 0.0,
+            "fees_paid": ex.fees_paid, "bars": len(eq)}
+
+# ========= Moteur =========
+def run(candles, cash, fee_pct=0.1, spread_pct=0.02, slippage_pct=0.05, overrides=None, tapes=None):
+    import main
+    missing = object()
+    saved = {k: CFG.get(k, missing) for k in list(overrides or {}) + ["TELEGRAM_TOKEN"]}
+    CFG.update(overrides or {}); CFG["TELEGRAM_TOKEN"] = None   # pas d'alertes en backtest
+    lvl = main.logger.level; main.logger.setLevel(logging.WARNING)
+    # état du bot remis à zéro: runs successifs dans un même process (workers de l'optimizer) indépendants
+    for d in (main.positions, main.cooldown, main.ind_states, main.exits.levels, main.exits.claimed,
+              main.active_set, main.router.memo): d.clear()
+    main.executor.stats.update(orders=0, maker=0, taker=0, fees=0.0)
+    ex = SimKu(candles, cash, fee_pct, spread_pct, slippage_pct)
+    ccy = next(iter(cash))
+    tl = ex.timeline(); t0 = time.time()
+    try:
+        strategy.check()
+        if tapes is None: tapes = make_tapes(candles)
+        main.ind_states.update(tapes)   # {symbol: TapeState} → pas de recalcul d'indicateurs
+        for ts in tl:
+            ex.step(ts)
+            main.run_cycle(ex, now=ts)
+            ex.mark(ccy)
+    finally:
+        main.logger.setLevel(lvl)
+        for k, v in saved.items():
+            if v is missing: CFG.pop(k, None)
+            else: CFG[k] = v
+    bar_sec = (tl[1]-tl[0]) if len(tl) > 1 else 900
+    m = metrics(ex, bar_sec); m["elapsed_sec"] = time.time()-t0
+    return ex, m
+
+def _kv(items, cast=float):
+    out = {}
+    for it in items or []:
+        k, v = it.split("=", 1)
+        out[k] = cast(v) if cast else v
+    return out
+
+def _auto(v):
+    for cast in (int, float):
+        try: return cast(v)
+        except ValueError: pass
+    return {"true": True, "false": False}.get(v.lower(), v)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Backtest MarloTrader sur bougies historiques")
+    ap.add_argument("data", help="fichier .csv/.npz/.parquet ou dossier de CSV")
+    ap.add_argument("--cash", nargs="*", default=["USDT=1000"])
+    ap.add_argument("--fee", type=float, default=0.1, help="frais taker %%")
+    ap.add_argument("--spread", type=float, default=0.02, help="spread bid/ask %%")
+    ap.add_argument("--slippage", type=float, default=0.05, help="slippage %%")
+    ap.add_argument("--set", nargs="*", default=[], help="surcharges CFG, ex: REGIME_ADX_MIN=20")
+    ap.add_argument("--trades", help="CSV des trades")
+    ap.add_argument("--equity", help="CSV de la courbe d'equity")
+    a = ap.parse_args()
+    candles = load_candles(a.data)
+    over = {k: _auto(v) for k, v in _kv(a.set, None).items()}
+    over.setdefault("SYMBOLS", sorted(candles))
+    over.setdefault("QUOTES", sorted({s.split("-")[1] for s in candles}))
+    ex, m = run(candles, _kv(a.cash), a.fee, a.spread, a.slippage, over)
+    if a.trades:
+        with open(a.trades, "w", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=["ts", "symbol", "side", "price", "size", "fee"]); w.writeheader(); w.writerows(ex.trades)
+    if a.equity:
+        with open(a.equity, "w", newline="") as f:
+            w = csv.writer(f); w.writerow(["ts", "equity"]); w.writerows(ex.equity)
+    print(json.dumps(m, indent=2))
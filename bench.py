@@ -0,0 +1,180 @@
+# bench.py — benchmarks reproductibles: indicateurs, ensemble, routage, cycle complet sur un Ku factice déterministe
+# Usage: python bench.py run --out bench.json [--quick] [--only ema,run_cycle]
+#        python bench.py compare base.json bench.json [--threshold 10]   (code retour 1 si régression)
+import os, sys, json, time, random, logging, platform, argparse, subprocess
+os.environ.setdefault("MODE", "backtest")
+from config import CFG
+from indicators import ema, rsi, adx, atr_pct
+import main
+import arb_scanner
+from paper import candle
+
+BARS = (240, 5000, 100000)
+SYMBOLS = (2, 50, 500)
+
+# ========= Données déterministes =========
+def klines(seed, n, end=None):
+    end = n if end is None else end
+    return [candle(seed, i) for i in range(end-n, end)]
+
+class FakeKu:
+    # surface Ku utilisée par run_cycle; fenêtre glissante de main.WINDOW bougies par symbole (ce que run_cycle lit
+    # quelle que soit la profondeur d'historique), ordres remplis au ticker
+    def __init__(self, n_symbols, window=None):
+        window = window or main.WINDOW
+        self.syms = [f"C{k}-USDT" for k in range(n_symbols)]
+        self.seed = {s: k for k, s in enumerate(self.syms)}
+        self.i = window; self.window = window
+        self.rows = {s: klines(self.seed[s], window) for s in self.syms}
+        self.bal = {"USDT": 10000.0}; self.orders = {}; self.feed = None
+        self._smap = {s: {"symbol": s, "baseCurrency": s.split("-")[0], "quoteCurrency": "USDT", "baseIncrement": "0.0001",
+                          "priceIncrement": "0.0001", "minFunds": "0.1", "baseMinSize": "0.0001"} for s in self.syms}
+
+    def advance(self):
+        for s in self.syms:
+            r = self.rows[s]; r.append(candle(self.seed[s], self.i)); del r[0]
+        self.i += 1
+
+    def new_cycle(self): pass
+    def invalidate(self, endpoint=None, key=None): pass
+    def cache_stats(self): return {}
+    def symbols_map(self): return self._smap
+    def balance(self, typ, ccy): return self.bal.get(ccy, 0.0) if typ == "trade" else 0.0
+    def ticker(self, s):
+        c = float(self.rows[s][-1][2]); return {"price": c, "bestBid": c*0.9999, "bestAsk": c*1.0001}
+    def all_tickers(self): return {s: dict(self.ticker(s), volValue=1e7) for s in self.syms}
+    def klines(self, s, ktype="15min", limit=150): return self.rows[s][-limit:]
+    def prefetch(self, symbols, ktype="15min", limit=150):
+        return {s: {"kl": self.klines(s, ktype, limit), "ticker": self.ticker(s)} for s in symbols}
+    def place_order(self, symbol, side, size=None, price=None, type_="limit", client_oid=None, post_only=False):
+        base = symbol.split("-")[0]; px = self.ticker(symbol)["price"]; size = float(size)
+        sgn = 1 if side == "buy" else -1
+        self.bal[base] = self.bal.get(base, 0.0) + sgn*size; self.bal["USDT"] -= sgn*size*px
+        oid = f"F{len(self.orders)}"
+        self.orders[oid] = {"dealSize": size, "dealFunds": size*px, "fee": 0.0, "isActive": False}
+        return {"orderId": oid}
+    def order_details(self, oid): return self.orders[oid]
+    def cancel_order(self, oid): return True
+
+class GraphEx:
+    # graphe synthétique de devises (mêmes données que le bench du scanner d'arbitrage)
+    def __init__(self, n_coins):
+        _, self.tickers = arb_scanner.synthetic(n_coins)
+        self._smap = {s: {"symbol": s} for s in self.tickers}
+    def symbols_map(self): return self._smap
+    def all_tickers(self): return self.tickers
+
+# ========= Mesure =========
+def measure(fn, min_time=0.3, max_runs=50, setup=None):
+    # répète jusqu'à min_time (au moins 3 fois); setup() hors chrono avant chaque run
+    times = []
+    while len(times) < 3 or (sum(times) < min_time and len(times) < max_runs):
+        arg = setup() if setup else None
+        t0 = time.perf_counter(); fn(arg) if setup else fn(); times.append(time.perf_counter()-t0)
+    times.sort()
+    return {"median_ms": times[len(times)//2]*1000, "min_ms": times[0]*1000, "runs": len(times)}
+
+def reset_bot():
+    for d in (main.positions, main.cooldown, main.ind_states, main.exits.levels): d.clear()
+    main.router.memo.clear()
+
+def cases(quick=False):
+    bars = BARS[:2] if quick else BARS
+    syms = SYMBOLS[:2] if quick else SYMBOLS
+    for n in bars:
+        kl = klines(1, n); closes = [float(r[2]) for r in kl]
+        yield f"ema/bars={n}", lambda c=closes: ema(c, 50)
+        yield f"rsi/bars={n}", lambda c=closes: rsi(c, 14)
+        yield f"adx/bars={n}", lambda k=kl: adx(k, 14)
+        yield f"atr_pct/bars={n}", lambda k=kl: atr_pct(k, 14)
+        # ensemble à froid (état reconstruit depuis kl) et à chaud (IndicatorState déjà à jour: lecture O(1))
+        yield f"signals_ensemble_cold/bars={n}", lambda k=kl: main.signals_ensemble(None, "X", k)
+        ind = main.IndicatorState(**main.strategy.state_spec()).update(kl)
+        yield f"signals_ensemble_warm/bars={n}", lambda k=kl, i=ind: main.signals_ensemble(None, "X", k, i)
+    for coins in ((100, 900) if quick else (100, 900, 2000)):
+        gx = GraphEx(coins)
+        def cold(g=gx):
+            main.router.memo.clear(); main.find_quote_path(g, "ETH", "USDT", 3, 50.0)
+        yield f"find_quote_path_cold/coins={coins}", cold
+        yield f"find_quote_path_warm/coins={coins}", lambda g=gx: main.find_quote_path(g, "ETH", "USDT", 3, 50.0)
+    # run_cycle lit toujours main.WINDOW bougies par symbole: seul le nombre de symboles varie
+    for ns in syms:
+        def first(ex):
+            main.run_cycle(ex, now=ex.i*900.0)
+        def fresh(ns=ns):
+            reset_bot(); return FakeKu(ns)
+        yield f"run_cycle_cold/symbols={ns}", (first, fresh)
+        # régime permanent: état chaud, une nouvelle bougie par cycle
+        warm = {}
+        def steady(ex, w=warm):
+            main.run_cycle(ex, now=ex.i*900.0)
+        def next_bar(ns=ns, w=warm):
+            if w.get("ex") is None:
+                reset_bot(); w["ex"] = FakeKu(ns); main.run_cycle(w["ex"], now=w["ex"].i*900.0)
+            w["ex"].advance(); return w["ex"]
+        yield f"run_cycle_warm/symbols={ns}", (steady, next_bar)
+
+def run_all(quick=False, only=None):
+    saved = {k: CFG.get(k) for k in ("TELEGRAM_TOKEN", "EXEC_STYLE", "SCREENER", "QUOTES", "SYMBOLS", "DRY_RUN", "ENSEMBLE_THRESHOLD")}
+    lvl = main.logger.level; main.logger.setLevel(logging.WARNING)
+    # seuil 1: des achats/ventes ont lieu → sizing, ordres et TP/SL font partie du cycle mesuré
+    CFG.update(TELEGRAM_TOKEN=None, EXEC_STYLE="market", SCREENER=False, QUOTES=["USDT"], DRY_RUN=False, ENSEMBLE_THRESHOLD=1)
+    random.seed(0)
+    res = {}
+    try:
+        for name, case in cases(quick):
+            if only and not any(name.startswith(o) for o in only): continue
+            if isinstance(case, tuple):
+                fn, setup = case
+                if name.startswith("run_cycle"):
+                    CFG["SYMBOLS"] = [f"C{k}-USDT" for k in range(int(name.split("symbols=")[1]))]
+                r = measure(fn, setup=setup, max_runs=10 if "cold" in name else 50)
+            else:
+                r = measure(case)
+            res[name] = r
+            print(f"{name:<45} {r['median_ms']:10.3f} ms (min {r['min_ms']:.3f}, {r['runs']} runs)", flush=True)
+    finally:
+        CFG.update(saved); main.logger.setLevel(lvl); reset_bot()
+    return res
+
+def meta():
+    try: rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip()
+    except Exception: rev = ""
+    return {"ts": time.time(), "git": rev, "python": platform.python_version(), "machine": platform.machine(),
+            "processor": platform.processor(), "cpus": os.cpu_count()}
+
+# ========= Comparaison =========
+def compare(base, new, threshold=10.0, stat="min_ms"):
+    # régression = plus lent de plus de threshold % (min par défaut: le moins sensible au bruit de la machine)
+    b, n = base["results"], new["results"]; bad = []
+    print(f"{'cas':<45} {'base ms':>10} {'new ms':>10} {'écart':>8}   ({stat})")
+    for name in sorted(set(b) & set(n)):
+        d = (n[name][stat]/b[name][stat] - 1)*100 if b[name][stat] > 0 else 0.0
+        flag = "  REGRESSION" if d > threshold else ("  mieux" if d < -threshold else "")
+        if d > threshold: bad.append(name)
+        print(f"{name:<45} {b[name][stat]:10.3f} {n[name][stat]:10.3f} {d:+7.1f}%{flag}")
+    for name in sorted(set(b) ^ set(n)):
+        print(f"{name:<45} (présent d'un seul côté)")
+    return bad
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmarks MarloTrader")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run")
+    r.add_argument("--out", default="bench.json")
+    r.add_argument("--quick", action="store_true", help="sans les cas 100k barres / 500 symboles")
+    r.add_argument("--only", help="préfixes de cas séparés par des virgules, ex: ema,run_cycle")
+    c = sub.add_parser("compare")
+    c.add_argument("base"); c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=10.0, help="%% de ralentissement toléré")
+    c.add_argument("--stat", choices=("min_ms", "median_ms"), default="min_ms")
+    a = ap.parse_args()
+    if a.cmd == "run":
+        res = run_all(a.quick, a.only.split(",") if a.only else None)
+        with open(a.out, "w") as f: json.dump({"meta": meta(), "results": res}, f, indent=1)
+        print(f"→ {a.out}")
+    else:
+        with open(a.base) as f: base = json.load(f)
+        with open(a.new) as f: new = json.load(f)
+        bad = compare(base, new, a.threshold, a.stat)
+        if bad: print(f"{len(bad)} régression(s) > {a.threshold}%"); sys.exit(1)
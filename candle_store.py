@@ -0,0 +1,143 @@
+# candle_store.py — cache local persistant des bougies (SQLite), par symbole et intervalle
+import os, time, sqlite3, threading
+
+INTERVAL_SEC = {
+    "1min": 60, "3min": 180, "5min": 300, "15min": 900, "30min": 1800,
+    "1hour": 3600, "2hour": 7200, "4hour": 14400, "6hour": 21600, "8hour": 28800,
+    "12hour": 43200, "1day": 86400, "1week": 604800,
+}
+
+# ========= Agrégation multi-intervalles =========
+WEEK_OFFSET = 4*86400   # bougies 1week KuCoin alignées sur le lundi 00:00 UTC (epoch = jeudi)
+
+def bucket_start(ts, step):
+    off = WEEK_OFFSET if step == INTERVAL_SEC["1week"] else 0
+    return (int(ts) - off)//step*step + off
+
+def resample(rows, step, drop_head=True):
+    # lignes de base (oldest->newest) → barres de step s; la dernière peut être partielle (barre en cours, comme KuCoin);
+    # drop_head: la première barre est écartée si la fenêtre commence après son début (open/volume faux)
+    out = []; cur = None
+    for r in rows:
+        b = bucket_start(r[0], step)
+        if cur is None or b != cur:
+            cur = b; h, l = float(r[3]), float(r[4])
+            out.append([type(r[0])(b), r[1], r[2], r[3], r[4], float(r[5]), float(r[6])])
+        else:
+            o = out[-1]; o[2] = r[2]; o[5] += float(r[5]); o[6] += float(r[6])
+            if float(r[3]) > h: h = float(r[3]); o[3] = r[3]
+            if float(r[4]) < l: l = float(r[4]); o[4] = r[4]
+    if drop_head and rows and out and int(rows[0][0]) > bucket_start(rows[0][0], step): del out[0]
+    if rows and isinstance(rows[0][5], str):
+        for o in out: o[5] = str(o[5]); o[6] = str(o[6])
+    return out
+
+class Aggregator:
+    # barres d'intervalles supérieurs tenues par symbole depuis les bougies de base:
+    # chaque ingestion ne recalcule que la barre en cours (et celles qui ont commencé depuis)
+    def __init__(self, base="15min", keep=1500):
+        self.base = base; self.bstep = INTERVAL_SEC[base]; self.keep = keep
+        self.bars = {}   # symbol -> {ktype: [lignes, ts de mise à jour, source épuisée à l'amorçage]}
+
+    def supports(self, ktype):
+        return ktype != self.base and ktype in INTERVAL_SEC and INTERVAL_SEC[ktype] % self.bstep == 0
+
+    def ratio(self, ktype):
+        return INTERVAL_SEC[ktype]//self.bstep
+
+    def seed(self, symbol, ktype, rows, exhausted=False, native=False, now=None):
+        # native: lignes déjà à l'intervalle ktype (REST), sinon bougies de base à agréger;
+        # exhausted: la requête a atteint le début de la source (historique court mais complet → pas de réamorçage)
+        bars = list(rows) if native else resample(rows, INTERVAL_SEC[ktype])
+        self.bars.setdefault(symbol, {})[ktype] = [bars[-self.keep:], now or time.time(), exhausted]
+
+    def ingest(self, symbol, rows, now=None):
+        for ktype, st in self.bars.get(symbol, {}).items():
+            bars = st[0]
+            if not bars or not rows: continue
+            b0 = int(bars[-1][0]); i = len(rows)
+            while i > 0 and int(rows[i-1][0]) >= b0: i -= 1
+            if i == len(rows) or (i == 0 and int(rows[0][0]) > b0): continue   # rien de neuf / fenêtre trop courte
+            bars[-1:] = resample(rows[i:], INTERVAL_SEC[ktype], drop_head=False)
+            del bars[:-self.keep]; st[1] = now or time.time()
+
+    def fresh(self, symbol, ktype, limit, now=None):
+        # à jour depuis moins d'une bougie de base, et assez d'historique (ou la source n'en avait pas plus)
+        st = self.bars.get(symbol, {}).get(ktype)
+        return bool(st and (now or time.time()) - st[1] < self.bstep and (len(st[0]) >= limit or st[2]))
+
+    def get(self, symbol, ktype, limit):
+        return self.bars[symbol][ktype][0][-limit:]
+
+class CandleStore:
+    def __init__(self, path):
+        if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            # valeurs gardées en texte: lignes relues identiques à la réponse KuCoin
+            self.db.execute("""CREATE TABLE IF NOT EXISTS klines (
+                symbol TEXT, ktype TEXT, ts INTEGER, open TEXT, close TEXT, high TEXT, low TEXT,
+                volume TEXT, turnover TEXT, PRIMARY KEY (symbol, ktype, ts)) WITHOUT ROWID""")
+            # trous déjà revérifiés côté API (paire sans trade → KuCoin n'émet pas de bougie)
+            self.db.execute("""CREATE TABLE IF NOT EXISTS holes (
+                symbol TEXT, ktype TEXT, ts_from INTEGER, ts_to INTEGER, PRIMARY KEY (symbol, ktype, ts_from))""")
+
+    def upsert(self, symbol, ktype, rows):
+        if not rows: return 0
+        with self.lock, self.db:
+            self.db.executemany("INSERT OR REPLACE INTO klines VALUES (?,?,?,?,?,?,?,?,?)",
+                                [(symbol, ktype, int(r[0]), *[str(x) for x in r[1:7]]) for r in rows])
+        return len(rows)
+
+    def last_ts(self, symbol, ktype):
+        with self.lock:
+            r = self.db.execute("SELECT MAX(ts) FROM klines WHERE symbol=? AND ktype=?", (symbol, ktype)).fetchone()
+        return r[0]
+
+    def first_ts(self, symbol, ktype):
+        with self.lock:
+            r = self.db.execute("SELECT MIN(ts) FROM klines WHERE symbol=? AND ktype=?", (symbol, ktype)).fetchone()
+        return r[0]
+
+    def head(self, symbol, ktype):
+        # début de l'historique couvert: première bougie, ou début du trou vérifié qui la précède (avant la source)
+        first = self.first_ts(symbol, ktype)
+        if first is None: return None
+        with self.lock:
+            r = self.db.execute("SELECT MIN(ts_from) FROM holes WHERE symbol=? AND ktype=? AND ts_to=?",
+                                (symbol, ktype, first)).fetchone()
+        return min(first, r[0]) if r[0] is not None else first
+
+    def read(self, symbol, ktype, limit=None, start=None, end=None):
+        # oldest->newest, format KuCoin [time, open, close, high, low, volume, turnover]
+        q = "SELECT ts, open, close, high, low, volume, turnover FROM klines WHERE symbol=? AND ktype=?"
+        args = [symbol, ktype]
+        if start is not None: q += " AND ts >= ?"; args.append(int(start))
+        if end is not None: q += " AND ts < ?"; args.append(int(end))
+        q += " ORDER BY ts DESC"
+        if limit: q += " LIMIT ?"; args.append(int(limit))
+        with self.lock:
+            rows = self.db.execute(q, args).fetchall()
+        return [[str(r[0]), *r[1:]] for r in reversed(rows)]
+
+    def symbols(self, ktype):
+        with self.lock:
+            return [r[0] for r in self.db.execute("SELECT DISTINCT symbol FROM klines WHERE ktype=?", (ktype,))]
+
+    def gaps(self, symbol, ktype, since=None):
+        # intervalles (début, fin) sans bougie entre deux bougies stockées, hors trous déjà vérifiés
+        step = INTERVAL_SEC[ktype]
+        with self.lock:
+            rows = self.db.execute(
+                """SELECT prev, ts FROM (SELECT ts, LAG(ts) OVER (ORDER BY ts) AS prev FROM klines
+                   WHERE symbol=? AND ktype=? AND ts >= ?) WHERE ts - prev > ?""",
+                (symbol, ktype, int(since or 0), step)).fetchall()
+            known = {r[0] for r in self.db.execute("SELECT ts_from FROM holes WHERE symbol=? AND ktype=?", (symbol, ktype))}
+        return [(a+step, b) for a, b in rows if a+step not in known]
+
+    def mark_hole(self, symbol, ktype, ts_from, ts_to):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO holes VALUES (?,?,?,?)", (symbol, ktype, int(ts_from), int(ts_to)))
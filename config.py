@@ -3,6 +3,9 @@ from dotenv import load_dotenv
 load_dotenv()
 
 CFG = {
+    # live | supervisor (N workers live) | paper | arb_scan | backtest (seul live exige les clés API au chargement)
+    "MODE": os.getenv("MODE", "live"),
+
     "API_KEY": os.getenv("KUCOIN_API_KEY"),
     "API_SECRET": os.getenv("KUCOIN_API_SECRET"),
     "API_PASS": os.getenv("KUCOIN_API_PASSPHRASE"),
@@ -16,20 +19,131 @@ CFG = {
     "QUOTES": [s.strip() for s in os.getenv("QUOTES", os.getenv("QUOTE", "USDT")).split(",") if s.strip()],
 
     "SYMBOLS": [s.strip() for s in os.getenv("SYMBOLS", "BTC-USDT,ETH-USDT").split(",") if s.strip()],
+
+    # Screener: SYMBOLS remplacé par le top-N de tout le marché (all-tickers → volume/spread → regime/ensemble)
+    "SCREENER": os.getenv("SCREENER", "false").lower() == "true",
+    "SCREEN_TOP_N": int(os.getenv("SCREEN_TOP_N", "10")),
+    "SCREEN_MIN_VOL_USDT": float(os.getenv("SCREEN_MIN_VOL_USDT", "1000000")),   # volume 24h, converti en USDT
+    "SCREEN_MAX_CANDIDATES": int(os.getenv("SCREEN_MAX_CANDIDATES", "60")),       # survivants (par volume) analysés en klines
+
     "MIN_TRADE_USDT": float(os.getenv("MIN_TRADE_USDT", "10")),
     "RISK_PCT": float(os.getenv("RISK_PCT", "10")),
-    "STRATEGY": os.getenv("STRATEGY", "EMA_CROSS"),
+    "STRATEGY": os.getenv("STRATEGY", "EMA_CROSS,BREAKOUT,MEAN_REVERT"),   # NOM[:poids],... (registre strategy.py)
+    "ENSEMBLE_THRESHOLD": os.getenv("ENSEMBLE_THRESHOLD", ""),   # poids de votes requis; vide = min(2, poids total)
+    # python: IndicatorState par symbole | numpy: un bloc (symboles × 240 barres) par cycle (indicators_np, pip install numpy)
+    "INDICATOR_BACKEND": os.getenv("INDICATOR_BACKEND", "python"),
+    # état d'indicateurs conservé entre cycles (O(1) par bougie) au lieu d'un recalcul exact sur la fenêtre; opt-in:
+    # EMA200 / RSI / ADX dérivent de la valeur fenêtrée (décisions différentes)
+    "INDICATOR_STREAM": os.getenv("INDICATOR_STREAM", "false").lower() == "true",
     "POLL_INTERVAL_SEC": int(os.getenv("POLL_INTERVAL_SEC", "30")),
 
+    # Cache REST (secondes): liste des symboles, soldes, tickers
+    "SYMBOLS_TTL_SEC": float(os.getenv("SYMBOLS_TTL_SEC", "3600")),
+    "ACCOUNTS_TTL_SEC": float(os.getenv("ACCOUNTS_TTL_SEC", "30")),
+    "TICKER_TTL_SEC": float(os.getenv("TICKER_TTL_SEC", "2")),
+
+    # Prefetch concurrent: taille du pool et débit max par endpoint public (req/s)
+    "FETCH_WORKERS": int(os.getenv("FETCH_WORKERS", "8")),
+    # quotas KuCoin (poids par fenêtre de 30 s): public = par IP, spot = compte + ordres (VIP0)
+    "RATE_PUBLIC_PER_30S": float(os.getenv("RATE_PUBLIC_PER_30S", "2000")),
+    "RATE_SPOT_PER_30S": float(os.getenv("RATE_SPOT_PER_30S", "4000")),
+
+    # État persistant (positions, cooldowns, legs), opt-in (ex. data/state sur un disque persistant).
+    # Vide → état volatile, rien d'écrit sur disque. Ignoré en MODE=paper (rien de réel à reprendre).
+    "STATE_DIR": os.getenv("STATE_DIR", ""),
+
+    # Routage entre quotes: frais taker (%) et durée de mémo des routes (s)
+    "TAKER_FEE_PCT": float(os.getenv("TAKER_FEE_PCT", "0.1")),
+    "ROUTE_TTL_SEC": float(os.getenv("ROUTE_TTL_SEC", "5")),
+
+    # Exécution: market | limit (post-only, re-cotation) | twap (tranches post-only); reliquat en market si FALLBACK
+    "EXEC_STYLE": os.getenv("EXEC_STYLE", "market"),
+    "EXEC_LIMIT_TIMEOUT_SEC": float(os.getenv("EXEC_LIMIT_TIMEOUT_SEC", "20")),
+    "EXEC_TWAP_SLICES": int(os.getenv("EXEC_TWAP_SLICES", "4")),
+    "EXEC_TWAP_SEC": float(os.getenv("EXEC_TWAP_SEC", "120")),
+    "EXEC_FALLBACK_MARKET": os.getenv("EXEC_FALLBACK_MARKET", "true").lower() == "true",
+    "EXEC_POLL_SEC": float(os.getenv("EXEC_POLL_SEC", "1")),
+    "MAKER_FEE_PCT": float(os.getenv("MAKER_FEE_PCT", "0.1")),
+
+    # Scanner d'arbitrage (MODE=arb_scan): cycles de 3 (ou 4) jambes depuis QUOTES
+    "ARB_MAX_LEN": int(os.getenv("ARB_MAX_LEN", "3")),
+    "ARB_MIN_EDGE_PCT": float(os.getenv("ARB_MIN_EDGE_PCT", "0")),
+    "ARB_DEPTH_CHECK": int(os.getenv("ARB_DEPTH_CHECK", "5")),
+    "ARB_SCAN_SEC": float(os.getenv("ARB_SCAN_SEC", "5")),
+
+    # Cache local des bougies (SQLite), opt-in (ex. data/candles.sqlite sur un disque persistant).
+    # Vide → rien d'écrit sur disque, téléchargement complet à chaque appel.
+    "CANDLE_STORE": os.getenv("CANDLE_STORE", ""),
+    # Intervalles supérieurs (1hour, 4hour, 1day...) agrégés localement depuis les bougies 15min
+    "MTF_LOCAL": os.getenv("MTF_LOCAL", "true").lower() == "true",
+    # Confirmation de tendance sur un intervalle supérieur (vide = off): clôture > EMA(REGIME_HTF_EMA)
+    "REGIME_HTF": os.getenv("REGIME_HTF", ""),
+    "REGIME_HTF_EMA": int(os.getenv("REGIME_HTF_EMA", "50")),
+
+    # Flux WebSocket (tickers + bougies). WS_URL vide → endpoint KuCoin via token public.
+    "WS_ENABLED": os.getenv("WS_ENABLED", "false").lower() == "true",
+    "WS_URL": os.getenv("WS_URL", ""),
+    "WS_STALE_SEC": float(os.getenv("WS_STALE_SEC", "10")),
+    "WS_L2": os.getenv("WS_L2", "false").lower() == "true",   # carnets L2 tenus à jour par diffs (sinon snapshot REST)
+
+    # Soldes locaux via le flux privé (/account/balance + ordres); REST seulement pour l'amorçage et la réconciliation
+    "LEDGER_WS": os.getenv("LEDGER_WS", "false").lower() == "true",
+    "WS_PRIVATE_URL": os.getenv("WS_PRIVATE_URL", ""),
+    "LEDGER_RECONCILE_SEC": float(os.getenv("LEDGER_RECONCILE_SEC", "300")),
+    "LEDGER_GRACE_SEC": float(os.getenv("LEDGER_GRACE_SEC", "5")),   # fill sans événement de solde → réconciliation
+
+    # Carnet d'ordres: profondeur gardée, âge max d'un snapshot REST, budget d'impact (VWAP vs meilleur prix, %);
+    # budget opt-in (ex. 0.3): vide/0 = off, sinon une requête carnet (get_part_order) de plus par achat
+    "BOOK_DEPTH": int(os.getenv("BOOK_DEPTH", "100")),
+    "BOOK_TTL_SEC": float(os.getenv("BOOK_TTL_SEC", "2")),
+    "IMPACT_MAX_PCT": float(os.getenv("IMPACT_MAX_PCT") or 0),
+
+    # Risque portefeuille (photo mark-to-market par cycle, en PORTFOLIO_CCY), % de l'équité totale après l'achat.
+    # MAX_RISK_PCT = Σ valeur × ATR% des positions (perte sur un mouvement d'1 ATR), 0 = off.
+    # Changement de comportement: MAX_POS_ALLOCATION_PCT se rapportait au solde de la quote du symbole (achat sauté si
+    # dépassé); c'est maintenant la valeur du coin après achat / équité totale du compte, et l'achat est réduit au plafond
+    "PORTFOLIO_CCY": os.getenv("PORTFOLIO_CCY", "USDT"),
+    "MAX_POS_ALLOCATION_PCT": float(os.getenv("MAX_POS_ALLOCATION_PCT", "50")),
+    "MAX_EXPOSURE_PCT": float(os.getenv("MAX_EXPOSURE_PCT", "100")),
+    "MAX_QUOTE_EXPOSURE_PCT": float(os.getenv("MAX_QUOTE_EXPOSURE_PCT", "100")),
+    "MAX_RISK_PCT": float(os.getenv("MAX_RISK_PCT", "0")),
+    "PORTFOLIO_ATR_FALLBACK_PCT": float(os.getenv("PORTFOLIO_ATR_FALLBACK_PCT", "3")),   # avoirs sans indicateurs
+
     "ENABLE_TP_SL": os.getenv("ENABLE_TP_SL", "true").lower() == "true",
     "TP_PCT": float(os.getenv("TP_PCT", "1.5")),   # +1.5% par défaut
     "SL_PCT": float(os.getenv("SL_PCT", "1.0")),   # -1.0% par défaut
+    "EXIT_POLL_SEC": float(os.getenv("EXIT_POLL_SEC", "3")),   # surveillance TP/SL REST hors flux
+
+    # Bourse simulée (MODE=paper): données (vide = synthétiques, sinon fichier/dossier comme backtest.py), carnets
+    # enregistrés (JSONL de snapshots, vide = synthétiques), vitesse de l'horloge, forme des carnets synthétiques
+    "PAPER_DATA": os.getenv("PAPER_DATA", ""),
+    "PAPER_BOOKS": os.getenv("PAPER_BOOKS", ""),
+    "PAPER_CASH": os.getenv("PAPER_CASH", "USDT=1000"),
+    "PAPER_SPEED": float(os.getenv("PAPER_SPEED", "1")),
+    "PAPER_START": int(os.getenv("PAPER_START", "300")),          # barres d'historique avant la barre courante (données enregistrées)
+    "PAPER_TICKS_PER_BAR": int(os.getenv("PAPER_TICKS_PER_BAR", "30")),
+    "PAPER_SPREAD_PCT": float(os.getenv("PAPER_SPREAD_PCT", "0.02")),
+    "PAPER_LEVELS": int(os.getenv("PAPER_LEVELS", "20")),
+    "PAPER_LEVEL_STEP_PCT": float(os.getenv("PAPER_LEVEL_STEP_PCT", "0.02")),
+    "PAPER_LEVEL_QUOTE": float(os.getenv("PAPER_LEVEL_QUOTE", "2000")),
+
+    # Mode supervisor: N workers (0 = nb de cœurs), coordinateur de risque local. WORKER_ID/SHARD posés par le superviseur
+    "WORKERS": int(os.getenv("WORKERS", "0")),
+    "COORD_PORT": int(os.getenv("COORD_PORT", "47613")),
+    "WORKER_ID": os.getenv("WORKER_ID", ""),
+    "SHARD": os.getenv("SHARD", ""),
+
+    # Métriques Prometheus (/metrics) + profil échantillonné (/profile). 0 = désactivé
+    "METRICS_PORT": int(os.getenv("METRICS_PORT", "0")),
+    "METRICS_HOST": os.getenv("METRICS_HOST", "127.0.0.1"),
 
     "TELEGRAM_TOKEN": os.getenv("TELEGRAM_TOKEN"),
     "TELEGRAM_CHAT_ID": os.getenv("TELEGRAM_CHAT_ID"),
+    "ALERT_QUEUE_MAX": int(os.getenv("ALERT_QUEUE_MAX", "100")),        # au-delà: alertes perdues (compteur)
+    "ALERT_COALESCE_SEC": float(os.getenv("ALERT_COALESCE_SEC", "2")),  # rafale regroupée en un message
 }
 
 # Erreur claire si clés manquantes
 for k in ["API_KEY", "API_SECRET", "API_PASS"]:
-    if not CFG[k]:
+    if not CFG[k] and CFG["MODE"] == "live":
         raise RuntimeError(f"Missing env: {k}. Set it on Render → Environment.")
\ No newline at end of file
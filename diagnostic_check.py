@@ -1,8 +1,9 @@
-import os, time, math
+import os, time
 from dotenv import load_dotenv
 load_dotenv()
 
 from kucoin.client import User, Market, Trade
+from execution import snap
 
 API_KEY = os.getenv("KUCOIN_API_KEY")
 API_SECRET = os.getenv("KUCOIN_API_SECRET")
@@ -63,18 +64,17 @@ ok(f"{SYMBOL} -> base={base} quote={quote}, tick={price_tick}, step={size_step},
 ticker = market.get_ticker(SYMBOL)
 best_bid = float(ticker['bestBid'])
 test_quote = max(TEST_USDT, min_funds if min_funds>0 else TEST_USDT)
-qty = test_quote / best_bid
-qty = math.floor(qty / size_step) * size_step
-if qty <= 0: fail("Quantité calculée <= 0 (augmente TEST_USDT ou choisis une autre paire).")
+qty = snap(test_quote / best_bid, info['baseIncrement'])
+if float(qty) <= 0: fail("Quantité calculée <= 0 (augmente TEST_USDT ou choisis une autre paire).")
 ok(f"Prix ~ {best_bid}, qty test={qty}")
 
 if DRY_RUN:
     ok("DRY_RUN=TRUE → Aucun ordre réel envoyé.")
     print("➡️ Le bot PEUT trader. Pour tester en réel, passe DRY_RUN=false.")
 else:
-    price = round((best_bid * 0.995) / price_tick) * price_tick
+    price = snap(best_bid * 0.995, info['priceIncrement'])
     try:
-        res = trade.create_limit_order(SYMBOL, 'buy', str(qty), str(price))
+        res = trade.create_limit_order(SYMBOL, 'buy', qty, price)
         ok(f"Ordre LIMIT BUY envoyé: id={res.get('orderId') or res}")
         if 'orderId' in res:
             trade.cancel_order(res['orderId']); ok("Ordre annulé (test concluant).")
@@ -1,7 +1,89 @@
-import time, math
-from tenacity import retry, wait_exponential, stop_after_attempt
+import time, math, json, uuid, heapq, threading, contextlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, Future
 from kucoin.client import User, Market, Trade
 from config import CFG
+from candle_store import CandleStore, Aggregator, INTERVAL_SEC
+from orderbook import BookManager
+import metrics
+
+# ========= Ordonnanceur de requêtes =========
+# Poids KuCoin par endpoint (quota "public" par IP, quota "spot" partagé par compte/ordres, fenêtre 30 s)
+ENDPOINTS = {
+    "get_ticker": ("public", 2), "get_all_tickers": ("public", 15), "get_kline": ("public", 3),
+    "get_symbol_list": ("public", 4), "get_server_timestamp": ("public", 3), "get_server_time": ("public", 3),
+    "get_part_order": ("public", 2), "get_aggregated_orderv3": ("public", 3),
+    "get_account_list": ("private", 5),
+    "create_market_order": ("trade", 2), "create_limit_order": ("trade", 2), "cancel_order": ("trade", 3),
+    "get_order_details": ("trade", 2), "get_client_order_details": ("trade", 2), "get_fill_list": ("trade", 10),
+}
+BUCKET = {"public": "public", "private": "spot", "trade": "spot"}
+PRIORITY = {"trade": 0, "private": 1, "public": 2}   # 0 = ordres/sorties, passent devant les scans
+
+def _err_code(e):
+    # SDK: "<http>-<corps>"; refus métier → "200-{"code":"400100",...}"
+    head, _, body = str(e).partition("-")
+    if head == "200" and '"code"' in body:
+        try: return str(json.loads(body).get("code", head))
+        except ValueError: pass
+    return head
+
+def _rate_limited(e):
+    return _err_code(e) in ("429", "429000")
+
+class TokenBucket:
+    # seau à jetons pondéré et bloquant; file d'attente par priorité (FIFO à priorité égale);
+    # une part du quota (reserve) n'est accessible qu'à la priorité 0
+    def __init__(self, name, capacity, window=30.0, reserve=0.1):
+        self.name = name; self.capacity = float(capacity); self.rate = self.capacity/window
+        self.tokens = self.capacity; self.ts = time.monotonic()
+        self.floor = self.capacity*reserve; self.blocked_until = 0.0
+        self.cond = threading.Condition(); self.queue = []; self.seq = 0
+        self.waits = 0; self.limited = 0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now-self.ts)*self.rate); self.ts = now
+
+    def acquire(self, weight=1, prio=2):
+        with self.cond:
+            self.seq += 1; me = (prio, self.seq); heapq.heappush(self.queue, me)
+            waited = False
+            while True:
+                now = time.monotonic(); self._refill(now)
+                need = weight + (0 if prio == 0 else self.floor)
+                if self.queue[0] == me and now >= self.blocked_until and self.tokens >= need:
+                    heapq.heappop(self.queue); self.tokens -= weight
+                    self.waits += waited; self.cond.notify_all()
+                    return
+                waited = True
+                wait = max(self.blocked_until-now, (need-self.tokens)/self.rate if self.queue[0] == me else 0.05, 0.001)
+                self.cond.wait(min(wait, 0.5))
+
+    def sync(self, remaining, reset_sec):
+        # en-têtes gw-ratelimit-*: le serveur compte aussi les autres process/clients sur la même clé ou IP
+        with self.cond:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, remaining)
+            if remaining <= self.floor*0.5:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + reset_sec)
+
+    def penalize(self, reset_sec):
+        # 429 reçu: plus rien jusqu'à la réinitialisation de la fenêtre
+        with self.cond:
+            self.limited += 1; self.tokens = 0.0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + max(reset_sec, 1.0))
+            self.cond.notify_all()
+
+    def stats(self):
+        return {"tokens": round(self.tokens, 1), "queued": len(self.queue), "waits": self.waits, "429": self.limited}
+
+def _retryable(e):
+    # 4xx / code métier (400100 solde...) → inutile de rejouer; 429 / 429000, 5xx, erreurs réseau → retry
+    code = _err_code(e)
+    if not code.isdigit(): return True
+    c = int(code)
+    if c in (429, 429000): return True
+    return not (400 <= c < 500 or len(code) == 6)
 
 class Ku:
     def __init__(self, logger):
@@ -9,14 +91,113 @@ class Ku:
         self.user = User(CFG["API_KEY"], CFG["API_SECRET"], CFG["API_PASS"], is_sandbox=CFG["SANDBOX"])
         self.market = Market(is_sandbox=CFG["SANDBOX"])
         self.trade = Trade(CFG["API_KEY"], CFG["API_SECRET"], CFG["API_PASS"], is_sandbox=CFG["SANDBOX"])
+        # Cache par endpoint: (endpoint, clé) -> (ts, valeur)
+        self.ttl = {"symbols": CFG["SYMBOLS_TTL_SEC"], "accounts": CFG["ACCOUNTS_TTL_SEC"], "ticker": CFG["TICKER_TTL_SEC"],
+                    "all_tickers": CFG["TICKER_TTL_SEC"]}
+        self._cache = {}
+        self.hits = defaultdict(int); self.misses = defaultdict(int)
+        self._lock = threading.Lock()
+        self._order_lock = threading.Lock()   # les ordres restent sérialisés
+        # quotas KuCoin par fenêtre de 30 s: public (IP) et spot (compte + ordres)
+        self.buckets = {"public": TokenBucket("public", CFG["RATE_PUBLIC_PER_30S"]),
+                        "spot": TokenBucket("spot", CFG["RATE_SPOT_PER_30S"])}
+        self._prio = threading.local()
+        self._inflight = {}   # (endpoint, clé) -> Future: une seule requête identique en vol
+        self._pool = None
+        self.feed = None   # MarketFeed optionnel (WebSocket), REST si absent ou périmé
+        self.store = CandleStore(CFG["CANDLE_STORE"]) if CFG["CANDLE_STORE"] else None
+        self.ledger = None   # Ledger optionnel (flux privé): soldes lus localement
+        self.mtf = Aggregator("15min")   # 1hour/4hour/1day... dérivés localement des bougies 15min
+        self.books = BookManager()   # carnets L2 (diffs WS si WS_L2, sinon snapshot REST à la demande)
+        # latence/erreurs/429 par appel REST réel (clients SDK) et par méthode Ku (cache compris)
+        for client in (self.user, self.market, self.trade): metrics.instrument(client, "rest")
+        self._watch_headers(self.market, self.buckets["public"])
+        self._watch_headers(self.user, self.buckets["spot"]); self._watch_headers(self.trade, self.buckets["spot"])
+        metrics.instrument(self, "ku", ["accounts", "balance", "symbols_map", "ticker", "all_tickers", "klines",
+                                        "prefetch", "place_order", "cancel_order", "order_details"])
+
+    # ========= Cache =========
+    def _cached(self, endpoint, key, fetch):
+        now = time.time()
+        hit = self._cache.get((endpoint, key))
+        if hit and now - hit[0] < self.ttl[endpoint]:
+            with self._lock: self.hits[endpoint] += 1
+            return hit[1]
+        with self._lock:
+            fut = self._inflight.get((endpoint, key)); owner = fut is None
+            if owner:
+                fut = self._inflight[(endpoint, key)] = Future(); self.misses[endpoint] += 1
+            else:
+                self.hits[endpoint] += 1
+        if not owner: return fut.result()   # même requête déjà en vol: on partage sa réponse
+        try:
+            val = fetch()
+            self._cache[(endpoint, key)] = (now, val); fut.set_result(val)
+            return val
+        except Exception as e:
+            fut.set_exception(e); raise
+        finally:
+            with self._lock: self._inflight.pop((endpoint, key), None)
+
+    # ========= Appels REST ordonnancés =========
+    def call(self, method, *a, **kw):
+        # jetons pris dans le quota de l'endpoint avant l'appel; priorité du thread (sorties) ou de la classe
+        cls, weight = ENDPOINTS.get(method, ("public", 1))
+        client = {"public": self.market, "private": self.user, "trade": self.trade}[cls]
+        prio = getattr(self._prio, "level", None)
+        self.buckets[BUCKET[cls]].acquire(weight, PRIORITY[cls] if prio is None else prio)
+        return getattr(client, method)(*a, **kw)
+
+    @contextlib.contextmanager
+    def priority(self, level=0):
+        old = getattr(self._prio, "level", None); self._prio.level = level
+        try: yield
+        finally: self._prio.level = old
+
+    def _watch_headers(self, client, bucket):
+        # le SDK appelle self.check_response_data(resp): surcharge d'instance pour lire les en-têtes de quota
+        orig = client.check_response_data
+        def check(resp):
+            h = resp.headers
+            reset = float(h.get("gw-ratelimit-reset") or 1000)/1000.0
+            if h.get("gw-ratelimit-remaining") is not None:
+                bucket.sync(float(h["gw-ratelimit-remaining"]), reset)
+            if resp.status_code == 429 or '"429000"' in (resp.text[:64] if resp.status_code == 200 else ""):
+                bucket.penalize(reset)
+            return orig(resp)
+        client.check_response_data = check
+
+    def sched_stats(self):
+        return {n: b.stats() for n, b in self.buckets.items()}
+
+    def invalidate(self, endpoint=None, key=None):
+        for k in list(self._cache):
+            if (endpoint is None or k[0] == endpoint) and (key is None or k[1] == key):
+                self._cache.pop(k, None)
+
+    def attach_feed(self, feed):
+        self.feed = feed
+
+    def attach_ledger(self, ledger):
+        ledger.load(self.call("get_account_list"))
+        self.ledger = ledger
+
+    def new_cycle(self):
+        # soldes relus une fois par cycle; symboles/tickers gardent leur TTL
+        self.invalidate("accounts")
+        if self.ledger is not None and self.ledger.due():
+            self.ledger.reconcile(self.call("get_account_list"))
+
+    def cache_stats(self):
+        return {e: {"hits": self.hits[e], "misses": self.misses[e]} for e in self.ttl}
 
     def time_ok(self):
         try:
             # certaines versions n'ont pas get_server_time()
             if hasattr(self.market, 'get_server_time'):
-                srv = self.market.get_server_time()
+                srv = self.call("get_server_time")
             elif hasattr(self.market, 'get_server_timestamp'):
-                srv = self.market.get_server_timestamp()
+                srv = self.call("get_server_timestamp")
             else:
                 self.logger.info("No server time endpoint; skipping drift check.")
                 return 0
@@ -28,44 +209,153 @@ class Ku:
             return 0
 
     def accounts(self):
-        accs = self.user.get_account_list()
+        accs = self._cached("accounts", None, lambda: self.call("get_account_list"))
         by_type = {}
         for a in accs:
             by_type.setdefault(a['type'], []).append(a)
         return by_type
 
     def balance(self, typ, currency):
+        if self.ledger is not None and self.ledger.live():
+            return self.ledger.get(typ, currency)
         by_type = self.accounts()
         return sum(float(a['balance']) for a in by_type.get(typ, []) if a['currency']==currency)
 
     def symbols_map(self):
-        return {s['symbol']: s for s in self.market.get_symbol_list()}
+        return self._cached("symbols", None, lambda: {s['symbol']: s for s in self.call("get_symbol_list")})
 
     def ticker(self, symbol):
-        return self.market.get_ticker(symbol)
+        live = self.feed.ticker(symbol) if self.feed else None
+        if live: return live
+        return self._cached("ticker", symbol, lambda: self.call("get_ticker", symbol))
+
+    def book_impact(self, symbol, side, qty, impact_pct):
+        return self.books.impact(self, symbol, side, qty, impact_pct)
+
+    def _get_kline(self, symbol, ktype, **kw):
+        data = self.call("get_kline", symbol, ktype, **kw)
+        return data if isinstance(data, list) else []   # réponse vide → dict brut côté SDK
+
+    def _fetch_range(self, symbol, ktype, start, end):
+        step = INTERVAL_SEC[ktype]
+        while start < end:
+            stop = min(end, start + 1500*step)   # 1500 bougies max par requête
+            self.store.upsert(symbol, ktype, self._get_kline(symbol, ktype, startAt=start, endAt=stop))
+            start = stop
+
+    def _sync_store(self, symbol, ktype, limit):
+        # ne télécharge que ce qui manque: la fin (bougie en cours incluse), le début si limit remonte avant
+        # la première bougie stockée, puis les trous
+        st, step, now = self.store, INTERVAL_SEC[ktype], int(time.time())
+        want = now - limit*step
+        last = st.last_ts(symbol, ktype)
+        self._fetch_range(symbol, ktype, last if last is not None else want, now)
+        head = st.head(symbol, ktype)
+        if head is not None and head - want >= step:
+            self._fetch_range(symbol, ktype, want, head)
+            first = st.first_ts(symbol, ktype)
+            if first - want >= step: st.mark_hole(symbol, ktype, want, first)   # la source ne remonte pas plus loin
+        for a, b in st.gaps(symbol, ktype, since=want):
+            st.upsert(symbol, ktype, self._get_kline(symbol, ktype, startAt=a, endAt=b))
+            if not st.read(symbol, ktype, start=a, end=b):
+                st.mark_hole(symbol, ktype, a, b)   # toujours vide → pas de trade, inutile de redemander
+        return st.read(symbol, ktype, limit)
+
+    def all_tickers(self):
+        # tout le marché en une requête: symbol -> {price, bestBid, bestAsk, vol, volValue}
+        def fetch():
+            return {t["symbol"]: {"price": t.get("last"), "bestBid": t.get("buy"), "bestAsk": t.get("sell"),
+                                  "vol": t.get("vol"), "volValue": t.get("volValue")}
+                    for t in self.call("get_all_tickers").get("ticker", [])}
+        return self._cached("all_tickers", None, fetch)
 
     def klines(self, symbol, ktype="15min", limit=150):
-        data = self.market.get_kline(symbol, ktype)
-        data = list(reversed(data))[-limit:]
-        return data
+        if CFG["MTF_LOCAL"] and self.mtf.supports(ktype):
+            return self._mtf_klines(symbol, ktype, limit)
+        if self.store is not None and ktype in INTERVAL_SEC:
+            data = self._sync_store(symbol, ktype, limit)
+        else:
+            data = list(reversed(self._get_kline(symbol, ktype)))
+        if self.feed:
+            # bougies live du flux: remplacent/complètent la fin de l'historique REST
+            for row in self.feed.live_klines(symbol):
+                ts = int(row[0]); last = int(data[-1][0]) if data else -1
+                if ts == last: data[-1] = row
+                elif ts > last: data.append(row)
+        if ktype == self.mtf.base: self.mtf.ingest(symbol, data)
+        return data[-limit:]
+
+    def _mtf_klines(self, symbol, ktype, limit):
+        # barres tenues par les bougies de base de chaque cycle; amorçage (ou reprise) depuis le store 15min,
+        # sinon une requête native à l'intervalle demandé
+        if not self.mtf.fresh(symbol, ktype, limit):
+            if self.store is not None:
+                n = (limit+1)*self.mtf.ratio(ktype)
+                rows = self._sync_store(symbol, self.mtf.base, n)   # tout l'intervalle demandé est couvert
+                self.mtf.seed(symbol, ktype, rows, exhausted=len(rows) < n)
+            else:
+                rows = list(reversed(self._get_kline(symbol, ktype)))   # 1500 barres max par requête
+                self.mtf.seed(symbol, ktype, rows, exhausted=len(rows) < 1500, native=True)
+        return self.mtf.get(symbol, ktype, limit)
+
+    def prefetch(self, symbols, ktype="15min", limit=150):
+        # klines + ticker de chaque symbole sur un pool borné; symbole en erreur → absent du snapshot
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=CFG["FETCH_WORKERS"], thread_name_prefix="fetch")
+        def one(sym):
+            return {"kl": self.klines(sym, ktype, limit=limit), "ticker": self.ticker(sym)}
+        futs = {sym: self._pool.submit(one, sym) for sym in symbols}
+        snap = {}
+        for sym, f in futs.items():
+            try:
+                snap[sym] = f.result()
+            except Exception as e:
+                self.logger.warning(f"{sym} prefetch échoué: {e}")
+        return snap
 
     def snap_qty(self, qty, step):
         return math.floor(qty / step) * step
 
-    @retry(wait=wait_exponential(multiplier=1, min=1, max=10), stop=stop_after_attempt(5))
-    def place_order(self, symbol, side, size=None, price=None, type_="limit"):
+    def place_order(self, symbol, side, size=None, price=None, type_="limit", client_oid=None, post_only=False):
+        # clientOid fixé avant le 1er essai: après un timeout on retrouve l'ordre au lieu d'en créer un second
+        oid = client_oid or uuid.uuid4().hex
         if CFG["DRY_RUN"]:
             self.logger.info(f"[DRY_RUN] place_order {side} {symbol} size={size} price={price} type={type_}")
-            return {"orderId": "DRYRUN"}
-        if type_ == "market":
-            return self.trade.create_market_order(symbol, side, size=size)
-        return self.trade.create_limit_order(symbol, side, str(size), str(price))
+            return {"orderId": "DRYRUN", "clientOid": oid}
+        extra = {"postOnly": True} if post_only and type_ != "market" else {}
+        for attempt in range(5):
+            try:
+                with self._order_lock:
+                    if type_ == "market":
+                        res = self.call("create_market_order", symbol, side, clientOid=oid, size=size)
+                    else:
+                        res = self.call("create_limit_order", symbol, side, str(size), str(price), clientOid=oid, **extra)
+                break
+            except Exception as e:
+                found = self.order_by_client(oid)
+                if found:
+                    self.logger.warning(f"{symbol} ordre {oid} retrouvé après erreur ({e})")
+                    res = {"orderId": found["id"]}; break
+                if not _retryable(e) or attempt == 4: raise
+                self.logger.warning(f"{symbol} place_order essai {attempt+1} échoué: {e}")
+                if not _rate_limited(e): time.sleep(min(10, 2**attempt))   # 429: le seau bloque déjà jusqu'au reset
+        # un fill change les soldes et bouge le carnet
+        self.invalidate("accounts"); self.invalidate("ticker", symbol)
+        return dict(res, clientOid=oid)
+
+    def order_by_client(self, oid):
+        try: return self.call("get_client_order_details", oid)
+        except Exception: return None
+
+    def order_details(self, order_id):
+        # dealSize/dealFunds/fee/isActive: état d'exécution réel de l'ordre
+        return self.call("get_order_details", order_id)
 
     def cancel_order(self, order_id):
         if CFG["DRY_RUN"]:
             self.logger.info(f"[DRY_RUN] cancel_order id={order_id}")
             return True
         try:
-            self.trade.cancel_order(order_id); return True
+            self.call("cancel_order", order_id); return True
         except Exception as e:
             self.logger.warning(f"Cancel failed: {e}"); return False
\ No newline at end of file
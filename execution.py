@@ -0,0 +1,120 @@
+# execution.py — exécution des ordres: arrondis aux incréments, limit post-only / TWAP, suivi des fills réels
+import time
+from decimal import Decimal, ROUND_FLOOR, ROUND_CEILING
+from config import CFG
+
+# ========= Arrondis (priceIncrement / baseIncrement / minFunds) =========
+def snap(value, step, up=False):
+    # multiple exact de step, en texte (pas de 0.30000000000000004 envoyé à l'API)
+    st = Decimal(str(step)).normalize()
+    q = (Decimal(str(value))/st).to_integral_value(ROUND_CEILING if up else ROUND_FLOOR)*st
+    return format(q.quantize(st if st.as_tuple().exponent < 0 else Decimal(1)), "f")
+
+def rules(ex, symbol):
+    m = ex.symbols_map()[symbol]
+    return (m.get("priceIncrement") or "0.00000001", m.get("baseIncrement") or "0.00000001",
+            float(m.get("minFunds") or 0), float(m.get("baseMinSize") or 0))
+
+def size_str(ex, symbol, qty):
+    # taille arrondie vers le bas; None si sous baseMinSize
+    _, step, _, min_size = rules(ex, symbol)
+    s = snap(qty, step)
+    return s if float(s) > 0 and float(s) >= min_size else None
+
+def price_str(ex, symbol, px, side):
+    # côté passif: achat arrondi vers le bas, vente vers le haut
+    return snap(px, rules(ex, symbol)[0], up=(side == "sell"))
+
+def funds_ok(ex, symbol, qty, px):
+    return float(qty)*float(px) >= rules(ex, symbol)[2]
+
+# ========= Exécution =========
+class Executor:
+    def __init__(self, logger):
+        self.logger = logger
+        self.stats = {"orders": 0, "maker": 0, "taker": 0, "fees": 0.0}
+
+    @staticmethod
+    def _zero():
+        return {"size": 0.0, "funds": 0.0, "fee": 0.0, "orders": 0, "avg": 0.0}
+
+    @staticmethod
+    def _sleep(ex, sec):
+        # attente sur l'horloge de l'exchange: ex.sleep si simulé (backtest: fill immédiat, rien à attendre)
+        if sec > 0: getattr(ex, "sleep", time.sleep)(sec)
+
+    @staticmethod
+    def _add(agg, f):
+        agg["size"] += f["size"]; agg["funds"] += f["funds"]; agg["fee"] += f["fee"]; agg["orders"] += f["orders"]
+        agg["avg"] = agg["funds"]/agg["size"] if agg["size"] > 0 else 0.0
+        return agg
+
+    def _fill(self, ex, res, size, px, fee_pct):
+        # fill réel via order_details; DRY_RUN / sans suivi → fill supposé complet au prix de référence
+        oid = res.get("orderId")
+        if oid == "DRYRUN" or not hasattr(ex, "order_details"):
+            sz = float(size); return {"size": sz, "funds": sz*px, "fee": sz*px*fee_pct/100.0, "active": False, "id": oid, "orders": 1}
+        d = ex.order_details(oid)
+        return {"size": float(d.get("dealSize") or 0), "funds": float(d.get("dealFunds") or 0),
+                "fee": float(d.get("fee") or 0), "active": bool(d.get("isActive")), "id": oid, "orders": 1}
+
+    def market(self, ex, symbol, side, qty):
+        size = size_str(ex, symbol, qty)
+        if not size: return self._zero()
+        t = ex.ticker(symbol); px = float(t["bestAsk"] if side == "buy" else t["bestBid"])
+        if not funds_ok(ex, symbol, size, px): return self._zero()
+        res = ex.place_order(symbol, side, size=size, type_="market")
+        f = self._fill(ex, res, size, px, CFG["TAKER_FEE_PCT"])
+        end = time.time() + CFG["EXEC_LIMIT_TIMEOUT_SEC"]
+        while f["active"] and time.time() < end:   # market: fill quasi immédiat, on attend la clôture
+            self._sleep(ex, CFG["EXEC_POLL_SEC"]); f = self._fill(ex, res, size, px, CFG["TAKER_FEE_PCT"])
+        self.stats["taker"] += 1
+        return self._add(self._zero(), f)
+
+    def limit(self, ex, symbol, side, qty, timeout):
+        # post-only au meilleur prix de notre côté; re-cotation si le marché s'éloigne; reste non exécuté rendu à l'appelant
+        agg = self._zero(); end = time.time() + timeout
+        while time.time() < end:
+            size = size_str(ex, symbol, float(qty) - agg["size"])
+            ex.invalidate("ticker", symbol); t = ex.ticker(symbol)
+            best = float(t["bestBid"] if side == "buy" else t["bestAsk"])
+            if not size or not funds_ok(ex, symbol, size, best): break
+            px = price_str(ex, symbol, best, side)
+            res = ex.place_order(symbol, side, size=size, price=px, type_="limit", post_only=True)
+            f = self._fill(ex, res, size, float(px), CFG["MAKER_FEE_PCT"])
+            while f["active"] and time.time() < end:
+                self._sleep(ex, CFG["EXEC_POLL_SEC"])
+                ex.invalidate("ticker", symbol); t = ex.ticker(symbol)
+                now_best = float(t["bestBid"] if side == "buy" else t["bestAsk"])
+                if (now_best > float(px)) if side == "buy" else (now_best < float(px)):
+                    break   # carnet parti sans nous: annuler et re-coter
+                f = self._fill(ex, res, size, float(px), CFG["MAKER_FEE_PCT"])
+            if f["active"]:
+                ex.cancel_order(f["id"]); f = self._fill(ex, res, size, float(px), CFG["MAKER_FEE_PCT"])
+            self._add(agg, f); self.stats["maker"] += 1
+            if f["size"] == 0 and not f["active"] and time.time() < end:
+                self._sleep(ex, CFG["EXEC_POLL_SEC"])   # post-only refusé (aurait croisé): on re-cote au prochain tour
+        return agg
+
+    def execute(self, ex, symbol, side, qty, style=None):
+        # retourne {size, funds, fee, orders, avg}: avg = prix moyen réellement exécuté
+        style = style or CFG["EXEC_STYLE"]
+        if style == "market":
+            agg = self.market(ex, symbol, side, qty)
+        else:
+            n = CFG["EXEC_TWAP_SLICES"] if style == "twap" else 1
+            per = CFG["EXEC_TWAP_SEC"]/n if style == "twap" else CFG["EXEC_LIMIT_TIMEOUT_SEC"]
+            agg = self._zero()
+            for k in range(n):
+                left = float(qty) - agg["size"]
+                slice_end = time.time() + per
+                self._add(agg, self.limit(ex, symbol, side, left/(n-k), per))
+                if k < n-1: self._sleep(ex, slice_end - time.time())
+            left = float(qty) - agg["size"]
+            if left > 0 and CFG["EXEC_FALLBACK_MARKET"]:
+                self._add(agg, self.market(ex, symbol, side, left))   # reliquat en taker plutôt que pas de position
+        self.stats["orders"] += agg["orders"]; self.stats["fees"] += agg["fee"]
+        if agg["size"] > 0:
+            self.logger.info(f"[Exec] {side} {symbol} {style}: {agg['size']:.8g} @ {agg['avg']:.8g} "
+                             f"(fees {agg['fee']:.6g}, {agg['orders']} ordre(s))")
+        return agg
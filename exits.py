@@ -0,0 +1,138 @@
+# exits.py — TP/SL hors boucle de scan: évalués à chaque mise à jour de prix
+import time, threading, contextlib
+from collections import deque
+from config import CFG
+from execution import size_str
+import metrics
+
+class ExitManager:
+    def __init__(self, positions, cooldown, logger, alert):
+        self.positions = positions; self.cooldown = cooldown   # dicts partagés avec main
+        self.logger = logger; self.alert = alert
+        self.ex = None
+        self.journal = None   # StateStore optionnel: chaque changement est journalisé (fsync)
+        self.on_close = None  # callback(symbol) à la fermeture d'une position (coordinateur de risque)
+        self.levels = {}      # symbol -> (tp, sl): un seul lot par symbole → lookup O(1) par tick
+        self.claimed = {}     # symbol -> (tp, sl) suspendus pendant une vente sur signal (claim/release)
+        self.lock = threading.RLock()
+        self.latencies = deque(maxlen=1000)   # secondes, déclenchement → ordre accepté
+        self.fired = {"TP": 0, "SL": 0}
+        self._thread = None
+
+    def bind(self, ex):
+        self.ex = ex
+        return self
+
+    def _urgent(self):
+        # sorties prioritaires dans le scheduler de requêtes (Ku); no-op pour les doubles de backtest
+        prio = getattr(self.ex, "priority", None)
+        return prio(0) if prio else contextlib.nullcontext()
+
+    # ========= Positions =========
+    def record(self, op, **data):
+        if self.journal: self.journal.append(op, **data)
+
+    def restore(self, state, now=None):
+        # état rechargé au boot: prix d'entrée réels conservés, cooldowns encore actifs
+        now = now or time.time()
+        for sym, p in state["positions"].items():
+            self.arm(sym, p["entry"], p["size"], journal=False)
+        for sym, until in state["cooldown"].items():
+            if until > now: self.cooldown[sym] = until
+
+    def cool(self, symbol, until):
+        self.cooldown[symbol] = until
+        self.record("cooldown", symbol=symbol, until=until)
+
+    def arm(self, symbol, entry, size, journal=True):
+        with self.lock:
+            self.positions[symbol] = {"entry": entry, "size": size}
+            if journal: self.record("open", symbol=symbol, entry=entry, size=size)
+            if CFG.get("ENABLE_TP_SL", True):
+                self.levels[symbol] = (entry*(1+CFG.get("TP_PCT",1.5)/100.0),
+                                       entry*(1-CFG.get("SL_PCT",1.0)/100.0))
+            return self.levels.get(symbol)
+
+    def claim(self, symbol):
+        # vente sur signal: TP/SL suspendus le temps de l'ordre (verrou tenu le temps du claim, pas de l'exécution);
+        # False si la position a déjà été soldée par un TP/SL
+        with self.lock:
+            if symbol not in self.positions or symbol in self.claimed: return False
+            self.claimed[symbol] = self.levels.pop(symbol, None)
+            return True
+
+    def release(self, symbol):
+        # vente non exécutée: TP/SL réarmés
+        with self.lock:
+            lv = self.claimed.pop(symbol, None)
+            if lv and symbol in self.positions: self.levels[symbol] = lv
+
+    def disarm(self, symbol):
+        with self.lock:
+            self.levels.pop(symbol, None); self.claimed.pop(symbol, None)
+            pos = self.positions.pop(symbol, None)
+            if pos is not None:
+                self.record("close", symbol=symbol)
+                if self.on_close: self.on_close(symbol)
+            return pos
+
+    # ========= Déclenchement =========
+    def on_price(self, symbol, price, now=None, t0=None):
+        t0 = t0 or time.perf_counter()
+        lv = self.levels.get(symbol)
+        if not lv: return None
+        tp, sl = lv
+        if   price >= tp: reason = "TP"
+        elif price <= sl: reason = "SL"
+        else: return None
+        with self.lock:
+            if self.levels.get(symbol) != lv: return None   # déjà soldée par un autre thread
+            size = size_str(self.ex, symbol, self.positions[symbol]["size"])
+            if not size:   # sous baseMinSize: refusé par l'exchange à chaque essai
+                self.logger.warning(f"{symbol} {reason} ignoré: taille {self.positions[symbol]['size']} sous le minimum")
+                return None
+            with self._urgent():
+                res = self.ex.place_order(symbol, "sell", size=size, type_="market")
+            lat = time.perf_counter() - t0
+            self.latencies.append(lat); metrics.observe("exit_trigger_to_order_seconds", lat, reason=reason)
+            self.fired[reason] += 1
+            self.disarm(symbol)
+            self.cool(symbol, (now or time.time()) + int(CFG.get("COOLDOWN_SEC", 90)))
+        self.logger.info(f"{symbol} SELL {reason} -> {res}")
+        self.alert(f"TP atteint ✅ {symbol} ~{price:.6f}" if reason == "TP" else f"SL déclenché ❌ {symbol} ~{price:.6f}")
+        return reason
+
+    def poll(self, now=None):
+        # repli sans flux: un ticker par position (flux frais → déjà évalué au tick)
+        feed = self.ex.feed
+        for sym in list(self.levels):
+            if feed and feed.fresh(sym): continue
+            try:
+                with self._urgent(): px = float(self.ex.ticker(sym)['price'])
+            except Exception as e:
+                self.logger.warning(f"{sym} ticker TP/SL échoué: {e}"); continue
+            try:
+                self.on_price(sym, px, now)
+            except Exception as e:   # ordre refusé / réseau: les autres symboles restent surveillés
+                self.logger.warning(f"{sym} sortie TP/SL échouée: {e}")
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, interval):
+        # thread de surveillance REST, indépendant du scan des entrées
+        def loop():
+            while True:
+                try: self.poll()
+                except Exception as e: self.logger.warning(f"[Exits] poll: {e}")
+                time.sleep(interval)
+        self._thread = threading.Thread(target=loop, name="exits", daemon=True)
+        self._thread.start()
+        return self
+
+    def metrics(self):
+        lat = sorted(self.latencies)
+        pct = lambda q: (lat[min(len(lat)-1, int(q*len(lat)))]*1000.0) if lat else 0.0
+        return {"armed": len(self.levels), "fired_tp": self.fired["TP"], "fired_sl": self.fired["SL"],
+                "trigger_to_order_ms_p50": pct(0.5), "trigger_to_order_ms_p99": pct(0.99)}
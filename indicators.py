@@ -0,0 +1,214 @@
+# indicators.py — indicateurs scalaires + moteur incrémental par symbole
+from collections import deque
+from itertools import islice
+
+# ========= Indicators =========
+def ema(values, period):
+    if not values or period <= 0: return []
+    k = 2/(period+1)
+    out, prev = [], float(values[0])
+    for v in values:
+        prev = v*k + prev*(1-k)
+        out.append(prev)
+    return out
+
+def rsi(closes, period=14):
+    if len(closes) < period+1: return []
+    gains, losses = [], []
+    for i in range(1, len(closes)):
+        diff = closes[i]-closes[i-1]
+        gains.append(max(diff,0.0)); losses.append(max(-diff,0.0))
+    avg_gain = sum(gains[:period])/period
+    avg_loss = sum(losses[:period])/period
+    rsis = [None]*(period)  # align
+    for i in range(period, len(closes)-1):
+        gain = gains[i]; loss = losses[i]
+        avg_gain = (avg_gain*(period-1)+gain)/period
+        avg_loss = (avg_loss*(period-1)+loss)/period
+        rs = (avg_gain/avg_loss) if avg_loss>0 else 999999
+        rsis.append(100-(100/(1+rs)))
+    return rsis
+
+def adx(kl, period=14):
+    # kl: [time, open, close, high, low, volume, turnover], oldest->newest
+    if len(kl) < period+2: return 0.0
+    highs  = [float(k[3]) for k in kl]
+    lows   = [float(k[4]) for k in kl]
+    closes = [float(k[2]) for k in kl]
+    trs, pdms, ndms = [], [], []
+    for i in range(1, len(kl)):
+        up    = highs[i]-highs[i-1]
+        down  = lows[i-1]-lows[i]
+        pDM   = up   if (up>down and up>0)   else 0.0
+        nDM   = down if (down>up and down>0) else 0.0
+        tr = max(highs[i]-lows[i],
+                 abs(highs[i]-closes[i-1]),
+                 abs(lows[i]-closes[i-1]))
+        trs.append(tr); pdms.append(pDM); ndms.append(nDM)
+    # Wilder smoothing
+    def wilder_smooth(vals, p):
+        if len(vals) < p: return []
+        sm = [sum(vals[:p])]
+        for i in range(p, len(vals)):
+            sm.append(sm[-1] - (sm[-1]/p) + vals[i])
+        return sm
+    trN  = wilder_smooth(trs, period)
+    pDMN = wilder_smooth(pdms, period)
+    nDMN = wilder_smooth(ndms, period)
+    if not (trN and pDMN and nDMN): return 0.0
+    di_plus  = [100*(pDMN[i]/trN[i]) if trN[i]>0 else 0 for i in range(len(trN))]
+    di_minus = [100*(nDMN[i]/trN[i]) if trN[i]>0 else 0 for i in range(len(trN))]
+    dx = [100*abs(di_plus[i]-di_minus[i])/(di_plus[i]+di_minus[i]) if (di_plus[i]+di_minus[i])>0 else 0
+          for i in range(len(di_plus))]
+    # Average DX (ADX)
+    if len(dx) < period: return 0.0
+    adx_vals = [sum(dx[:period])/period]
+    for i in range(period, len(dx)):
+        adx_vals.append((adx_vals[-1]*(period-1)+dx[i])/period)
+    return adx_vals[-1]
+
+def atr_pct(kl, period=14):
+    if len(kl) < period+1: return 0.0
+    trs = []
+    for i in range(1, len(kl)):
+        h = float(kl[i][3]); l = float(kl[i][4]); pc = float(kl[i-1][2])
+        trs.append(max(h-l, abs(h-pc), abs(l-pc)))
+    atr = sum(trs[-period:]) / period
+    last_close = float(kl[-1][2])
+    return (atr/last_close)*100 if last_close>0 else 0.0
+
+# ========= Moteur incrémental =========
+# Même arithmétique que les fonctions ci-dessus, appliquée barre par barre:
+# après ingestion de kl, chaque valeur == fonction(kl ingérées depuis le début).
+class IndicatorState:
+    # rsi_periods / hl_periods: périodes supplémentaires (rsi_at / hh_at / ll_at); rsi, hh, ll lisent la période principale
+    def __init__(self, ema_periods=(20, 50, 200), rsi_period=14, adx_period=14, atr_period=14, hl_period=20,
+                 rsi_periods=(), hl_periods=()):
+        self.ema_periods = tuple(sorted(set(ema_periods)))
+        self.rsi_p, self.adx_p, self.atr_p, self.hl_p = rsi_period, adx_period, atr_period, hl_period
+        self.rsi_ps = tuple(sorted({rsi_period, *rsi_periods})); self.hl_ps = tuple(sorted({hl_period, *hl_periods}))
+        self.last_ts = None; self.last_row = None
+        self._base = None   # état avant la dernière barre (bougie en formation)
+        self.s = self._fresh()
+
+    def _fresh(self):
+        return {
+            "n": 0, "close": 0.0, "high": 0.0, "low": 0.0,
+            "ema": {p: (None, None) for p in self.ema_periods},   # (avant-dernière, dernière)
+            "rsi": {p: [0, 0, 0.0, 0.0, None] for p in self.rsi_ps},   # [Σgains, Σpertes, moy. gains, moy. pertes, rsi]
+            "tr_n": 0, "tr_s": 0, "p_s": 0, "n_s": 0, "dx_n": 0, "dx_sum": 0, "adx": None,
+            "trs": deque(maxlen=self.atr_p),
+            "highs": deque(maxlen=self.hl_ps[-1]), "lows": deque(maxlen=self.hl_ps[-1]),
+        }
+
+    @staticmethod
+    def _copy(s):
+        s = dict(s)
+        s["ema"] = dict(s["ema"]); s["rsi"] = {p: list(v) for p, v in s["rsi"].items()}
+        for k in ("trs", "highs", "lows"): s[k] = deque(s[k], maxlen=s[k].maxlen)
+        return s
+
+    # kl: [time, open, close, high, low, volume, turnover], oldest->newest
+    def update(self, kl):
+        for i, row in enumerate(kl):
+            ts = int(row[0])
+            if self.last_ts is not None and ts <= self.last_ts:
+                if ts == self.last_ts and list(row) != self.last_row:
+                    # révision de la bougie en formation → on rejoue depuis l'état d'avant
+                    self.s = self._copy(self._base); self._apply(row); self.last_row = list(row)
+                continue
+            # seule la dernière barre peut encore bouger: inutile de sauvegarder les autres
+            if i == len(kl)-1: self._base = self._copy(self.s)
+            self._apply(row); self.last_ts = ts; self.last_row = list(row)
+        return self
+
+    def _apply(self, row):
+        s = self.s
+        c = float(row[2]); h = float(row[3]); l = float(row[4])
+        # EMA
+        for p, (_, prev) in s["ema"].items():
+            k = 2/(p+1)
+            if prev is None: prev = c
+            s["ema"][p] = (prev, c*k + prev*(1-k))
+        if s["n"] > 0:
+            pc, ph, pl = s["close"], s["high"], s["low"]
+            d = s["n"]   # nombre de différences après celle-ci
+            # RSI (Wilder), une accumulation par période
+            diff = c-pc; g = max(diff, 0.0); ls = max(-diff, 0.0)
+            for P, r in s["rsi"].items():
+                if d <= P:
+                    r[0] += g; r[1] += ls
+                    if d == P: r[2] = r[0]/P; r[3] = r[1]/P
+                else:
+                    r[2] = (r[2]*(P-1)+g)/P
+                    r[3] = (r[3]*(P-1)+ls)/P
+                    rs = (r[2]/r[3]) if r[3]>0 else 999999
+                    r[4] = 100-(100/(1+rs))
+            # TR / DM
+            up = h-ph; down = pl-l
+            pDM = up   if (up>down and up>0)   else 0.0
+            nDM = down if (down>up and down>0) else 0.0
+            tr = max(h-l, abs(h-pc), abs(l-pc))
+            s["trs"].append(tr)
+            # ADX (Wilder)
+            P = self.adx_p; s["tr_n"] += 1
+            if s["tr_n"] <= P:
+                s["tr_s"] += tr; s["p_s"] += pDM; s["n_s"] += nDM
+            else:
+                s["tr_s"] = s["tr_s"] - (s["tr_s"]/P) + tr
+                s["p_s"]  = s["p_s"]  - (s["p_s"]/P)  + pDM
+                s["n_s"]  = s["n_s"]  - (s["n_s"]/P)  + nDM
+            if s["tr_n"] >= P:
+                trN = s["tr_s"]
+                dip = 100*(s["p_s"]/trN) if trN>0 else 0
+                dim = 100*(s["n_s"]/trN) if trN>0 else 0
+                dx = 100*abs(dip-dim)/(dip+dim) if (dip+dim)>0 else 0
+                s["dx_n"] += 1
+                if s["dx_n"] <= P:
+                    s["dx_sum"] += dx
+                    if s["dx_n"] == P: s["adx"] = s["dx_sum"]/P
+                else:
+                    s["adx"] = (s["adx"]*(P-1)+dx)/P
+        s["highs"].append(h); s["lows"].append(l)
+        s["close"], s["high"], s["low"] = c, h, l
+        s["n"] += 1
+
+    # ========= Lecture =========
+    @property
+    def n(self): return self.s["n"]
+    @property
+    def close(self): return self.s["close"]
+
+    def ema(self, period, prev=False):
+        return self.s["ema"][period][0 if prev else 1]
+
+    @property
+    def rsi(self):
+        return self.s["rsi"][self.rsi_p][4]
+
+    def rsi_at(self, period):
+        return self.s["rsi"][period][4]
+
+    @property
+    def adx(self):
+        return self.s["adx"] if (self.s["adx"] is not None and self.n >= self.adx_p+2) else 0.0
+
+    @property
+    def atr_pct(self):
+        if self.n < self.atr_p+1: return 0.0
+        atr = sum(self.s["trs"]) / self.atr_p
+        c = self.s["close"]
+        return (atr/c)*100 if c>0 else 0.0
+
+    @property
+    def hh(self): return self.hh_at(self.hl_p)
+    @property
+    def ll(self): return self.ll_at(self.hl_p)
+
+    def hh_at(self, period):
+        h = self.s["highs"]
+        return max(h) if period >= len(h) else max(islice(reversed(h), period))
+
+    def ll_at(self, period):
+        l = self.s["lows"]
+        return min(l) if period >= len(l) else min(islice(reversed(l), period))
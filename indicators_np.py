@@ -0,0 +1,176 @@
+# indicators_np.py — backend NumPy optionnel: indicateurs en bloc (symboles × barres)
+# Les boucles ne portent que sur l'axe des barres; chaque opération traite tous les symboles.
+# Arithmétique dans le même ordre que indicators.py → mêmes valeurs au bit près.
+try:
+    import numpy as np
+except ImportError:  # numpy optionnel (pip install numpy)
+    np = None
+
+# colonnes du tableau OHLCV
+T, O, H, L, C, V = range(6)
+
+def available():
+    return np is not None
+
+def parse_klines(kl):
+    # kl KuCoin: [time, open, close, high, low, volume, turnover] → float64 [t, o, h, l, c, v]
+    if not kl: return np.empty((0, 6))
+    a = np.array([k[:6] for k in kl], dtype=np.float64)
+    return np.ascontiguousarray(a[:, [0, 1, 3, 4, 2, 5]])
+
+def stack(payloads, bars=240):
+    # payloads: {symbol: kl | ndarray OHLCV}. Garde les `bars` dernières barres des symboles assez longs.
+    syms, rows = [], []
+    for sym, kl in payloads.items():
+        a = kl if isinstance(kl, np.ndarray) else parse_klines(kl)
+        if len(a) < bars: continue
+        syms.append(sym); rows.append(a[-bars:])
+    block = np.stack(rows) if rows else np.empty((0, bars, 6))
+    return syms, block   # block: (symboles, barres, 6)
+
+# ========= Indicateurs 2-D =========
+def _seq_sum(x, n):
+    # somme gauche→droite comme sum() (np.sum est pairwise → arrondis différents)
+    s = np.zeros(x.shape[0])
+    for i in range(n): s = s + x[:, i]
+    return s
+
+def ema(x, period):
+    out = np.empty_like(x)
+    if x.shape[1] == 0 or period <= 0: return out
+    k = 2/(period+1); prev = x[:, 0].copy()
+    for j in range(x.shape[1]):
+        prev = x[:, j]*k + prev*(1-k)
+        out[:, j] = prev
+    return out
+
+def rsi(c, period=14):
+    # (S, B-1), NaN là où la version scalaire met None
+    S, B = c.shape
+    out = np.full((S, max(B-1, 0)), np.nan)
+    if B < period+1: return out
+    diff = c[:, 1:] - c[:, :-1]
+    gains = np.maximum(diff, 0.0); losses = np.maximum(-diff, 0.0)
+    avg_g = _seq_sum(gains, period)/period
+    avg_l = _seq_sum(losses, period)/period
+    for i in range(period, B-1):
+        avg_g = (avg_g*(period-1)+gains[:, i])/period
+        avg_l = (avg_l*(period-1)+losses[:, i])/period
+        rs = np.divide(avg_g, avg_l, out=np.full(S, 999999.0), where=avg_l > 0)
+        out[:, i] = 100-(100/(1+rs))
+    return out
+
+def true_range(h, l, c):
+    pc = c[:, :-1]; hh = h[:, 1:]; lo = l[:, 1:]
+    return np.maximum(np.maximum(hh-lo, np.abs(hh-pc)), np.abs(lo-pc))
+
+def adx(h, l, c, period=14):
+    # dernière valeur ADX (Wilder) par symbole
+    S, B = c.shape
+    if B < period+2 or B-1 < 2*period-1: return np.zeros(S)
+    up = h[:, 1:]-h[:, :-1]; down = l[:, :-1]-l[:, 1:]
+    pdm = np.where((up > down) & (up > 0), up, 0.0)
+    ndm = np.where((down > up) & (down > 0), down, 0.0)
+    tr = true_range(h, l, c)
+    trN = _seq_sum(tr, period); pN = _seq_sum(pdm, period); nN = _seq_sum(ndm, period)
+    zero = np.zeros(S)
+    def dx_at():
+        ok = trN > 0
+        dip = np.where(ok, 100*np.divide(pN, trN, out=zero.copy(), where=ok), 0)
+        dim = np.where(ok, 100*np.divide(nN, trN, out=zero.copy(), where=ok), 0)
+        den = dip+dim
+        return np.divide(100*np.abs(dip-dim), den, out=zero.copy(), where=den > 0)
+    dxs = [dx_at()]
+    for i in range(period, B-1):
+        trN = trN - (trN/period) + tr[:, i]
+        pN  = pN  - (pN/period)  + pdm[:, i]
+        nN  = nN  - (nN/period)  + ndm[:, i]
+        dxs.append(dx_at())
+    dx = np.stack(dxs, axis=1)
+    a = _seq_sum(dx, period)/period
+    for i in range(period, dx.shape[1]):
+        a = (a*(period-1)+dx[:, i])/period
+    return a
+
+def atr_pct(h, l, c, period=14):
+    S, B = c.shape
+    if B < period+1: return np.zeros(S)
+    tr = true_range(h[:, -period-1:], l[:, -period-1:], c[:, -period-1:])   # seules les period dernières TR servent
+    atr = _seq_sum(tr, period)/period
+    last = c[:, -1]
+    return np.divide(atr, last, out=np.zeros(S), where=last > 0)*100
+
+def donchian(h, l, n=20):
+    # plus haut / plus bas glissants sur n barres (barre courante incluse); NaN avant n barres
+    S, B = h.shape
+    hi = np.full((S, B), np.nan); lo = np.full((S, B), np.nan)
+    if B >= n:
+        win = np.lib.stride_tricks.sliding_window_view
+        hi[:, n-1:] = win(h, n, axis=1).max(axis=2)
+        lo[:, n-1:] = win(l, n, axis=1).min(axis=2)
+    return hi, lo
+
+# ========= API batch =========
+class BatchView:
+    # même interface de lecture qu'IndicatorState, pour signals_ensemble & co (valeurs figées pour la fenêtre du cycle)
+    def __init__(self, res, i):
+        self.r, self.i = res, i
+    def update(self, kl): return self
+    @property
+    def n(self): return self.r["bars"]
+    @property
+    def close(self): return float(self.r["close"][self.i])
+    def ema(self, period, prev=False):
+        return float(self.r["ema"][period][self.i, -2 if prev else -1])
+    @property
+    def rsi(self): return self.rsi_at(self.r["rsi_p"])
+    def rsi_at(self, period):
+        v = self.r["rsi"][period][self.i]
+        return None if np.isnan(v) else float(v)
+    @property
+    def adx(self): return float(self.r["adx"][self.i])
+    @property
+    def atr_pct(self): return float(self.r["atr_pct"][self.i])
+    @property
+    def hh(self): return self.hh_at(self.r["hl_p"])
+    @property
+    def ll(self): return self.ll_at(self.r["hl_p"])
+    def hh_at(self, period): return float(self.r["hh"][period][self.i])
+    def ll_at(self, period): return float(self.r["ll"][period][self.i])
+
+def batch(payloads, bars=240, ema_periods=(20, 50, 200), rsi_period=14, adx_period=14, atr_period=14, hl_period=20,
+          rsi_periods=(), hl_periods=()):
+    # mêmes arguments qu'IndicatorState (strategy.state_spec); symboles de moins de `bars` barres ignorés
+    if np is None:
+        raise RuntimeError("numpy requis pour INDICATOR_BACKEND=numpy (pip install numpy).")
+    syms, blk = stack(payloads, bars)
+    res = compute(blk, ema_periods, rsi_period, adx_period, atr_period, hl_period, rsi_periods, hl_periods)
+    return {s: BatchView(res, i) for i, s in enumerate(syms)}
+
+def windows(a, bars, chunk=4096, **spec):
+    # indicateurs de chaque fenêtre glissante de `bars` barres d'un tableau OHLCV (N, 6), de la fenêtre finissant en
+    # bars-1 à N-1: un résultat compute() par paquet de `chunk` fenêtres (vues sans copie); lignes lisibles par BatchView
+    if np is None:
+        raise RuntimeError("numpy requis (pip install numpy).")
+    if len(a) < bars: return
+    win = np.lib.stride_tricks.sliding_window_view(a, bars, axis=0).transpose(0, 2, 1)   # (N-bars+1, bars, 6)
+    for s in range(0, len(win), chunk):
+        yield compute(win[s:s+chunk], **spec)
+
+def compute(blk, ema_periods=(20, 50, 200), rsi_period=14, adx_period=14, atr_period=14, hl_period=20,
+            rsi_periods=(), hl_periods=()):
+    # blk (S, B, 6) → indicateurs de la dernière barre de chaque ligne
+    bars = blk.shape[1]
+    # colonnes contiguës (ordre Fortran): les boucles lisent x[:, j] barre par barre
+    h, l, c = (np.asfortranarray(blk[:, :, k]) for k in (H, L, C))
+    res = {"bars": bars, "close": c[:, -1], "rsi_p": rsi_period, "hl_p": hl_period,
+           "ema": {p: ema(c, p)[:, -2:] for p in ema_periods},
+           "adx": adx(h, l, c, adx_period), "atr_pct": atr_pct(h, l, c, atr_period),
+           "rsi": {}, "hh": {}, "ll": {}}
+    for p in {rsi_period, *rsi_periods}:
+        r = rsi(c, p)
+        res["rsi"][p] = r[:, -1] if r.shape[1] else np.full(len(c), np.nan)
+    for p in {hl_period, *hl_periods}:
+        # Donchian de la dernière barre seulement (fenêtre complète: bars >= p)
+        res["hh"][p] = h[:, -p:].max(axis=1); res["ll"][p] = l[:, -p:].min(axis=1)
+    return res
@@ -0,0 +1,95 @@
+# ledger.py — soldes locaux (type de compte, devise) tenus par le flux privé KuCoin (/account/balance + ordres),
+# amorcés une fois par REST puis réconciliés périodiquement; lecture = lookup dict
+import time, threading
+from config import CFG
+from market_feed import MarketFeed
+
+class Ledger:
+    def __init__(self, logger):
+        self.logger = logger
+        self.bal = {}        # (type, devise) -> [total, disponible, bloqué]
+        self.lock = threading.Lock()
+        self.seeded = False; self.last_sync = 0.0
+        self.touched = {}    # devise -> ts d'un fill/annulation pas encore suivi d'un événement de solde
+        self.events = 0; self.drifts = 0; self.reconciles = 0
+        self.feed = None
+
+    def live(self):
+        return self.seeded and self.feed is not None and self.feed.connected
+
+    def get(self, typ, ccy):
+        b = self.bal.get((typ, ccy))
+        return b[0] if b else 0.0
+
+    # ========= REST (amorçage / réconciliation) =========
+    def load(self, accounts):
+        # accounts = get_account_list brut; retourne les écarts constatés vs l'état local
+        fresh = {}
+        for a in accounts:
+            k = (a["type"], a["currency"]); b = fresh.setdefault(k, [0.0, 0.0, 0.0])
+            b[0] += float(a["balance"]); b[1] += float(a["available"]); b[2] += float(a["holds"])
+        with self.lock:
+            drift = {k: (self.get(*k), v[0]) for k, v in fresh.items() if abs(self.get(*k) - v[0]) > 1e-12}
+            drift.update({k: (v[0], 0.0) for k, v in self.bal.items() if k not in fresh and v[0]})
+            if not self.seeded: drift = {}
+            self.bal = fresh; self.touched.clear()
+            self.seeded = True; self.last_sync = time.time()
+        return drift
+
+    def due(self, now=None):
+        # réconciliation: périodique, ou fill sans événement de solde depuis LEDGER_GRACE_SEC (message perdu?)
+        now = now or time.time()
+        if now - self.last_sync >= CFG["LEDGER_RECONCILE_SEC"]: return True
+        return any(now - t > CFG["LEDGER_GRACE_SEC"] for t in list(self.touched.values()))
+
+    def reconcile(self, accounts):
+        drift = self.load(accounts); self.reconciles += 1
+        if drift:
+            self.drifts += len(drift)
+            self.logger.warning(f"[Ledger] écart avec REST corrigé: { {f'{t}:{c}': v for (t, c), v in drift.items()} }")
+        return drift
+
+    # ========= Flux privé (thread WS) =========
+    def on_balance(self, d):
+        # relationEvent "trade.setted", "main.deposit"...: préfixe = type de compte
+        typ = (d.get("relationEvent") or "trade").split(".", 1)[0]
+        with self.lock:
+            self.bal[(typ, d["currency"])] = [float(d["total"]), float(d["available"]), float(d["hold"])]
+            self.touched.pop(d["currency"], None); self.events += 1
+
+    def on_order(self, d):
+        # fill / annulation: base et quote doivent bouger; sans événement de solde → réconciliation anticipée
+        if d.get("type") not in ("match", "filled", "canceled"): return
+        now = time.time()
+        with self.lock:
+            for ccy in d.get("symbol", "").split("-"):
+                self.touched.setdefault(ccy, now)
+
+    def stats(self):
+        return {"live": self.live(), "currencies": len(self.bal), "events": self.events,
+                "reconciles": self.reconciles, "drifts": self.drifts}
+
+class AccountFeed(MarketFeed):
+    # même cycle de vie que MarketFeed (reconnexion, ping), topics privés et token bullet-private
+    private = True
+
+    def __init__(self, logger, ledger, url=None):
+        super().__init__(logger, [], url=url if url is not None else CFG["WS_PRIVATE_URL"])
+        self.ledger = ledger; ledger.feed = self
+
+    def topics(self):
+        return ["/account/balance", "/spotMarket/tradeOrders"]
+
+    def _endpoint(self):
+        if self.url:
+            return self.url, 18.0
+        from kucoin.ws_token.token import GetToken
+        tok = GetToken(CFG["API_KEY"], CFG["API_SECRET"], CFG["API_PASS"], is_sandbox=CFG["SANDBOX"]).get_ws_token(is_private=True)
+        srv = tok["instanceServers"][0]
+        return f"{srv['endpoint']}?token={tok['token']}&connectId={int(time.time()*1000)}", srv["pingInterval"]/1000.0
+
+    def _on_msg(self, msg):
+        if msg.get("type") != "message": return
+        topic = msg.get("topic", ""); data = msg.get("data") or {}
+        if topic == "/account/balance": self.ledger.on_balance(data)
+        elif topic == "/spotMarket/tradeOrders": self.ledger.on_order(data)
@@ -4,7 +4,8 @@ def setup_logger():
     os.makedirs("logs", exist_ok=True)
     logger = logging.getLogger("marlo")
     logger.setLevel(logging.INFO)
-    fmt = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s")
+    wid = os.getenv("WORKER_ID", "")   # mode supervisor: plusieurs process dans le même fichier
+    fmt = logging.Formatter("%(asctime)s | %(levelname)s | " + (f"w{wid} | " if wid else "") + "%(message)s")
     ch = logging.StreamHandler(); ch.setFormatter(fmt)
     fh = logging.FileHandler("logs/app.log"); fh.setFormatter(fmt)
     if not logger.handlers:
@@ -1,91 +1,33 @@
 # main.py — MarloTrader ELITE (ensemble + ATR sizing + regime filter)
-import time, math, traceback
-from collections import defaultdict, deque
+import os, time, traceback
+from collections import defaultdict
 from logger_setup import setup_logger
 from config import CFG
 from exchange import Ku
-from telegram_alerts import send_alert
+from market_feed import MarketFeed
+from ledger import Ledger, AccountFeed
+from exits import ExitManager
+from state_store import StateStore
+from router import QuoteRouter
+from execution import Executor, size_str
+from indicators import ema, atr_pct, IndicatorState
+from telegram_alerts import send_alert, dispatcher as alerts
+from supervisor import RiskClient, shard_of
+import metrics
+import strategy
+import portfolio
+import indicators_np
 
 logger = setup_logger()
 
-# ========= State (volatile) =========
+# ========= State (persisté via exits.journal en live) =========
 positions = {}                 # positions[symbol] = {"entry": float, "size": float}
 cooldown  = defaultdict(float) # symbol -> next_allowed_ts
-
-# ========= Indicators =========
-def ema(values, period):
-    if not values or period <= 0: return []
-    k = 2/(period+1)
-    out, prev = [], float(values[0])
-    for v in values:
-        prev = v*k + prev*(1-k)
-        out.append(prev)
-    return out
-
-def rsi(closes, period=14):
-    if len(closes) < period+1: return []
-    gains, losses = [], []
-    for i in range(1, len(closes)):
-        diff = closes[i]-closes[i-1]
-        gains.append(max(diff,0.0)); losses.append(max(-diff,0.0))
-    avg_gain = sum(gains[:period])/period
-    avg_loss = sum(losses[:period])/period
-    rsis = [None]*(period)  # align
-    for i in range(period, len(closes)-1):
-        gain = gains[i]; loss = losses[i]
-        avg_gain = (avg_gain*(period-1)+gain)/period
-        avg_loss = (avg_loss*(period-1)+loss)/period
-        rs = (avg_gain/avg_loss) if avg_loss>0 else 999999
-        rsis.append(100-(100/(1+rs)))
-    return rsis
-
-def adx(kl, period=14):
-    # kl: [time, open, close, high, low, volume, turnover], oldest->newest
-    if len(kl) < period+2: return 0.0
-    highs  = [float(k[3]) for k in kl]
-    lows   = [float(k[4]) for k in kl]
-    closes = [float(k[2]) for k in kl]
-    trs, pdms, ndms = [], [], []
-    for i in range(1, len(kl)):
-        up    = highs[i]-highs[i-1]
-        down  = lows[i-1]-lows[i]
-        pDM   = up   if (up>down and up>0)   else 0.0
-        nDM   = down if (down>up and down>0) else 0.0
-        tr = max(highs[i]-lows[i],
-                 abs(highs[i]-closes[i-1]),
-                 abs(lows[i]-closes[i-1]))
-        trs.append(tr); pdms.append(pDM); ndms.append(nDM)
-    # Wilder smoothing
-    def wilder_smooth(vals, p):
-        if len(vals) < p: return []
-        sm = [sum(vals[:p])]
-        for i in range(p, len(vals)):
-            sm.append(sm[-1] - (sm[-1]/p) + vals[i])
-        return sm
-    trN  = wilder_smooth(trs, period)
-    pDMN = wilder_smooth(pdms, period)
-    nDMN = wilder_smooth(ndms, period)
-    if not (trN and pDMN and nDMN): return 0.0
-    di_plus  = [100*(pDMN[i]/trN[i]) if trN[i]>0 else 0 for i in range(len(trN))]
-    di_minus = [100*(nDMN[i]/trN[i]) if trN[i]>0 else 0 for i in range(len(trN))]
-    dx = [100*abs(di_plus[i]-di_minus[i])/(di_plus[i]+di_minus[i]) if (di_plus[i]+di_minus[i])>0 else 0
-          for i in range(len(di_plus))]
-    # Average DX (ADX)
-    if len(dx) < period: return 0.0
-    adx_vals = [sum(dx[:period])/period]
-    for i in range(period, len(dx)):
-        adx_vals.append((adx_vals[-1]*(period-1)+dx[i])/period)
-    return adx_vals[-1]
-
-def atr_pct(kl, period=14):
-    if len(kl) < period+1: return 0.0
-    trs = []
-    for i in range(1, len(kl)):
-        h = float(kl[i][3]); l = float(kl[i][4]); pc = float(kl[i-1][2])
-        trs.append(max(h-l, abs(h-pc), abs(l-pc)))
-    atr = sum(trs[-period:]) / period
-    last_close = float(kl[-1][2])
-    return (atr/last_close)*100 if last_close>0 else 0.0
+ind_states = {}                # symbol -> IndicatorState (fenêtre du cycle, ou état continu si INDICATOR_STREAM)
+WINDOW = 240                   # bougies 15min par symbole et par cycle (regime EMA200 + warmup)
+exits = ExitManager(positions, cooldown, logger, send_alert)   # TP/SL au fil des prix
+executor = Executor(logger)    # ordres limit/TWAP, fills réels (prix moyen, frais)
+risk = None                    # RiskClient en mode supervisor: MAX_POSITIONS global + réservations de capital
 
 # ========= Market utils =========
 def spread_pct(t):
@@ -93,11 +35,6 @@ def spread_pct(t):
     mid = (bid+ask)/2 if (bid>0 and ask>0) else 0.0
     return ((ask-bid)/mid*100) if mid>0 else 999.0
 
-def value_in_quote(ex, symbol, base_amount):
-    tick = ex.ticker(symbol)
-    price = float(tick['price'])
-    return base_amount*price
-
 def free_after_reserve(quote, free_quote):
     if quote == "USDT":
         return max(0.0, free_quote - CFG.get("RESERVE_USDT", 20.0))
@@ -105,308 +42,452 @@ def free_after_reserve(quote, free_quote):
         return max(0.0, free_quote - CFG.get("RESERVE_BTC", 0.0002))
     return free_quote
 
-def calc_position_size_by_atr(ex, symbol, quote: str, kl, risk_usd: float):
+def calc_position_size_by_atr(ex, symbol, quote: str, kl, risk_usd: float, ind=None, rate=1.0):
     # risque $ / ATR$ ≈ taille en base, puis snap via increments dans ensure_qty
-    last = float(kl[-1][2])
-    atrp = atr_pct(kl, 14)
-    if atrp <= 0: return 0.0
+    last = ind.close if ind else float(kl[-1][2])
+    atrp = ind.atr_pct if ind else atr_pct(kl, 14)
+    if atrp <= 0 or rate <= 0: return 0.0
     atr_abs = last*(atrp/100.0)
     if atr_abs <= 0: return 0.0
-    # risk in quote (assume quote ~ USD if USDT; for BTC we approximate using pair price)
-    # We'll just use risk_usd as "risk in quote"; it's fine for USDT, reasonable for BTC too.
-    # Size in base ≈ risk_in_quote / ATR_abs
-    base_size = risk_usd / atr_abs
+    # risk_usd est exprimé en PORTFOLIO_CCY; rate = valeur d'1 quote dans cette devise (1 pour USDT, ~prix BTC pour BTC)
+    base_size = (risk_usd / rate) / atr_abs
     return max(base_size, 0.0)
 
 # ========= Ensemble signals =========
-def signals_ensemble(ex, symbol, kl):
-    closes = [float(k[2]) for k in kl]
-    highs  = [float(k[3]) for k in kl]
-    lows   = [float(k[4]) for k in kl]
-    if len(closes) < 60: 
-        return None, {"ema":None,"bo":None,"mr":None}
-
-    # 1) EMA Cross
-    e20 = ema(closes, 20); e50 = ema(closes, 50)
-    ema_sig = None
-    if e20[-2] <= e50[-2] and e20[-1] > e50[-1]: ema_sig = "buy"
-    elif e20[-2] >= e50[-2] and e20[-1] < e50[-1]: ema_sig = "sell"
-
-    # 2) Breakout (20)
-    hh20 = max(highs[-20:]); ll20 = min(lows[-20:])
-    bo_sig = None
-    if closes[-1] > hh20: bo_sig = "buy"
-    elif closes[-1] < ll20: bo_sig = "sell"
-
-    # 3) Mean Revert (RSI)
-    r = rsi(closes, 14)
-    mr_sig = None
-    if r and r[-1] is not None:
-        if r[-1] < 30: mr_sig = "buy"
-        elif r[-1] > 70: mr_sig = "sell"
-
-    votes = {"ema":ema_sig, "bo":bo_sig, "mr":mr_sig}
-    # Résultat final : si >= threshold vote "buy" ou "sell"
-    th = int(CFG.get("ENSEMBLE_THRESHOLD", 2))
-    b = sum(1 for v in votes.values() if v=="buy")
-    s = sum(1 for v in votes.values() if v=="sell")
-    final = "buy" if b>=th and b>s else ("sell" if s>=th and s>b else None)
-    return final, votes
+def signals_ensemble(ex, symbol, kl, ind=None):
+    # ind: IndicatorState à jour → lecture O(1) au lieu de tout recalculer sur kl;
+    # voteurs et poids: CFG["STRATEGY"] (registre strategy.py)
+    if ind is None:
+        ind = IndicatorState(**strategy.state_spec()).update(kl)
+    if ind.n < 60:
+        return None, strategy.empty_votes()
+    return strategy.vote(ind)
 
 # ========= Router / pairs =========
-def quotes_graph(ex):
-    g = defaultdict(set)
-    for sym in ex.symbols_map().keys():
-        base, quote = sym.split('-')
-        g[base].add(quote)   # vendre base -> quote
-        g[quote].add(base)   # acheter base en payant quote
-    return g
-
-def find_quote_path(ex, start_q, target_q, max_hops=3):
-    if start_q == target_q: return [start_q]
-    g = quotes_graph(ex)
-    seen = {start_q}; dq = deque([(start_q, [start_q])])
-    while dq:
-        cur, path = dq.popleft()
-        if len(path) > max_hops+1: continue
-        for nxt in g[cur]:
-            if nxt in seen: continue
-            np = path+[nxt]
-            if nxt == target_q: return np
-            seen.add(nxt); dq.append((nxt,np))
-    return None
+router = QuoteRouter()   # graphe persistant, mis à jour quand la liste des symboles change
+
+def find_quote_path(ex, start_q, target_q, max_hops=3, amount=1.0):
+    route = router.best(ex, start_q, target_q, amount, max_hops)
+    return route["path"] if route else None
 
 def best_price(ex, pair, side):
     t = ex.ticker(pair)
     return float(t['bestAsk']) if side=="buy" else float(t['bestBid'])
 
-def execute_quote_path(ex, path, amount_in_start):
+def execute_quote_path(ex, path, amount_in_start, legs=None):
+    # legs: [(pair, side, px)] de la route → pas de ticker par leg
     if not path or len(path)<2 or amount_in_start<=0: return
     smap = ex.symbols_map()
+    px_of = {(p, sd): px for p, sd, px in (legs or [])}
     amt = amount_in_start
+    leg_id = f"{int(time.time()*1000)}-{'-'.join(path)}"
     for i in range(len(path)-1):
         q_from, q_to = path[i], path[i+1]
+        exits.record("leg", id=leg_id, path=path, step=i, amount=amt)   # leg en vol, retrouvé au boot si crash
         sell_pair = f"{q_from}-{q_to}"
         buy_pair  = f"{q_to}-{q_from}"
         if sell_pair in smap:
-            size_base = amt
+            size_base = size_str(ex, sell_pair, amt)
+            if not size_base: break
             logger.info(f"[Router] {q_from}->{q_to} via {sell_pair} (sell {size_base} {q_from})")
-            ex.place_order(sell_pair, "sell", size=str(size_base), type_="market")
-            px = best_price(ex, sell_pair, "sell"); amt = size_base*px
+            ex.place_order(sell_pair, "sell", size=size_base, type_="market")
+            px = px_of.get((sell_pair, "sell")) or best_price(ex, sell_pair, "sell"); amt = float(size_base)*px
         elif buy_pair in smap:
-            px = best_price(ex, buy_pair, "buy")
-            size_base = amt/px if px>0 else 0
-            if size_base<=0: break
+            px = px_of.get((buy_pair, "buy")) or best_price(ex, buy_pair, "buy")
+            size_base = size_str(ex, buy_pair, amt/px) if px>0 else None
+            if not size_base: break
             logger.info(f"[Router] {q_from}->{q_to} via {buy_pair} (buy {size_base} {q_to})")
-            ex.place_order(buy_pair, "buy", size=str(size_base), type_="market")
-            amt = size_base
+            ex.place_order(buy_pair, "buy", size=size_base, type_="market")
+            amt = float(size_base)
         else:
             logger.info(f"[Router] Pas de marché entre {q_from} et {q_to}")
             break
+    exits.record("leg_done", id=leg_id)
+
+# ========= Screener =========
+active_set = []                # top-N courant du screener (remplace CFG["SYMBOLS"] si SCREENER)
+
+def batch_indicators(snap, reg_ema):
+    # backend numpy: tous les symboles du prefetch en un bloc; ind_for lit ensuite ces vues (historique court → IndicatorState)
+    if CFG["INDICATOR_BACKEND"] != "numpy" or not snap: return
+    views = indicators_np.batch({s: d["kl"] for s, d in snap.items()}, WINDOW, **strategy.state_spec(reg_ema))
+    for s in snap:
+        if s in views: ind_states[s] = views[s]
+        elif isinstance(ind_states.get(s), indicators_np.BatchView): del ind_states[s]
+
+def ind_for(symbol, kl, reg_ema):
+    # par défaut l'état est reconstruit sur la fenêtre du cycle: EMA/RSI/ADX dépendent du début de la fenêtre, valeurs
+    # identiques aux fonctions d'indicators.py. INDICATOR_STREAM: état conservé entre cycles (O(1) par bougie), mais
+    # les indicateurs à mémoire longue (EMA200, RSI, ADX) s'écartent alors de la fenêtre (tests/test_indicators.py)
+    ind = ind_states.get(symbol)
+    if ind is None or (type(ind) is IndicatorState and not CFG["INDICATOR_STREAM"]):
+        ind = ind_states[symbol] = IndicatorState(**strategy.state_spec(reg_ema))   # features de toutes les stratégies actives
+    return ind.update(kl)
+
+def screen_universe(ex, smap, now):
+    # 1 requête all-tickers → filtre volume 24h + spread → klines/regime/ensemble sur les survivants seulement
+    REG_EMA = int(CFG.get("REGIME_EMA_PERIOD", 200)); ADX_MIN = float(CFG.get("REGIME_ADX_MIN", 18))
+    SPREAD_MAX = float(CFG.get("SPREAD_MAX_PCT", 0.25)); MIN_ATR = float(CFG.get("MIN_ATR_PCT", 0.3))
+    t0 = time.time()
+    tick = ex.all_tickers()
+    usdt = {q: 1.0 if q == "USDT" else float((tick.get(f"{q}-USDT") or {}).get("price") or 0) for q in CFG["QUOTES"]}
+    cands = []
+    for sym, t in tick.items():
+        if sym not in smap: continue
+        q = sym.rsplit('-', 1)[-1]
+        if not usdt.get(q) or not t.get("bestBid") or not t.get("bestAsk"): continue
+        vol = float(t.get("volValue") or 0)*usdt[q]
+        if vol < CFG["SCREEN_MIN_VOL_USDT"] or spread_pct(t) > SPREAD_MAX: continue
+        cands.append((vol, sym))
+    if CFG["SHARD"]:   # mode supervisor: chaque worker ne garde que sa part du marché
+        k, n = map(int, CFG["SHARD"].split("/"))
+        cands = [c for c in cands if shard_of(c[1], n) == k]
+    cands.sort(reverse=True)
+    survivors = [s for _, s in cands[:CFG["SCREEN_MAX_CANDIDATES"]] if now >= cooldown[s]]
+    snap = ex.prefetch(survivors, "15min", limit=WINDOW)
+    batch_indicators(snap, REG_EMA)
+
+    ranked = []
+    for sym, d in snap.items():
+        ind = ind_for(sym, d["kl"], REG_EMA)
+        if ind.n < REG_EMA+5 or ind.close <= ind.ema(REG_EMA) or ind.adx < ADX_MIN: continue
+        if ind.atr_pct < MIN_ATR: continue
+        final, votes = signals_ensemble(ex, sym, d["kl"], ind)
+        score = sum(v == "buy" for v in votes.values()) - sum(v == "sell" for v in votes.values())
+        ranked.append((score, ind.adx, sym))
+    ranked.sort(reverse=True)
+    active_set[:] = [s for _, _, s in ranked[:CFG["SCREEN_TOP_N"]]]
+    logger.info(f"[Screener] {len(tick)} paires → {len(cands)} volume/spread ok → {len(snap)} analysées → "
+                f"top {len(active_set)}: {active_set} ({time.time()-t0:.2f}s)")
+    return list(active_set), snap
 
 # ========= Core loop =========
-def run_loop():
-    logger.info(f"Config: {CFG}")
-    ex = Ku(logger)
-    drift = ex.time_ok()
-    if drift > 15000:
-        logger.warning("Time drift élevé, pense à resynchroniser l'horloge du serveur.")
+def resolve_symbol(symbol, smap, quiet=False):
+    if symbol in smap: return symbol
+    base, _ = symbol.split('-')
+    for q2 in CFG["QUOTES"]:
+        if f"{base}-{q2}" in smap:
+            if not quiet: logger.info(f"{symbol} introuvable → fallback {base}-{q2}")
+            return f"{base}-{q2}"
+    if not quiet: logger.warning(f"{symbol} introuvable, aucune alternative.")
+    return None
 
+def run_cycle(ex, now=None):
     MAX_HOPS  = int(CFG.get("ROUTER_MAX_HOPS", 3))
     MIN_ATR   = float(CFG.get("MIN_ATR_PCT", 0.3))
     COOLDOWN  = int(CFG.get("COOLDOWN_SEC", 90))
-    MAX_ALLOC = float(CFG.get("MAX_POS_ALLOCATION_PCT", 50.0))
     MAX_POS   = int(CFG.get("MAX_POSITIONS", 3))
     ADX_MIN   = float(CFG.get("REGIME_ADX_MIN", 18))
     REG_EMA   = int(CFG.get("REGIME_EMA_PERIOD", 200))
     SPREAD_MAX= float(CFG.get("SPREAD_MAX_PCT", 0.25))
     ATR_RISK  = float(CFG.get("ATR_RISK_USD", 15))
+    IMPACT    = CFG["IMPACT_MAX_PCT"]
+    HTF, HTF_EMA = CFG["REGIME_HTF"], CFG["REGIME_HTF_EMA"]
+
+    ex.new_cycle()
+    smap = ex.symbols_map()
+    now  = time.time() if now is None else now
+    st = metrics.Stages()   # temps par étape du cycle (fetch, indicators, filters, signals, sizing, order)
+    def skip(reason, stage="filters"):
+        st.lap(stage); metrics.inc("rejections_total", reason=reason)
+
+    # Univers: liste fixe, ou top-N du screener (+ positions ouvertes pour pouvoir en sortir)
+    t0 = time.time()
+    universe, snap = CFG["SYMBOLS"], {}
+    if CFG["SCREENER"]:
+        universe, snap = screen_universe(ex, smap, now)
+        universe = universe + [s for s in positions if s not in universe]
+        st.lap("screen")
+
+    # Prefetch: klines + tickers de tous les symboles éligibles en parallèle (déjà en main pour le screener)
+    eligible = []
+    for symbol in universe:
+        if not any(symbol.endswith(f"-{q}") for q in CFG["QUOTES"]): continue
+        symbol = resolve_symbol(symbol, smap, quiet=True)
+        if symbol and now >= cooldown[symbol] and symbol not in eligible:
+            eligible.append(symbol)
+    fresh = ex.prefetch([s for s in eligible if s not in snap], "15min", limit=WINDOW)
+    batch_indicators(fresh, REG_EMA)   # ceux du screener sont déjà calculés
+    snap = {**{s: snap[s] for s in eligible if s in snap}, **fresh}
+    stats = {"symbols": len(eligible), "fetch_sec": time.time()-t0}
+    st.lap("fetch")
+
+    # TP/SL: si aucun flux/thread ne les surveille, on les évalue ici (REST)
+    exits.bind(ex)
+    if not exits.running:
+        exits.poll(now)
+    st.lap("exits")
+
+    # Photo du portefeuille (tous les avoirs en PORTFOLIO_CCY), mise à jour à chaque fill du cycle
+    # ATR des seuls états déjà alimentés (les autres → PORTFOLIO_ATR_FALLBACK_PCT)
+    pf = portfolio.snapshot(ex, positions, {s: i.atr_pct for s, i in ind_states.items() if i.n})
+    stats["portfolio"] = pf.stats()
+    st.lap("portfolio")
+
+    # Parcours par quote (USDT, BTC, etc.)
+    for quote in CFG["QUOTES"]:
+        free_q = free_after_reserve(quote, ex.balance('trade', quote))
+        logger.info(f"[{quote}] balance libre (après réserve): {free_q}")
+
+        symbols_for_quote = [s for s in universe if s.endswith(f"-{quote}")]
+
+        # Parcours des symboles de cette quote
+        for symbol in symbols_for_quote:
+            # Fallback si la paire est absente
+            symbol = resolve_symbol(symbol, smap)
+            if not symbol:
+                continue
+
+            if now < cooldown[symbol]:
+                skip("cooldown"); continue
+
+            base, q_cur = symbol.split('-')
+
+            # Découverte position existante au démarrage
+            base_bal = ex.balance('trade', base)
+            if base_bal > 0 and symbol not in positions:
+                last = float(ex.ticker(symbol)['price'])
+                exits.arm(symbol, last, base_bal)
+                logger.info(f"{symbol} position détectée → entry≈{last:.6f}, size={base_bal}")
+
+            # Regime filter (EMA200 + ADX)
+            if symbol not in snap:
+                skip("no_data"); continue
+            kl = snap[symbol]["kl"]  # WINDOW barres: plus long pour regime
+            ind = ind_for(symbol, kl, REG_EMA)
+            st.lap("indicators")
+            if ind.n < REG_EMA+5:
+                skip("warmup"); continue
+            e200 = ind.ema(REG_EMA)
+            regime_ok = ind.close > e200
+            cur_adx = ind.adx
+            if cur_adx < ADX_MIN:
+                regime_ok = False
+            if not regime_ok:
+                logger.info(f"{symbol} regime off (ADX={cur_adx:.1f}, price {'>' if ind.close>e200 else '<'} EMA{REG_EMA}).")
+                skip("regime"); continue
+            # Tendance de fond sur l'intervalle supérieur (barres agrégées localement, pas de requête en plus)
+            if HTF:
+                htf_close = [float(r[2]) for r in ex.klines(symbol, HTF, limit=HTF_EMA*3)]
+                if len(htf_close) < HTF_EMA or htf_close[-1] < ema(htf_close, HTF_EMA)[-1]:
+                    logger.info(f"{symbol} tendance {HTF} off (clôture < EMA{HTF_EMA} ou historique court).")
+                    skip("regime_htf"); continue
+
+            # Spread filter
+            spr = spread_pct(snap[symbol]["ticker"])
+            if spr > SPREAD_MAX:
+                logger.info(f"{symbol} spread {spr:.2f}% > max {SPREAD_MAX}%, skip.")
+                skip("spread"); continue
+
+            # Volatilité min
+            vol = ind.atr_pct
+            if vol < MIN_ATR:
+                logger.info(f"{symbol} ATR {vol:.2f}% < {MIN_ATR}%, skip.")
+                skip("atr"); continue
+
+            # Ensemble de signaux (EMA cross + Breakout + MeanRevert)
+            final_sig, votes = signals_ensemble(ex, symbol, kl, ind)
+            logger.info(f"{symbol} ensemble={final_sig} votes={votes}")
+            st.lap("signals"); metrics.inc("signals_total", signal=final_sig or "none")
+
+            # SELL (uniquement si position)
+            if final_sig == "sell" and base_bal > 0:
+                if not exits.claim(symbol):   # pas de double vente avec un TP/SL concurrent
+                    skip("in_exit", "order"); continue
+                fill = executor._zero()
+                try:
+                    fill = executor.execute(ex, symbol, "sell", base_bal)
+                finally:   # exception d'exécution → TP/SL réarmés
+                    if fill["size"] > 0: exits.disarm(symbol)
+                    else: exits.release(symbol)
+                if fill["size"] <= 0:
+                    logger.info(f"{symbol} SELL non exécuté (taille sous minimum ou aucun fill).")
+                    skip("no_fill", "order"); continue
+                pf.fill(symbol, "sell", fill["size"], fill["avg"])
+                logger.info(f"{symbol} SELL -> {fill['size']:.8g} @ {fill['avg']:.8g} (fees {fill['fee']:.6g})")
+                send_alert(f"SELL {symbol} size={fill['size']:.8g} @ {fill['avg']:.8g} votes={votes}")
+                exits.cool(symbol, now + COOLDOWN)
+                st.lap("order"); metrics.inc("orders_total", side="sell")
+                continue
+
+            # BUY
+            if final_sig == "buy":
+                # Max positions globales
+                if len(positions) >= MAX_POS:
+                    logger.info(f"Max positions ({MAX_POS}) atteint, skip buy {symbol}.")
+                    skip("max_positions", "sizing"); continue
+                # Pas de double empilement
+                if base_bal > 0 or symbol in positions:
+                    logger.info(f"{symbol} déjà en position, skip.")
+                    skip("in_position", "sizing"); continue
+                # Quote dispo ? sinon router
+                free_here = free_after_reserve(q_cur, ex.balance('trade', q_cur))
+                min_quote = CFG.get("MIN_TRADE_USDT", 10.0)
+                if free_here < min_quote:
+                    # multi-hop: trouve chemin depuis la quote avec plus de solde
+                    start_quotes = sorted(CFG["QUOTES"], key=lambda q: ex.balance('trade', q), reverse=True)
+                    path_found = False
+                    for q_start in start_quotes:
+                        if q_start == q_cur: continue
+                        bal_start = free_after_reserve(q_start, ex.balance('trade', q_start))
+                        if bal_start <= 0: continue
+                        route = router.best(ex, q_start, q_cur, bal_start, MAX_HOPS)
+                        if route:
+                            need = min_quote - free_here
+                            # montant à convertir exprimé en q_start via le taux attendu (+1% de marge)
+                            amt_in = min(bal_start, need/route["rate"]*1.01) if route["rate"] > 0 else bal_start
+                            logger.info(f"[Router] chemin {route['path']} pour obtenir {q_cur} (need≈{need}, "
+                                        f"in≈{amt_in:.8f} {q_start}, out attendu≈{amt_in*route['rate']:.8f})")
+                            execute_quote_path(ex, route["path"], amt_in, route["legs"])
+                            path_found = True
+                            break
+                    free_here = free_after_reserve(q_cur, ex.balance('trade', q_cur))
+                    if not path_found or free_here < min_quote:
+                        logger.info(f"{symbol} pas assez de {q_cur} après routage, skip.")
+                        skip("no_quote", "sizing"); continue
+
+                # Position sizing par ATR
+                base_target = calc_position_size_by_atr(ex, symbol, q_cur, kl, float(CFG.get("ATR_RISK_USD", 15)), ind,
+                                                        portfolio.rate(ex.all_tickers(), q_cur, pf.home))
+                if base_target <= 0:
+                    logger.info(f"{symbol} sizing ATR nul, skip.")
+                    skip("sizing", "sizing"); continue
+
+                # Convertir en quote montant et snap qty
+                bid = float(ex.ticker(symbol)['bestBid'])
+                quote_amt = base_target * bid
+                # hard cap par free_here
+                quote_amt = min(quote_amt, free_here)
+                if quote_amt < min_quote:
+                    logger.info(f"{symbol} quote_amt {quote_amt:.4f} < min {min_quote}, skip.")
+                    skip("min_trade", "sizing"); continue
+
+                # Profondeur: taille plafonnée au budget d'impact (VWAP attendu vs meilleur ask)
+                if IMPACT > 0 and hasattr(ex, "book_impact"):
+                    try:
+                        imp = ex.book_impact(symbol, "buy", quote_amt / bid, IMPACT)
+                    except Exception as e:
+                        logger.warning(f"{symbol} carnet indisponible: {e}"); skip("no_book", "sizing"); continue
+                    if imp["cap"] * bid < quote_amt:
+                        logger.info(f"{symbol} carnet mince: slippage attendu {imp['slip_pct']:.3f}% > {IMPACT}%, "
+                                    f"taille {quote_amt:.4f} → {imp['cap']*bid:.4f} {q_cur}")
+                        quote_amt = imp["cap"] * bid
+                    if quote_amt < min_quote:
+                        skip("liquidity", "sizing"); continue
+
+                # Risque portefeuille: allocation du coin, exposition totale / par quote, risque ATR (après cet achat)
+                room, why = pf.headroom(symbol, ind.atr_pct)
+                if room < quote_amt:
+                    logger.info(f"{symbol} plafond {why} atteint ({pf.stats()}), taille {quote_amt:.4f} → {room:.4f} {q_cur}")
+                    quote_amt = room
+                if quote_amt < min_quote:
+                    skip(why, "sizing"); continue
+
+                # Ensure qty via increments (baseIncrement/baseMinSize)
+                qty = size_str(ex, symbol, quote_amt / bid)
+                if not qty:
+                    logger.info(f"{symbol} qty<=0 après snap, skip.")
+                    skip("qty", "sizing"); continue
+
+                # Coordinateur global (mode supervisor): slot de position + capital réservé avant l'ordre
+                if risk:
+                    ok, why = risk.reserve(symbol, q_cur, float(qty)*bid, free_here)
+                    if not ok:
+                        logger.info(f"{symbol} refusé par le coordinateur ({why}), skip.")
+                        skip(why, "sizing"); continue
+                st.lap("sizing")
+                fill = executor.execute(ex, symbol, "buy", qty)
+                if fill["size"] <= 0:
+                    if risk: risk.release(symbol)
+                    logger.info(f"{symbol} BUY sans fill, skip.")
+                    skip("no_fill", "order"); continue
+                if risk: risk.commit(symbol)
+                pf.fill(symbol, "buy", fill["size"], fill["avg"], ind.atr_pct)
+                logger.info(f"{symbol} BUY -> {fill['size']:.8g} @ {fill['avg']:.8g} (fees {fill['fee']:.6g})")
+                send_alert(f"BUY {symbol} qty={fill['size']:.8g} @ {fill['avg']:.8g} votes={votes}")
+                levels = exits.arm(symbol, fill["avg"], fill["size"])   # TP/SL sur le prix réellement payé
+                # TP/SL info
+                if levels:
+                    tp, sl = levels
+                    logger.info(f"{symbol} TP/SL armés → TP≈{tp:.6f} / SL≈{sl:.6f}")
+                    send_alert(f"{symbol} TP/SL armés → TP≈{tp:.6f} / SL≈{sl:.6f}")
+                exits.cool(symbol, now + COOLDOWN)
+                st.lap("order"); metrics.inc("orders_total", side="buy")
+    stats["stages"] = st.done()
+    return stats
+
+def run_loop():
+    global risk
+    logger.info(f"Config: {CFG}")
+    th = strategy.check()   # STRATEGY / ENSEMBLE_THRESHOLD incohérents → arrêt immédiat plutôt qu'aucun trade
+    logger.info(f"Stratégies: {strategy.parse()} seuil={th:g}")
+    if CFG["MODE"] == "paper":
+        from paper import PaperKu
+        ex = PaperKu(logger)   # bourse simulée: ordres appariés localement, soldes réels de la simulation
+    else:
+        ex = Ku(logger)
+    drift = ex.time_ok()
+    if drift > 15000:
+        logger.warning("Time drift élevé, pense à resynchroniser l'horloge du serveur.")
+    exits.bind(ex)
+    # pas de journal en paper: soldes simulés non persistés, et le prochain démarrage live reprendrait ces positions
+    if CFG["STATE_DIR"] and CFG["MODE"] != "paper":
+        t0 = time.time()
+        exits.journal = StateStore(CFG["STATE_DIR"])
+        state, replayed = exits.journal.load()
+        exits.restore(state)
+        logger.info(f"État rechargé en {(time.time()-t0)*1000:.1f} ms: {len(positions)} positions, "
+                    f"{len(state['cooldown'])} cooldowns, {replayed} entrées de journal rejouées")
+        for leg_id, leg in state["legs"].items():
+            logger.warning(f"[Router] leg interrompu {leg_id}: {leg} → vérifier les soldes")
+            send_alert(f"Routage interrompu au redémarrage: {leg['path']} étape {leg['step']}")
+    if CFG["WORKER_ID"]:
+        risk = RiskClient(CFG["COORD_PORT"], bytes.fromhex(os.environ["COORD_AUTHKEY"]), CFG["WORKER_ID"], CFG["API_KEY"])
+        risk.sync(positions)              # positions rechargées = slots déjà pris
+        exits.on_close = risk.close
+    if CFG["WS_ENABLED"] and CFG["MODE"] != "paper":
+        feed = MarketFeed(logger, CFG["SYMBOLS"])
+        feed.listeners.append(exits.on_price)   # TP/SL évalués à chaque tick
+        if CFG["WS_L2"]: feed.attach_books(ex.books)
+        ex.attach_feed(feed.start())
+    if CFG["LEDGER_WS"] and CFG["MODE"] != "paper":
+        ledger = Ledger(logger)
+        ex.attach_ledger(ledger); AccountFeed(logger, ledger).start()
+    if CFG.get("ENABLE_TP_SL", True):
+        exits.start(CFG["EXIT_POLL_SEC"])       # repli REST pour les symboles sans flux frais
+    if CFG["METRICS_PORT"]:
+        metrics.serve(CFG["METRICS_HOST"], CFG["METRICS_PORT"])
+        logger.info(f"Métriques: http://{CFG['METRICS_HOST']}:{CFG['METRICS_PORT']}/metrics (profil: /profile?seconds=10)")
 
     while True:
         try:
-            smap = ex.symbols_map()
-            now  = time.time()
-
-            # Parcours par quote (USDT, BTC, etc.)
-            for quote in CFG["QUOTES"]:
-                free_q = free_after_reserve(quote, ex.balance('trade', quote))
-                logger.info(f"[{quote}] balance libre (après réserve): {free_q}")
-
-                symbols_for_quote = [s for s in CFG["SYMBOLS"] if s.endswith(f"-{quote}")]
-
-                # Gestion TP/SL côté bot (vend si TP/SL touchés)
-                if positions:
-                    for sym in list(positions.keys()):
-                        if sym.endswith(f"-{quote}") and sym in smap:
-                            entry = positions[sym]["entry"]; size = positions[sym]["size"]
-                            last  = float(ex.ticker(sym)['price'])
-                            if CFG.get("ENABLE_TP_SL", True):
-                                tp = entry*(1+CFG.get("TP_PCT",1.5)/100.0)
-                                sl = entry*(1-CFG.get("SL_PCT",1.0)/100.0)
-                                if last >= tp:
-                                    res = ex.place_order(sym, "sell", size=str(size), type_="market")
-                                    logger.info(f"{sym} SELL TP -> {res}")
-                                    send_alert(f"TP atteint ✅ {sym} ~{last:.6f}")
-                                    positions.pop(sym, None)
-                                    cooldown[sym] = now + COOLDOWN
-                                elif last <= sl:
-                                    res = ex.place_order(sym, "sell", size=str(size), type_="market")
-                                    logger.info(f"{sym} SELL SL -> {res}")
-                                    send_alert(f"SL déclenché ❌ {sym} ~{last:.6f}")
-                                    positions.pop(sym, None)
-                                    cooldown[sym] = now + COOLDOWN
-
-                # Parcours des symboles de cette quote
-                for symbol in symbols_for_quote:
-                    # Fallback si la paire est absente
-                    if symbol not in smap:
-                        base, _ = symbol.split('-')
-                        alt = None
-                        for q2 in CFG["QUOTES"]:
-                            if f"{base}-{q2}" in smap:
-                                alt = f"{base}-{q2}"; break
-                        if not alt:
-                            logger.warning(f"{symbol} introuvable, aucune alternative.")
-                            continue
-                        logger.info(f"{symbol} introuvable → fallback {alt}")
-                        symbol = alt
-
-                    if now < cooldown[symbol]:
-                        continue
-
-                    base, q_cur = symbol.split('-')
-
-                    # Découverte position existante au démarrage
-                    base_bal = ex.balance('trade', base)
-                    if base_bal > 0 and symbol not in positions:
-                        last = float(ex.ticker(symbol)['price'])
-                        positions[symbol] = {"entry": last, "size": base_bal}
-                        logger.info(f"{symbol} position détectée → entry≈{last:.6f}, size={base_bal}")
-
-                    # Regime filter (EMA200 + ADX)
-                    kl = ex.klines(symbol, "15min", limit=240)  # plus long pour regime
-                    closes = [float(k[2]) for k in kl]
-                    if len(closes) < REG_EMA+5:
-                        continue
-                    e200 = ema(closes, REG_EMA)
-                    regime_ok = closes[-1] > e200[-1]
-                    cur_adx = adx(kl, 14)
-                    if cur_adx < ADX_MIN:
-                        regime_ok = False
-                    if not regime_ok:
-                        logger.info(f"{symbol} regime off (ADX={cur_adx:.1f}, price {'>' if closes[-1]>e200[-1] else '<'} EMA{REG_EMA}).")
-                        continue
-
-                    # Spread filter
-                    spr = spread_pct(ex.ticker(symbol))
-                    if spr > SPREAD_MAX:
-                        logger.info(f"{symbol} spread {spr:.2f}% > max {SPREAD_MAX}%, skip.")
-                        continue
-
-                    # Volatilité min
-                    vol = atr_pct(kl, 14)
-                    if vol < MIN_ATR:
-                        logger.info(f"{symbol} ATR {vol:.2f}% < {MIN_ATR}%, skip.")
-                        continue
-
-                    # Ensemble de signaux (EMA cross + Breakout + MeanRevert)
-                    final_sig, votes = signals_ensemble(ex, symbol, kl)
-                    logger.info(f"{symbol} ensemble={final_sig} votes={votes}")
-
-                    # SELL (uniquement si position)
-                    if final_sig == "sell" and base_bal > 0:
-                        res = ex.place_order(symbol, "sell", size=str(base_bal), type_="market")
-                        logger.info(f"{symbol} SELL -> {res}")
-                        send_alert(f"SELL {symbol} size={base_bal} votes={votes}")
-                        positions.pop(symbol, None)
-                        cooldown[symbol] = now + COOLDOWN
-                        continue
-
-                    # BUY
-                    if final_sig == "buy":
-                        # Max positions globales
-                        if len(positions) >= MAX_POS:
-                            logger.info(f"Max positions ({MAX_POS}) atteint, skip buy {symbol}.")
-                            continue
-                        # Pas de double empilement
-                        if base_bal > 0 or symbol in positions:
-                            logger.info(f"{symbol} déjà en position, skip.")
-                            continue
-                        # Allocation max par coin
-                        alloc_pct = 0.0
-                        if symbol in smap:
-                            try: alloc_pct = (value_in_quote(ex, symbol, ex.balance('trade', base)) /
-                                              (ex.balance('trade', q_cur)+1e-12))*100.0
-                            except: alloc_pct = 0.0
-                        if alloc_pct >= MAX_ALLOC:
-                            logger.info(f"{symbol} allocation {alloc_pct:.1f}% >= max {MAX_ALLOC}%, skip.")
-                            continue
-
-                        # Quote dispo ? sinon router
-                        free_here = free_after_reserve(q_cur, ex.balance('trade', q_cur))
-                        min_quote = CFG.get("MIN_TRADE_USDT", 10.0)
-                        if free_here < min_quote:
-                            # multi-hop: trouve chemin depuis la quote avec plus de solde
-                            start_quotes = sorted(CFG["QUOTES"], key=lambda q: ex.balance('trade', q), reverse=True)
-                            path_found = False
-                            for q_start in start_quotes:
-                                if q_start == q_cur: continue
-                                bal_start = free_after_reserve(q_start, ex.balance('trade', q_start))
-                                if bal_start <= 0: continue
-                                path = find_quote_path(ex, q_start, q_cur, int(CFG.get("ROUTER_MAX_HOPS", 3)))
-                                if path:
-                                    need = min_quote - free_here
-                                    logger.info(f"[Router] chemin {path} pour obtenir {q_cur} (need≈{need})")
-                                    execute_quote_path(ex, path, min(bal_start, need))
-                                    path_found = True
-                                    break
-                            free_here = free_after_reserve(q_cur, ex.balance('trade', q_cur))
-                            if not path_found or free_here < min_quote:
-                                logger.info(f"{symbol} pas assez de {q_cur} après routage, skip.")
-                                continue
-
-                        # Position sizing par ATR
-                        base_target = calc_position_size_by_atr(ex, symbol, q_cur, kl, float(CFG.get("ATR_RISK_USD", 15)))
-                        if base_target <= 0:
-                            logger.info(f"{symbol} sizing ATR nul, skip.")
-                            continue
-
-                        # Convertir en quote montant et snap qty
-                        bid = float(ex.ticker(symbol)['bestBid'])
-                        quote_amt = base_target * bid
-                        # hard cap par free_here
-                        quote_amt = min(quote_amt, free_here)
-                        if quote_amt < min_quote:
-                            logger.info(f"{symbol} quote_amt {quote_amt:.4f} < min {min_quote}, skip.")
-                            continue
-
-                        # Ensure qty via increments (price/size/minFunds)
-                        smap_local = ex.symbols_map()[symbol]
-                        size_step = float(smap_local['baseIncrement'])
-                        qty = math.floor((quote_amt / bid)/size_step)*size_step
-                        if qty <= 0:
-                            logger.info(f"{symbol} qty<=0 après snap, skip.")
-                            continue
-
-                        res = ex.place_order(symbol, "buy", size=str(qty), type_="market")
-                        logger.info(f"{symbol} BUY -> {res}")
-                        send_alert(f"BUY {symbol} qty={qty} votes={votes}")
-                        entry = float(ex.ticker(symbol)['price'])
-                        positions[symbol] = {"entry": entry, "size": qty}
-                        # TP/SL info
-                        if CFG.get("ENABLE_TP_SL", True):
-                            tp = entry*(1+CFG.get("TP_PCT",1.5)/100.0)
-                            sl = entry*(1-CFG.get("SL_PCT",1.0)/100.0)
-                            logger.info(f"{symbol} TP/SL armés → TP≈{tp:.6f} / SL≈{sl:.6f}")
-                            send_alert(f"{symbol} TP/SL armés → TP≈{tp:.6f} / SL≈{sl:.6f}")
-                        cooldown[symbol] = now + COOLDOWN
-
+            t0 = time.time()
+            stats = run_cycle(ex)
+            metrics.observe("cycle_seconds", time.time()-t0)
+            metrics.gauge("positions", len(positions))
+            metrics.gauge("portfolio_equity", stats["portfolio"]["equity"]); metrics.gauge("portfolio_risk_pct", stats["portfolio"]["risk_pct"])
+            for q, v in stats["portfolio"]["per_quote_pct"].items(): metrics.gauge("portfolio_exposure_pct", v, quote=q)
+            if risk: risk.report({"cycle_sec": time.time()-t0, "symbols": stats["symbols"], "positions": len(positions),
+                                  "orders": executor.stats["orders"]})
+            for e, c in ex.cache_stats().items():
+                metrics.gauge("cache_hits", c["hits"], endpoint=e); metrics.gauge("cache_misses", c["misses"], endpoint=e)
+            sched = ex.sched_stats() if hasattr(ex, "sched_stats") else {}
+            for b, q in sched.items():
+                metrics.gauge("ratelimit_tokens", q["tokens"], bucket=b); metrics.gauge("ratelimit_queued", q["queued"], bucket=b)
+            logger.info(f"Cycle {time.time()-t0:.2f}s (fetch {stats['fetch_sec']:.2f}s, {stats['symbols']} symboles) | cache REST: {ex.cache_stats()} | exits: {exits.metrics()} | portefeuille: {stats['portfolio']} | quotas: {sched} | ledger: {ex.ledger.stats() if ex.ledger else None} | exec: {executor.stats} | alertes: {alerts.stats()}")
             time.sleep(CFG.get("POLL_INTERVAL_SEC", 30))
 
         except KeyboardInterrupt:
-            logger.info("Arrêt manuel."); break
+            logger.info("Arrêt manuel."); alerts.flush(); break
         except Exception as e:
             logger.error(f"Loop error: {e}\n{traceback.format_exc()}"); send_alert(f"Erreur loop: {e}"); time.sleep(5)
 
 if __name__ == "__main__":
-    run_loop()
\ No newline at end of file
+    if CFG["MODE"] == "arb_scan":
+        import arb_scanner
+        arb_scanner.run(Ku(logger), logger)
+    elif CFG["MODE"] == "supervisor":
+        import supervisor
+        supervisor.run(logger)
+    else:
+        run_loop()
\ No newline at end of file
@@ -0,0 +1,122 @@
+# market_feed.py — flux WebSocket KuCoin (tickers + bougies) avec repli REST côté Ku
+import asyncio, json, threading, time, itertools
+from config import CFG
+
+class MarketFeed:
+    private = False   # topics privés (AccountFeed): token bullet-private + privateChannel
+
+    def __init__(self, logger, symbols, ktype="15min", url=None):
+        self.logger = logger
+        self.symbols = list(symbols); self.ktype = ktype
+        self.url = url if url is not None else CFG["WS_URL"]   # vide → token bullet-public KuCoin
+        self.stale_sec = CFG["WS_STALE_SEC"]
+        self.tops = {}       # symbol -> {"price","bestBid","bestAsk","time","ts"}
+        self.candles = {}    # symbol -> {ts: row KuCoin}
+        self.listeners = []  # fn(symbol, price) appelée à chaque tick (thread du flux)
+        self.books = None    # BookManager optionnel: abonnement /market/level2 (diffs du carnet)
+        self.connected = False; self.reconnects = 0; self.last_msg = 0.0
+        self._ids = itertools.count(1)
+        self._thread = None; self._stop = False
+
+    def attach_books(self, books):
+        books.live = lambda: self.connected
+        self.books = books
+        return self
+
+    # ========= Lecture (thread principal) =========
+    def fresh(self, symbol):
+        t = self.tops.get(symbol)
+        return bool(self.connected and t and time.time() - t["ts"] < self.stale_sec)
+
+    def ticker(self, symbol):
+        return self.tops[symbol] if self.fresh(symbol) else None
+
+    def live_klines(self, symbol):
+        if not self.fresh(symbol): return []
+        c = self.candles.get(symbol, {})
+        return [c[ts] for ts in sorted(c)]
+
+    # ========= Cycle de vie =========
+    def start(self):
+        self._stop = False
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), name="ws-feed", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop = True
+        if self._thread: self._thread.join(timeout=5)
+
+    def topics(self):
+        out = []
+        for i in range(0, len(self.symbols), 100):   # 100 symboles max par topic
+            chunk = self.symbols[i:i+100]
+            out.append("/market/ticker:" + ",".join(chunk))
+            out.append("/market/candles:" + ",".join(f"{s}_{self.ktype}" for s in chunk))
+            if self.books is not None: out.append("/market/level2:" + ",".join(chunk))
+        return out
+
+    def _endpoint(self):
+        if self.url:
+            return self.url, 18.0
+        from kucoin.ws_token.token import GetToken
+        tok = GetToken(is_sandbox=CFG["SANDBOX"]).get_ws_token()
+        srv = tok["instanceServers"][0]
+        return f"{srv['endpoint']}?token={tok['token']}&connectId={int(time.time()*1000)}", srv["pingInterval"]/1000.0
+
+    async def _run(self):
+        import websockets   # importé dans le thread du flux: WS_ENABLED=false n'en dépend pas
+        backoff = 1.0
+        while not self._stop:
+            try:
+                url, ping_every = await asyncio.to_thread(self._endpoint)
+                async with websockets.connect(url, ping_interval=None, close_timeout=2) as ws:
+                    await self._session(ws, ping_every)
+                    backoff = 1.0
+            except Exception as e:
+                self.logger.warning(f"[WS] déconnecté: {e}")
+            self.connected = False
+            if self._stop: break
+            self.reconnects += 1
+            await asyncio.sleep(backoff); backoff = min(backoff*2, 30.0)
+
+    async def _session(self, ws, ping_every):
+        welcome = json.loads(await asyncio.wait_for(ws.recv(), timeout=10))
+        if welcome.get("type") != "welcome":
+            raise RuntimeError(f"welcome attendu, reçu {welcome}")
+        for topic in self.topics():   # (re)souscription complète à chaque connexion
+            await ws.send(json.dumps({"id": next(self._ids), "type": "subscribe", "topic": topic,
+                                      "privateChannel": self.private, "response": True}))
+        self.connected = True; self.last_msg = time.time()
+        self.logger.info(f"[WS] connecté, {'canal privé' if self.private else f'{len(self.symbols)} symboles'}")
+        next_ping = time.time() + ping_every
+        while not self._stop:
+            try:
+                raw = await asyncio.wait_for(ws.recv(), timeout=max(0.1, next_ping - time.time()))
+            except asyncio.TimeoutError:
+                if time.time() - self.last_msg > 2*ping_every:
+                    raise RuntimeError("flux muet, reconnexion")
+                await ws.send(json.dumps({"id": next(self._ids), "type": "ping"}))
+                next_ping = time.time() + ping_every
+                continue
+            self.last_msg = time.time()
+            self._on_msg(json.loads(raw))
+
+    def _on_msg(self, msg):
+        if msg.get("type") != "message": return
+        topic = msg.get("topic", ""); data = msg.get("data") or {}
+        if topic.startswith("/market/ticker:"):
+            sym = topic.split(":", 1)[1]   # un seul symbole par message
+            self.tops[sym] = {"price": data.get("price"), "bestBid": data.get("bestBid"),
+                              "bestAsk": data.get("bestAsk"), "time": data.get("time"), "ts": time.time()}
+            for fn in self.listeners:
+                try: fn(sym, float(data["price"]))
+                except Exception as e: self.logger.warning(f"[WS] listener {sym}: {e}")
+        elif topic.startswith("/market/candles:"):
+            sym = data.get("symbol"); row = data.get("candles")
+            if not sym or not row: return
+            c = self.candles.setdefault(sym, {})
+            c[int(row[0])] = row
+            while len(c) > 3: c.pop(min(c))   # bougie en cours + quelques précédentes
+        elif topic.startswith("/market/level2:") and self.books is not None:
+            self.books.on_diff(topic.split(":", 1)[1], data)
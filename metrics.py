@@ -0,0 +1,127 @@
+# metrics.py — compteurs / histogrammes en mémoire, export texte Prometheus + profiler échantillonné (flame graph)
+import sys, time, bisect, threading, functools
+from collections import defaultdict, Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_lock = threading.Lock()
+counters = defaultdict(float)   # (nom, labels) -> valeur
+gauges = {}                     # (nom, labels) -> valeur
+hists = {}                      # (nom, labels) -> [compte par bucket..., +Inf, somme]
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def inc(name, value=1.0, **labels):
+    k = _key(name, labels)
+    with _lock: counters[k] += value
+
+def gauge(name, value, **labels):
+    gauges[_key(name, labels)] = value
+
+def observe(name, value, **labels):
+    k = _key(name, labels)
+    with _lock:
+        h = hists.get(k)
+        if h is None: h = hists[k] = [0]*(len(BUCKETS)+1) + [0.0]
+        h[bisect.bisect_left(BUCKETS, value)] += 1; h[-1] += value
+
+class timed:
+    # with metrics.timed("x_seconds", stage="fetch"): ...
+    __slots__ = ("name", "labels", "t0")
+    def __init__(self, name, **labels): self.name = name; self.labels = labels
+    def __enter__(self): self.t0 = time.perf_counter(); return self
+    def __exit__(self, *exc): observe(self.name, time.perf_counter()-self.t0, **self.labels)
+
+class Stages:
+    # chrono par étape d'un cycle: lap(étape) impute le temps écoulé depuis le lap précédent,
+    # un seul observe par étape en fin de cycle (coût négligeable dans la boucle par symbole)
+    def __init__(self):
+        self.acc = defaultdict(float); self.t = time.perf_counter()
+    def lap(self, stage):
+        t = time.perf_counter(); self.acc[stage] += t - self.t; self.t = t
+    def done(self, name="cycle_stage_seconds"):
+        for stage, v in self.acc.items(): observe(name, v, stage=stage)
+        return dict(self.acc)
+
+# ========= Instrumentation d'objets (Ku, clients SDK) =========
+def _is_rate_limited(e):
+    # "429-..." (HTTP) ou "200-{"code":"429000",...}" (quota KuCoin)
+    m = str(e)
+    return m.startswith("429") or '"429000"' in m[:64]
+
+def instrument(obj, metric, methods=None):
+    # remplace chaque méthode publique de l'instance par un wrapper: latence, appels, erreurs, 429
+    names = methods or [n for n in dir(obj) if not n.startswith("_") and callable(getattr(obj, n, None))]
+    for n in names:
+        fn = getattr(obj, n)
+        @functools.wraps(fn)
+        def wrapper(*a, _fn=fn, _n=n, **kw):
+            t0 = time.perf_counter()
+            try:
+                return _fn(*a, **kw)
+            except Exception as e:
+                inc(f"{metric}_errors_total", endpoint=_n)
+                if _is_rate_limited(e): inc("rate_limited_total", endpoint=_n)
+                raise
+            finally:
+                observe(f"{metric}_seconds", time.perf_counter()-t0, endpoint=_n)
+        setattr(obj, n, wrapper)
+    return obj
+
+# ========= Export Prometheus =========
+def _lbl(labels, extra=()):
+    items = list(labels) + list(extra)
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}" if items else ""
+
+def render():
+    out = []
+    with _lock:
+        c = dict(counters); h = {k: list(v) for k, v in hists.items()}
+    for (name, labels), v in sorted(c.items()): out.append(f"{name}{_lbl(labels)} {v:g}")
+    for (name, labels), v in sorted(gauges.items()): out.append(f"{name}{_lbl(labels)} {v:g}")
+    for (name, labels), v in sorted(h.items()):
+        cum = 0
+        for b, n in zip(BUCKETS + ("+Inf",), v[:-1]):
+            cum += n; out.append(f"{name}_bucket{_lbl(labels, [('le', b)])} {cum}")
+        out.append(f"{name}_sum{_lbl(labels)} {v[-1]:g}"); out.append(f"{name}_count{_lbl(labels)} {cum}")
+    return "\n".join(out) + "\n"
+
+# ========= Profiler échantillonné =========
+def sample_stacks(seconds=10.0, hz=100):
+    # format "collapsed" (flamegraph.pl / speedscope): frame;frame;frame N
+    me = threading.get_ident(); stacks = Counter()
+    names = {t.ident: t.name for t in threading.enumerate()}
+    end = time.time() + seconds
+    while time.time() < end:
+        for tid, frame in sys._current_frames().items():
+            if tid == me: continue
+            st = []
+            while frame is not None:
+                st.append(f"{frame.f_code.co_filename.rsplit('/', 1)[-1]}:{frame.f_code.co_name}"); frame = frame.f_back
+            stacks[";".join([names.get(tid, str(tid))] + st[::-1])] += 1
+        time.sleep(1.0/hz)
+    return "".join(f"{k} {v}\n" for k, v in stacks.most_common())
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        u = urlparse(self.path); q = parse_qs(u.query)
+        if u.path == "/metrics":
+            body = render()
+        elif u.path == "/profile":
+            body = sample_stacks(min(float(q.get("seconds", ["10"])[0]), 120), int(q.get("hz", ["100"])[0]))
+        else:
+            self.send_error(404); return
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4"); self.send_header("Content-Length", str(len(data)))
+        self.end_headers(); self.wfile.write(data)
+
+    def log_message(self, *a): pass   # pas de log par scrape
+
+def serve(host, port):
+    srv = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=srv.serve_forever, name="metrics", daemon=True).start()
+    return srv
@@ -0,0 +1,139 @@
+# optimizer.py — grid / random search et walk-forward sur backtest.run, en parallèle (process pool)
+# Usage: python optimizer.py data/ --grid REGIME_ADX_MIN=15,18,22 TP_PCT=1:3:0.5 --random 50 --walk 4 --out results.csv
+import os, csv, json, time, random, itertools, argparse, tempfile, shutil
+os.environ.setdefault("MODE", "backtest")
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import backtest
+import strategy
+
+# ========= État des workers =========
+_DATA  = {}   # symbol -> np.memmap [t, o, h, l, c, v] (pages partagées entre processus)
+_ROWS  = {}   # (symbol, a, b) -> lignes décodées (une fois par worker)
+_TAPES = {}   # (symbol, a, b, fenêtre, périodes des features) -> TapeState (indicateurs indépendants des autres paramètres)
+_OPTS  = {}
+
+def share(candles, folder):
+    # écrit chaque symbole en .npy; les workers le rouvrent en mmap (zéro copie)
+    paths = {}
+    for sym, rows in candles.items():
+        a = np.array([(r[0], r[1], r[3], r[4], r[2], r[5]) for r in rows], dtype=np.float64)
+        paths[sym] = os.path.join(folder, f"{sym}.npy"); np.save(paths[sym], a)
+    return paths
+
+def _init(paths, opts):
+    _DATA.update({s: np.load(p, mmap_mode="r") for s, p in paths.items()})
+    _OPTS.update(opts)
+
+def _rows(sym, a, b):
+    key = (sym, a, b)
+    if key not in _ROWS:
+        arr = _DATA[sym]; t = arr[:, 0]
+        i, j = np.searchsorted(t, a), np.searchsorted(t, b)
+        _ROWS[key] = [(r[0], r[1], r[4], r[2], r[3], r[5], 0.0) for r in arr[i:j].tolist()]
+    return _ROWS[key]
+
+def _tape(sym, a, b, reg_ema, strat=None, window=None):
+    spec = strategy.state_spec(reg_ema, strat)
+    key = (sym, a, b, window, tuple(sorted(spec.items())))
+    if key not in _TAPES:
+        _TAPES[key] = backtest.TapeState(_rows(sym, a, b), window=window, **spec)
+    return _TAPES[key]
+
+def _job(combo, a, b):
+    candles = {s: _rows(s, a, b) for s in _DATA}
+    candles = {s: r for s, r in candles.items() if r}
+    over = dict(_OPTS["base"]); over.update(combo)
+    reg = int(over.get("REGIME_EMA_PERIOD", backtest.CFG.get("REGIME_EMA_PERIOD", 200)))
+    import main
+    window = None if over.get("INDICATOR_STREAM", backtest.CFG["INDICATOR_STREAM"]) else main.WINDOW
+    tapes = {s: _tape(s, a, b, reg, over.get("STRATEGY"), window) for s in candles}
+    _, m = backtest.run(candles, dict(_OPTS["cash"]), _OPTS["fee"], _OPTS["spread"], _OPTS["slippage"], over, tapes)
+    return combo, m
+
+# ========= Espace de recherche =========
+def parse_grid(items):
+    # KEY=v1,v2,v3 ou KEY=lo:hi:step
+    grid = {}
+    for it in items:
+        k, v = it.split("=", 1)
+        if ":" in v:
+            lo, hi, step = (float(x) for x in v.split(":"))
+            n = int(round((hi-lo)/step)) + 1
+            grid[k] = [round(lo + i*step, 10) for i in range(n)]
+        else:
+            grid[k] = [backtest._auto(x) for x in v.split(",")]
+    return grid
+
+def combos(grid, n_random=0, seed=0):
+    keys = list(grid)
+    allc = [dict(zip(keys, vals)) for vals in itertools.product(*(grid[k] for k in keys))]
+    if n_random and n_random < len(allc):
+        allc = random.Random(seed).sample(allc, n_random)
+    # même REGIME_EMA_PERIOD groupé → le cache de tapes sert au maximum dans chaque worker
+    return sorted(allc, key=lambda c: c.get("REGIME_EMA_PERIOD", 0))
+
+def evaluate(pool, cs, a, b):
+    futs = [pool.submit(_job, c, a, b) for c in cs]
+    return [f.result() for f in futs]
+
+def rank(results, metric):
+    return sorted(results, key=lambda r: r[1].get(metric, float("-inf")), reverse=True)
+
+def write_table(path, ranked, keys):
+    cols = ["rank"] + keys + ["return_pct", "max_drawdown_pct", "sharpe", "trades", "win_rate_pct", "fees_paid"]
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f); w.writerow(cols)
+        for i, (c, m) in enumerate(ranked, 1):
+            w.writerow([i] + [c.get(k) for k in keys] + [m.get(k) for k in cols[len(keys)+1:]])
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Optimisation des paramètres MarloTrader")
+    ap.add_argument("data")
+    ap.add_argument("--grid", nargs="+", required=True)
+    ap.add_argument("--random", type=int, default=0, help="N combinaisons tirées au hasard dans la grille")
+    ap.add_argument("--walk", type=int, default=0, help="K plis walk-forward (train = pli k, test = pli k+1)")
+    ap.add_argument("--metric", default="sharpe")
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--cash", nargs="*", default=["USDT=1000"])
+    ap.add_argument("--fee", type=float, default=0.1)
+    ap.add_argument("--spread", type=float, default=0.02)
+    ap.add_argument("--slippage", type=float, default=0.05)
+    ap.add_argument("--set", nargs="*", default=[])
+    ap.add_argument("--out", default="optimizer_results.csv")
+    a = ap.parse_args()
+
+    candles = backtest.load_candles(a.data)
+    base = {k: backtest._auto(v) for k, v in backtest._kv(a.set, None).items()}
+    base.setdefault("SYMBOLS", sorted(candles))
+    base.setdefault("QUOTES", sorted({s.split("-")[1] for s in candles}))
+    grid = parse_grid(a.grid); cs = combos(grid, a.random)
+    tl = sorted({r[0] for rows in candles.values() for r in rows})
+    opts = {"base": base, "cash": backtest._kv(a.cash), "fee": a.fee, "spread": a.spread, "slippage": a.slippage}
+
+    tmp = tempfile.mkdtemp(prefix="marlo_opt_")
+    t0 = time.time()
+    try:
+        paths = share(candles, tmp); del candles
+        with ProcessPoolExecutor(a.workers, mp_context=mp.get_context("fork"), initializer=_init, initargs=(paths, opts)) as pool:
+            if not a.walk:
+                ranked = rank(evaluate(pool, cs, tl[0], tl[-1]+1), a.metric)
+                write_table(a.out, ranked, list(grid))
+                for i, (c, m) in enumerate(ranked[:10], 1):
+                    print(f"{i:>2}. {c} {a.metric}={m.get(a.metric, 0):.3f} ret={m.get('return_pct', 0):.2f}% dd={m.get('max_drawdown_pct', 0):.2f}%")
+            else:
+                edges = [tl[int(i*len(tl)/(a.walk+1))] for i in range(a.walk+1)] + [tl[-1]+1]
+                folds = []
+                for k in range(a.walk):
+                    tr, te = (edges[k], edges[k+1]), (edges[k+1], edges[k+2])
+                    best_c, best_m = rank(evaluate(pool, cs, *tr), a.metric)[0]
+                    (_, test_m), = evaluate(pool, [best_c], *te)
+                    folds.append({"fold": k, "train": tr, "test": te, "params": best_c,
+                                  f"train_{a.metric}": best_m.get(a.metric), f"test_{a.metric}": test_m.get(a.metric),
+                                  "test_return_pct": test_m.get("return_pct")})
+                    print(json.dumps(folds[-1]))
+                with open(a.out, "w") as f: json.dump(folds, f, indent=2)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    print(f"{len(cs)} combinaisons, {a.workers} workers, {time.time()-t0:.1f}s → {a.out}")
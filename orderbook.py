@@ -0,0 +1,132 @@
+# orderbook.py — carnets L2 en mémoire: snapshot REST + diffs WS (/market/level2), VWAP attendu et taille max sous budget d'impact
+import math, time, bisect, threading
+from config import CFG
+
+class OrderBook:
+    # chaque côté = deux listes parallèles triées par prix croissant (meilleur bid en fin, meilleur ask en tête);
+    # insertion/suppression par bisect, pas de dict ni d'objet par niveau → quelques centaines de carnets en mémoire
+    __slots__ = ("symbol", "seq", "bp", "bs", "ap", "az", "ts", "synced", "streamed", "pending")
+
+    def __init__(self, symbol):
+        self.symbol = symbol; self.seq = 0
+        self.bp, self.bs, self.ap, self.az = [], [], [], []
+        self.ts = 0.0; self.synced = False; self.streamed = False
+        self.pending = []   # diffs reçus avant le snapshot, rejoués au chargement
+
+    def load(self, snap, depth):
+        self.seq = int(snap.get("sequence") or 0)
+        bids = sorted((float(p), float(s)) for p, s in (snap.get("bids") or [])[:depth])
+        asks = sorted((float(p), float(s)) for p, s in (snap.get("asks") or [])[:depth])
+        self.bp = [p for p, _ in bids]; self.bs = [s for _, s in bids]
+        self.ap = [p for p, _ in asks]; self.az = [s for _, s in asks]
+        self.synced = True; self.ts = time.time()
+        pending, self.pending = self.pending, []
+        for d in pending:
+            if not self.apply(d, depth): break
+        return self
+
+    @staticmethod
+    def _set(prices, sizes, p, s):
+        i = bisect.bisect_left(prices, p)
+        if i < len(prices) and prices[i] == p:
+            if s > 0: sizes[i] = s
+            else: del prices[i]; del sizes[i]
+        elif s > 0:
+            prices.insert(i, p); sizes.insert(i, s)
+
+    def apply(self, d, depth):
+        # d = data d'un message trade.l2update; False → trou de séquence, snapshot à refaire
+        if not self.synced:
+            if len(self.pending) < 1000: self.pending.append(d)
+            return True
+        start, end = int(d["sequenceStart"]), int(d["sequenceEnd"])
+        if end <= self.seq: return True
+        if start > self.seq + 1:
+            self.synced = False; self.pending = [d]; return False
+        ch = d.get("changes") or {}
+        for p, s, seq in ch.get("bids", ()):
+            if int(seq) > self.seq: self._set(self.bp, self.bs, float(p), float(s))
+        for p, s, seq in ch.get("asks", ()):
+            if int(seq) > self.seq: self._set(self.ap, self.az, float(p), float(s))
+        self.seq = end; self.ts = time.time(); self.streamed = True
+        # on ne garde que le haut du carnet (2×depth): le bas n'intervient pas dans l'impact, quitte à le sous-estimer
+        if len(self.bp) > 2*depth: del self.bp[:-depth]; del self.bs[:-depth]
+        if len(self.ap) > 2*depth: del self.ap[depth:]; del self.az[depth:]
+        return True
+
+    # ========= Lecture =========
+    def _levels(self, side):
+        # niveaux consommés par un ordre "side" (achat → asks croissants, vente → bids décroissants)
+        if side == "buy": return zip(self.ap, self.az)
+        return zip(reversed(self.bp), reversed(self.bs))
+
+    def best(self, side):
+        if side == "buy": return self.ap[0] if self.ap else 0.0
+        return self.bp[-1] if self.bp else 0.0
+
+    def vwap(self, side, qty):
+        # prix moyen pour qty en base; (vwap, quantité servie par les niveaux connus)
+        left, cost = qty, 0.0
+        for p, s in self._levels(side):
+            take = min(left, s); cost += take*p; left -= take
+            if left <= 0: break
+        done = qty - max(left, 0.0)
+        return (cost/done if done > 0 else 0.0), done
+
+    def slippage_pct(self, side, qty):
+        # écart VWAP / meilleur prix, en %; inf si le carnet connu ne sert pas qty
+        best = self.best(side)
+        avg, done = self.vwap(side, qty)
+        if best <= 0 or done < qty: return math.inf
+        return (avg/best - 1)*100 if side == "buy" else (1 - avg/best)*100
+
+    def max_qty(self, side, impact_pct):
+        # plus grande taille dont le VWAP reste à impact_pct du meilleur prix (résolu niveau par niveau)
+        best = self.best(side)
+        if best <= 0: return 0.0
+        sgn = 1 if side == "buy" else -1
+        lim = best*(1 + sgn*impact_pct/100.0)
+        qty = cost = 0.0
+        for p, s in self._levels(side):
+            # au-delà de la limite, le niveau n'est pris que jusqu'à x tel que (cost + x·p)/(qty + x) = lim
+            x = s if sgn*(p - lim) <= 0 else max(0.0, (lim*qty - cost)/(p - lim))
+            if x < s: return qty + x
+            qty += s; cost += s*p
+        return qty
+
+class BookManager:
+    # carnets par symbole: vivants si alimentés par le flux WS, sinon snapshot REST rafraîchi après BOOK_TTL_SEC
+    def __init__(self, depth=None, ttl=None):
+        self.depth = depth or CFG["BOOK_DEPTH"]; self.ttl = CFG["BOOK_TTL_SEC"] if ttl is None else ttl
+        self.books = {}; self.lock = threading.Lock()
+        self.live = lambda: False   # flux connecté? (posé par MarketFeed)
+        self.snapshots = 0; self.resyncs = 0
+
+    def on_diff(self, symbol, d):
+        # thread du flux WS
+        with self.lock:
+            b = self.books.get(symbol)
+            if b is None: b = self.books[symbol] = OrderBook(symbol)
+            if not b.apply(d, self.depth): self.resyncs += 1
+
+    def book(self, ex, symbol):
+        with self.lock:
+            b = self.books.get(symbol)
+            fresh = b is not None and b.synced and ((b.streamed and self.live()) or time.time() - b.ts < self.ttl)
+        if fresh: return b
+        snap = ex.call("get_part_order", 100 if self.depth > 20 else 20, symbol)
+        with self.lock:
+            b = self.books.get(symbol) or self.books.setdefault(symbol, OrderBook(symbol))
+            b.synced = False   # rechargement complet; diffs reçus hors synchro (pending) rejoués par load
+            b.load(snap, self.depth); self.snapshots += 1
+        return b
+
+    def impact(self, ex, symbol, side, qty, impact_pct):
+        # {"best", "vwap", "slip_pct", "cap"}: cap = taille max (base) sous le budget d'impact
+        b = self.book(ex, symbol)
+        with self.lock:
+            avg, _ = b.vwap(side, qty)
+            return {"best": b.best(side), "vwap": avg, "slip_pct": b.slippage_pct(side, qty), "cap": b.max_qty(side, impact_pct)}
+
+    def stats(self):
+        return {"books": len(self.books), "snapshots": self.snapshots, "resyncs": self.resyncs}
@@ -0,0 +1,346 @@
+# paper.py — bourse simulée (MODE=paper): surface Ku complète, carnets synthétiques ou enregistrés, moteur d'appariement
+# Usage: MODE=paper python main.py
+#        python paper.py bench [--orders 20000]                 (débit du moteur d'ordres)
+#        python paper.py soak [--cycles 500] [--symbols 50]     (boucle run_cycle hors ligne, horloge accélérée)
+import os, json, math, time, uuid, zlib, bisect, random, logging, argparse, threading
+os.environ.setdefault("MODE", "paper")
+from collections import defaultdict
+from config import CFG
+from candle_store import INTERVAL_SEC, resample
+from orderbook import OrderBook
+
+STEP = INTERVAL_SEC["15min"]
+
+# ========= Données synthétiques =========
+def candle(seed, i, t0=1_600_000_000, step=STEP):
+    # forme fermée (pas d'état cumulé): la bougie i d'un symbole se calcule seule → historique de 100k barres gratuit
+    ph = seed*0.7311
+    def noise(k): return (math.sin(k*12.9898 + seed*78.233)*43758.5453) % 1.0 - 0.5   # hash pseudo-aléatoire sans état
+    def px(k): return 100.0*(1 + 0.08*math.sin(k/97.0 + ph) + 0.03*math.sin(k/13.7 + 2*ph) + 0.012*noise(k))
+    o, c = px(i-1), px(i)
+    h = max(o, c)*(1 + 0.002*(1 + math.sin(i*1.3 + ph))); l = min(o, c)*(1 - 0.002*(1 + math.cos(i*1.7 + ph)))
+    v = 10 + 5*math.sin(i/5.0 + ph)
+    return [str(t0 + i*step), f"{o:.8f}", f"{c:.8f}", f"{h:.8f}", f"{l:.8f}", f"{v:.4f}", f"{v*c:.4f}"]
+
+def load_books(path):
+    # carnets enregistrés: une ligne JSON {"symbol", "ts", "bids", "asks"} par snapshot (format get_part_order)
+    out = defaultdict(list)
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                b = json.loads(line); out[b["symbol"]].append((int(b["ts"]), b))
+    out = {s: sorted(v, key=lambda x: x[0]) for s, v in out.items()}
+    return {s: ([t for t, _ in v], [b for _, b in v]) for s, v in out.items()}   # (ts triés, snapshots) pour bisect
+
+def _err(code, msg):
+    # même forme que les refus métier du SDK ("200-{json}") → _retryable / métriques les traitent pareil
+    return Exception("200-" + json.dumps({"code": code, "msg": msg}))
+
+# ========= Bourse simulée =========
+class PaperKu:
+    # horloge: barre courante = démarrage + temps écoulé × speed; le prix avance par ticks dans la barre (open → close),
+    # un carnet neuf par tick (la liquidité prise par nos ordres ne revient qu'au tick suivant)
+    def __init__(self, logger, symbols=None, cash=None, data=None, books=None, speed=None, clock=time.time):
+        self.logger = logger; self.clock = clock; self.t0 = clock()
+        self.speed = speed or CFG["PAPER_SPEED"]; self.ticks = CFG["PAPER_TICKS_PER_BAR"]
+        self.feed = None; self.ledger = None
+        data = data if data is not None else CFG["PAPER_DATA"]
+        if data:
+            from backtest import load_candles
+            self.candles = data if isinstance(data, dict) else load_candles(data)
+            self.syms = sorted(self.candles)
+            self.i0 = 0; self.start = CFG["PAPER_START"]
+        else:
+            self.candles = None
+            self.syms = sorted(set(symbols or CFG["SYMBOLS"]) | {f"{q}-USDT" for q in CFG["QUOTES"] if q != "USDT"})
+            now_bar = int(self.t0)//STEP
+            self.i0 = now_bar - 100_000; self.start = 100_000   # horodatage aligné sur l'heure réelle
+        self.rec = load_books(books) if books else (load_books(CFG["PAPER_BOOKS"]) if CFG["PAPER_BOOKS"] else {})
+        self.seed = {s: zlib.crc32(s.encode()) % 1000 for s in self.syms}
+        self._smap = {s: {"symbol": s, "baseCurrency": s.split("-")[0], "quoteCurrency": s.split("-")[1],
+                          "baseIncrement": "0.0001", "priceIncrement": "0.00000001", "minFunds": "0.1",
+                          "baseMinSize": "0.0001", "enableTrading": True} for s in self.syms}
+        cash = cash if cash is not None else {k: float(v) for k, v in (x.split("=") for x in CFG["PAPER_CASH"].split(",") if x)}
+        self.bal = defaultdict(float, cash); self.hold = defaultdict(float)
+        self.orders = {}; self.by_client = {}; self.resting = defaultdict(dict)   # symbol -> {id: ordre}
+        self.books = {}; self.book_tick = {}; self._bars = defaultdict(dict)
+        self.lock = threading.RLock()
+        self.stats = {"orders": 0, "fills": 0, "rejects": 0, "maker": 0, "taker": 0, "fees": 0.0}
+
+    # ========= Horloge / prix =========
+    def _pos(self):
+        # (barre, tick dans la barre) à l'instant courant
+        t = (self.clock() - self.t0)*self.speed/STEP*self.ticks
+        i = self.start + int(t)//self.ticks
+        return i, int(t) % self.ticks
+
+    def _bar(self, symbol, i):
+        if self.candles is not None:
+            rows = self.candles[symbol]; return rows[min(i, len(rows)-1)]
+        cache = self._bars[symbol]
+        row = cache.get(i)
+        if row is None:
+            if len(cache) > 4096: cache.clear()
+            row = cache[i] = candle(self.seed[symbol], self.i0 + i, 0)
+        return row
+
+    def _price(self, symbol, i, k):
+        r = self._bar(symbol, i); o, c = float(r[1]), float(r[2])
+        return o + (c-o)*(k+1)/self.ticks
+
+    def _book(self, symbol):
+        # carnet du tick courant (reconstruit au changement de tick, ordres au repos appariés dessus)
+        i, k = self._pos()
+        if self.book_tick.get(symbol) == (i, k): return self.books[symbol]
+        px = self._price(symbol, i, k)
+        snap = self._recorded(symbol, self._bar(symbol, i)[0]) or self._synthetic(symbol, px, i*self.ticks+k)
+        b = self.books[symbol] = OrderBook(symbol).load(snap, 10**6); self.book_tick[symbol] = (i, k)
+        self._match_resting(symbol, b)
+        return b
+
+    def _recorded(self, symbol, ts):
+        snaps = self.rec.get(symbol)
+        if not snaps: return None
+        j = bisect.bisect_right(snaps[0], int(float(ts)))   # dernier snapshot <= ts de la barre
+        return snaps[1][max(0, j-1)]
+
+    def _synthetic(self, symbol, mid, n):
+        # niveaux réguliers autour du mid, taille variable (hash déterministe) autour de PAPER_LEVEL_QUOTE
+        half = CFG["PAPER_SPREAD_PCT"]/200.0; stp = CFG["PAPER_LEVEL_STEP_PCT"]/100.0
+        bids, asks = [], []
+        for j in range(CFG["PAPER_LEVELS"]):
+            sz = CFG["PAPER_LEVEL_QUOTE"]/mid*(0.5 + ((math.sin((n+j)*12.9898 + self.seed[symbol])*43758.5453) % 1.0))
+            bids.append((mid*(1-half-j*stp), sz)); asks.append((mid*(1+half+j*stp), sz))
+        return {"sequence": n, "bids": bids, "asks": asks}
+
+    # ========= Appariement =========
+    def _take(self, b, side, size, limit=None):
+        # consomme les niveaux opposés jusqu'à size (et limit); retourne (base, quote)
+        prices, sizes = (b.ap, b.az) if side == "buy" else (b.bp, b.bs)
+        i = 0 if side == "buy" else -1
+        done = cost = 0.0
+        while prices and done < size - 1e-15:
+            p = prices[i]
+            if limit is not None and (p > limit if side == "buy" else p < limit): break
+            q = min(sizes[i], size - done); done += q; cost += q*p; sizes[i] -= q
+            if sizes[i] <= 1e-15: del prices[i]; del sizes[i]
+        return done, cost
+
+    def _settle(self, o, base_qty, quote_qty, maker):
+        base, quote = o["symbol"].split("-")
+        fee = quote_qty*(CFG["MAKER_FEE_PCT"] if maker else CFG["TAKER_FEE_PCT"])/100.0
+        if o["side"] == "buy": self.bal[base] += base_qty; self.bal[quote] -= quote_qty + fee
+        else: self.bal[base] -= base_qty; self.bal[quote] += quote_qty - fee
+        o["dealSize"] += base_qty; o["dealFunds"] += quote_qty; o["fee"] += fee
+        self.stats["fills"] += 1; self.stats["fees"] += fee; self.stats["maker" if maker else "taker"] += 1
+
+    def _match_resting(self, symbol, b):
+        # ordres au repos traversés par le nouveau carnet: exécutés à leur prix (maker), dans la limite de la profondeur
+        for o in list(self.resting[symbol].values()):
+            px = o["px"]; left = o["sz"] - o["dealSize"]
+            avail = sum(s for p, s in zip(b.ap, b.az) if p <= px) if o["side"] == "buy" else \
+                    sum(s for p, s in zip(b.bp, b.bs) if p >= px)
+            q = min(left, avail)
+            if q <= 0: continue
+            self._take(b, o["side"], q, px); self._release(o, q); self._settle(o, q, q*px, True)
+            if o["sz"] - o["dealSize"] <= 1e-12: self._close(o)
+
+    def _hold(self, o, q):
+        base, quote = o["symbol"].split("-")
+        if o["side"] == "buy": self.hold[quote] += q*o["px"]*(1 + CFG["MAKER_FEE_PCT"]/100.0)
+        else: self.hold[base] += q
+
+    def _release(self, o, q):
+        base, quote = o["symbol"].split("-")
+        if o["side"] == "buy": self.hold[quote] = max(0.0, self.hold[quote] - q*o["px"]*(1 + CFG["MAKER_FEE_PCT"]/100.0))
+        else: self.hold[base] = max(0.0, self.hold[base] - q)
+
+    def _close(self, o):
+        o["isActive"] = False; self.resting[o["symbol"]].pop(o["id"], None)
+
+    def _avail(self, ccy):
+        return self.bal[ccy] - self.hold[ccy]
+
+    @staticmethod
+    def _multiple(x, step):
+        n = x/step
+        return abs(n - round(n)) < 1e-6
+
+    # ========= Surface Ku =========
+    def time_ok(self): return 0
+    def new_cycle(self): pass
+    def invalidate(self, endpoint=None, key=None): pass
+    def cache_stats(self): return {}
+    def attach_feed(self, feed): self.feed = feed
+
+    def sleep(self, sec):
+        # attentes de l'exécution (TWAP, polling) en temps simulé; horloge injectée → avancée par l'appelant
+        if self.clock is time.time: time.sleep(sec/self.speed)
+
+    def accounts(self):
+        with self.lock:
+            return {"trade": [{"currency": c, "balance": str(b), "available": str(self._avail(c)), "holds": str(self.hold[c]),
+                               "type": "trade"} for c, b in self.bal.items()]}
+
+    def balance(self, typ, currency):
+        return self.bal.get(currency, 0.0) if typ == "trade" else 0.0
+
+    def symbols_map(self):
+        return self._smap
+
+    def ticker(self, symbol):
+        with self.lock:
+            b = self._book(symbol); i, k = self._pos()
+            return {"price": self._price(symbol, i, k), "bestBid": b.best("sell"), "bestAsk": b.best("buy"),
+                    "bestBidSize": b.bs[-1] if b.bs else 0.0, "bestAskSize": b.az[0] if b.az else 0.0}
+
+    def all_tickers(self):
+        i, _ = self._pos(); out = {}
+        for s in self.syms:
+            rows = [self._bar(s, j) for j in range(max(0, i-95), i+1)]
+            out[s] = dict(self.ticker(s), vol=sum(float(r[5]) for r in rows), volValue=sum(float(r[5])*float(r[2]) for r in rows))
+        return out
+
+    def klines(self, symbol, ktype="15min", limit=150):
+        # barres closes + barre en cours (close = prix du tick courant), oldest->newest
+        i, k = self._pos(); r = INTERVAL_SEC[ktype]//STEP
+        n = limit*r + r if ktype != "15min" else limit
+        if self.candles is not None: rows = [list(x) for x in self.candles[symbol][max(0, min(i, len(self.candles[symbol])-1)-n+1):i+1]]
+        else: rows = [list(self._bar(symbol, j)) for j in range(i-n+1, i+1)]
+        if rows and self.candles is None:
+            px = self._price(symbol, i, k); o = float(rows[-1][1])
+            rows[-1][2] = f"{px:.8f}"; rows[-1][3] = f"{max(o, px):.8f}"; rows[-1][4] = f"{min(o, px):.8f}"
+        return rows if ktype == "15min" else resample(rows, INTERVAL_SEC[ktype])[-limit:]
+
+    def prefetch(self, symbols, ktype="15min", limit=150):
+        return {s: {"kl": self.klines(s, ktype, limit), "ticker": self.ticker(s)} for s in symbols if s in self._smap}
+
+    def book_impact(self, symbol, side, qty, impact_pct):
+        with self.lock:
+            b = self._book(symbol); avg, _ = b.vwap(side, qty)
+            return {"best": b.best(side), "vwap": avg, "slip_pct": b.slippage_pct(side, qty), "cap": b.max_qty(side, impact_pct)}
+
+    def place_order(self, symbol, side, size=None, price=None, type_="limit", client_oid=None, post_only=False):
+        oid_c = client_oid or uuid.uuid4().hex
+        with self.lock:
+            if oid_c in self.by_client:   # clientOid déjà vu → même ordre (idempotence, comme KuCoin)
+                return {"orderId": self.by_client[oid_c], "clientOid": oid_c}
+            m = self._smap.get(symbol)
+            sz = float(size or 0); base, quote = symbol.split("-")
+            self.stats["orders"] += 1
+            try:
+                if m is None: raise _err("400100", f"symbol {symbol} inconnu")
+                if sz < float(m["baseMinSize"]) or not self._multiple(sz, float(m["baseIncrement"])):
+                    raise _err("400100", "size invalide (baseMinSize / baseIncrement)")
+                b = self._book(symbol)
+                if type_ == "market":
+                    avg, done = b.vwap(side, sz); px = avg
+                else:
+                    px = float(price)
+                    if not self._multiple(px, float(m["priceIncrement"])): raise _err("400100", "price invalide (priceIncrement)")
+                if sz*px < float(m["minFunds"]): raise _err("400100", "montant < minFunds")
+                need = sz*px*(1 + max(CFG["TAKER_FEE_PCT"], CFG["MAKER_FEE_PCT"])/100.0) if side == "buy" else sz
+                if need > self._avail(quote if side == "buy" else base) + 1e-9: raise _err("200004", "Balance insufficient!")
+            except Exception:
+                self.stats["rejects"] += 1; raise
+            oid = uuid.uuid4().hex[:24]
+            o = self.orders[oid] = {"id": oid, "clientOid": oid_c, "symbol": symbol, "side": side, "type": type_,
+                                    "price": str(price or 0), "size": str(size), "px": px, "sz": sz,
+                                    "dealSize": 0.0, "dealFunds": 0.0, "fee": 0.0, "isActive": True, "cancelExist": False,
+                                    "postOnly": post_only, "createdAt": int(self.clock()*1000)}
+            self.by_client[oid_c] = oid
+            if type_ == "market":
+                q, cost = self._take(b, side, sz); self._settle(o, q, cost, False); o["isActive"] = False
+            else:
+                crosses = (b.ap and px >= b.ap[0]) if side == "buy" else (b.bp and px <= b.bp[-1])
+                if post_only and crosses:
+                    o["isActive"] = False; o["cancelExist"] = True   # post-only qui croiserait: annulé par la bourse
+                else:
+                    if crosses:
+                        q, cost = self._take(b, side, sz, px); self._settle(o, q, cost, False)
+                    left = sz - o["dealSize"]
+                    if left > 1e-12: self._hold(o, left); self.resting[symbol][oid] = o
+                    else: o["isActive"] = False
+            return {"orderId": oid, "clientOid": oid_c}
+
+    def order_details(self, order_id):
+        with self.lock:
+            self._book(self.orders[order_id]["symbol"])   # appariement au tick courant avant lecture
+            o = dict(self.orders[order_id])
+        return {k: (str(v) if k in ("dealSize", "dealFunds", "fee") else v) for k, v in o.items() if k not in ("px", "sz")}
+
+    def order_by_client(self, oid):
+        with self.lock:
+            i = self.by_client.get(oid)
+        return self.order_details(i) if i else None
+
+    def cancel_order(self, order_id):
+        with self.lock:
+            o = self.orders.get(order_id)
+            if not o or not o["isActive"]: return False
+            self._release(o, o["sz"] - o["dealSize"]); o["cancelExist"] = True; self._close(o)
+            return True
+
+    def equity(self, ccy="USDT"):
+        total = 0.0
+        for c, v in self.bal.items():
+            if not v: continue
+            total += v if c == ccy else v*float(self.ticker(f"{c}-{ccy}")["price"]) if f"{c}-{ccy}" in self._smap else 0.0
+        return total
+
+# ========= Charge / endurance =========
+def bench(n_orders=20000, n_symbols=20, seed=0):
+    rng = random.Random(seed)
+    syms = [f"P{k}-USDT" for k in range(n_symbols)]
+    ex = PaperKu(logging.getLogger("paper"), syms, {"USDT": 1e9}, speed=3600)
+    t0 = time.perf_counter(); ok = rej = 0; ids = []
+    for _ in range(n_orders):
+        s = rng.choice(syms); side = rng.choice(("buy", "sell")); t = ex.ticker(s)
+        try:
+            if side == "sell" and ex._avail(s.split("-")[0]) < 1: side = "buy"
+            if rng.random() < 0.5:
+                ex.place_order(s, side, size="1", type_="market")
+            else:
+                px = t["bestBid"] if side == "buy" else t["bestAsk"]
+                ids.append(ex.place_order(s, side, size="0.5", price=f"{px:.8f}", type_="limit", post_only=True)["orderId"])
+                if len(ids) > 50: ex.cancel_order(ids.pop(0))
+            ok += 1
+        except Exception:
+            rej += 1
+    dt = time.perf_counter() - t0
+    return {"orders": ok, "rejects": rej, "orders_per_sec": n_orders/dt, **{k: v for k, v in ex.stats.items() if k != "orders"}}
+
+def soak(cycles=500, n_symbols=50, sim_step=None, overrides=None):
+    # run_cycle en boucle sur la bourse simulée, horloge avancée de POLL_INTERVAL_SEC par cycle (sans attendre);
+    # seuil d'ensemble 1 par défaut: des ordres partent à chaque cycle → sizing, carnet, exécution et TP/SL sous charge
+    import main
+    now = [time.time()]
+    ex = PaperKu(main.logger, [f"P{k}-USDT" for k in range(n_symbols)], {"USDT": 10000.0}, speed=1, clock=lambda: now[0])
+    CFG.update(SYMBOLS=ex.syms[:n_symbols], QUOTES=["USDT"], TELEGRAM_TOKEN=None, EXEC_STYLE="market", SCREENER=False,
+               ENSEMBLE_THRESHOLD=1)
+    CFG.update(overrides or {})
+    main.logger.setLevel(logging.WARNING); main.exits.bind(ex)
+    step = sim_step or CFG["POLL_INTERVAL_SEC"]; times = []; eq0 = ex.equity()
+    for c in range(cycles):
+        t0 = time.perf_counter(); main.run_cycle(ex, now=now[0]); times.append(time.perf_counter()-t0)
+        neg = {k: v for k, v in ex.bal.items() if v < -1e-9}
+        if neg: raise AssertionError(f"solde négatif au cycle {c}: {neg}")
+        now[0] += step
+        if (c+1) % 100 == 0 or c+1 == cycles:
+            w = sorted(times[-100:])
+            print(f"cycle {c+1:>6} | p50 {w[len(w)//2]*1000:7.2f} ms p99 {w[int(len(w)*0.99)]*1000:7.2f} ms | "
+                  f"positions {len(main.positions):>3} | equity {ex.equity():.2f} (départ {eq0:.2f}) | {ex.stats}", flush=True)
+    return ex
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Bourse simulée: débit du moteur et endurance de la boucle")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("bench"); b.add_argument("--orders", type=int, default=20000); b.add_argument("--symbols", type=int, default=20)
+    s = sub.add_parser("soak"); s.add_argument("--cycles", type=int, default=500); s.add_argument("--symbols", type=int, default=50)
+    s.add_argument("--step", type=float, help="secondes simulées par cycle (défaut POLL_INTERVAL_SEC)")
+    s.add_argument("--set", nargs="*", default=[], help="surcharges CFG, ex: EXEC_STYLE=limit MAX_POSITIONS=10")
+    a = ap.parse_args()
+    if a.cmd == "bench": print(bench(a.orders, a.symbols))
+    else:
+        from backtest import _kv, _auto
+        soak(a.cycles, a.symbols, a.step, {k: _auto(v) for k, v in _kv(a.set, None).items()})
@@ -0,0 +1,111 @@
+# portfolio.py — photo mark-to-market de tous les avoirs dans une devise commune (1 par cycle, tickers en cache):
+# allocation par coin, exposition totale et par quote, risque pondéré par l'ATR — vérifiés à chaque achat
+from config import CFG
+try:
+    import numpy as np
+except ImportError:  # repli pur Python, même résultat
+    np = None
+
+BRIDGES = ("USDT", "BTC", "ETH", "USDC")
+
+def _px(tick, symbol):
+    t = tick.get(symbol)
+    return float(t.get("price") or 0) if t else 0.0
+
+def rate(tick, ccy, home):
+    # 1 ccy = rate home: paire directe, inverse, sinon via une devise pivot; 0 si introuvable
+    if ccy == home: return 1.0
+    p = _px(tick, f"{ccy}-{home}")
+    if p > 0: return p
+    p = _px(tick, f"{home}-{ccy}")
+    if p > 0: return 1.0/p
+    for b in BRIDGES:
+        if b in (ccy, home): continue
+        a, c = _px(tick, f"{ccy}-{b}"), _px(tick, f"{b}-{home}")
+        if a > 0 and c > 0: return a*c
+    return 0.0
+
+class Portfolio:
+    # vecteurs alignés par devise: montant, taux, valeur (home), ATR %, quote de rattachement (-1 = la devise est une quote)
+    def __init__(self, ccys, amounts, rates, atrs, qidx, quotes, home):
+        self.ccys = list(ccys); self.pos = {c: i for i, c in enumerate(self.ccys)}
+        self.quotes = list(quotes); self.home = home
+        self.amt, self.rate, self.atr, self.qidx = list(amounts), list(rates), list(atrs), list(qidx)
+        self._totals()
+
+    def _totals(self):
+        # une passe: valeurs, équité, exposition (hors quotes), exposition par quote, risque = Σ valeur × ATR%
+        nq = len(self.quotes)
+        if np is not None:
+            val = np.asarray(self.amt, dtype=float)*np.asarray(self.rate, dtype=float)
+            q = np.asarray(self.qidx, dtype=np.int64); held = q >= 0
+            self.val = val.tolist(); self.equity = float(val.sum())
+            self.per_quote = np.bincount(q[held], weights=val[held], minlength=nq).tolist()
+            self.exposure = float(sum(self.per_quote))
+            self.risk = float((val[held]*np.asarray(self.atr, dtype=float)[held]).sum()/100.0)
+        else:
+            self.val = [a*r for a, r in zip(self.amt, self.rate)]; self.equity = sum(self.val)
+            self.per_quote = [0.0]*nq; self.risk = 0.0
+            for v, q, a in zip(self.val, self.qidx, self.atr):
+                if q >= 0: self.per_quote[q] += v; self.risk += v*a/100.0
+            self.exposure = sum(self.per_quote)
+
+    def value(self, ccy):
+        i = self.pos.get(ccy)
+        return self.val[i] if i is not None else 0.0
+
+    def pct(self, v):
+        return v/self.equity*100.0 if self.equity > 0 else 0.0
+
+    def headroom(self, symbol, atr_pct):
+        # montant max (en quote du symbole) achetable sans dépasser les plafonds; (montant, raison du plafond le plus serré)
+        base, quote = symbol.split("-")
+        r = self.rate[self.pos[quote]] if quote in self.pos else 0.0
+        if r <= 0 or self.equity <= 0: return 0.0, "no_rate"
+        eq = self.equity; q = self.quotes.index(quote) if quote in self.quotes else -1
+        caps = [(CFG["MAX_POS_ALLOCATION_PCT"]/100.0*eq - self.value(base), "allocation"),
+                (CFG["MAX_EXPOSURE_PCT"]/100.0*eq - self.exposure, "exposure")]
+        if q >= 0: caps.append((CFG["MAX_QUOTE_EXPOSURE_PCT"]/100.0*eq - self.per_quote[q], "quote_exposure"))
+        if CFG["MAX_RISK_PCT"] > 0 and atr_pct > 0:
+            caps.append(((CFG["MAX_RISK_PCT"]/100.0*eq - self.risk)/(atr_pct/100.0), "atr_risk"))
+        cap, why = min(caps)
+        return max(cap, 0.0)/r, why
+
+    def fill(self, symbol, side, size, avg, atr_pct=None):
+        # applique un fill à la photo (achats suivants du même cycle), sans relire soldes ni tickers
+        base, quote = symbol.split("-"); sgn = 1 if side == "buy" else -1
+        if base not in self.pos:
+            self.pos[base] = len(self.ccys); self.ccys.append(base); self.amt.append(0.0)
+            qr = self.rate[self.pos[quote]] if quote in self.pos else 0.0
+            self.rate.append(avg*qr); self.atr.append(CFG["PORTFOLIO_ATR_FALLBACK_PCT"])
+            self.qidx.append(self.quotes.index(quote) if quote in self.quotes else -1)
+        i = self.pos[base]
+        self.amt[i] += sgn*size
+        if atr_pct: self.atr[i] = atr_pct
+        if quote in self.pos: self.amt[self.pos[quote]] -= sgn*size*avg
+        self._totals()
+
+    def stats(self):
+        return {"equity": round(self.equity, 2), "ccy": self.home, "exposure_pct": round(self.pct(self.exposure), 2),
+                "per_quote_pct": {q: round(self.pct(v), 2) for q, v in zip(self.quotes, self.per_quote)},
+                "risk_pct": round(self.pct(self.risk), 3)}
+
+def snapshot(ex, positions, atrs, home=None):
+    # avoirs = quotes + positions suivies + tout le compte trade (si l'exchange l'expose); taux depuis all_tickers (cache du cycle)
+    home = home or CFG["PORTFOLIO_CCY"]
+    quotes = list(CFG["QUOTES"]); tick = ex.all_tickers()
+    held = {}   # devise -> symbole de rattachement (position suivie, sinon première quote cotée)
+    for s in positions: held.setdefault(s.split("-")[0], s)
+    if hasattr(ex, "accounts"):
+        for a in ex.accounts().get("trade", []): held.setdefault(a["currency"], None)
+    ccys = quotes + [c for c in held if c not in quotes]
+    amounts, rates, atr, qidx = [], [], [], []
+    fb = CFG["PORTFOLIO_ATR_FALLBACK_PCT"]
+    for c in ccys:
+        amounts.append(ex.balance("trade", c)); rates.append(rate(tick, c, home))
+        if c in quotes:
+            qidx.append(-1); atr.append(0.0); continue
+        sym = held[c] or next((f"{c}-{q}" for q in quotes if f"{c}-{q}" in tick), None)
+        qidx.append(quotes.index(sym.rsplit("-", 1)[1]) if sym else 0)
+        atr.append(atrs.get(sym, fb) if sym else fb)
+    return Portfolio(ccys, amounts, rates, atr, qidx, quotes, home)
@@ -0,0 +1,74 @@
+# router.py — graphe de conversion entre devises, pondéré par le carnet (top-of-book) et les frais taker
+import math, time
+from config import CFG
+
+class QuoteRouter:
+    def __init__(self):
+        self.symbols = set()
+        self.adj = {}        # devise -> {devise: (pair, side)}; side "sell" = vendre la base, "buy" = acheter la base
+        self.memo = {}       # (from, to, bucket, hops) -> (ts, route)
+        self.stats = {"rebuilds": 0, "memo_hits": 0, "searches": 0}
+
+    # ========= Graphe =========
+    def refresh(self, ex):
+        # mise à jour incrémentale: seuls les symboles ajoutés/retirés touchent le graphe
+        cur = set(ex.symbols_map())
+        if cur == self.symbols: return False
+        for sym in cur - self.symbols:
+            base, quote = sym.split('-')
+            self.adj.setdefault(base, {})[quote] = (sym, "sell")
+            self.adj.setdefault(quote, {})[base] = (sym, "buy")
+        for sym in self.symbols - cur:
+            base, quote = sym.split('-')
+            self.adj.get(base, {}).pop(quote, None)
+            self.adj.get(quote, {}).pop(base, None)
+        self.symbols = cur; self.memo.clear(); self.stats["rebuilds"] += 1
+        return True
+
+    @staticmethod
+    def rate(tick, side, fee):
+        # unités reçues pour 1 unité donnée, frais taker déduits
+        if not tick: return 0.0
+        if side == "sell":
+            bid = float(tick.get("bestBid") or 0); return bid*(1-fee)
+        ask = float(tick.get("bestAsk") or 0)
+        return (1.0/ask)*(1-fee) if ask > 0 else 0.0
+
+    # ========= Recherche =========
+    def best(self, ex, start, target, amount=1.0, max_hops=3):
+        if start == target:
+            return {"path": [start], "legs": [], "rate": 1.0, "out": amount}
+        self.refresh(ex)
+        bucket = int(math.log2(amount)) if amount > 0 else 0
+        key = (start, target, bucket, max_hops); now = time.time()
+        hit = self.memo.get(key)
+        if hit and now - hit[0] < CFG["ROUTE_TTL_SEC"]:
+            self.stats["memo_hits"] += 1
+            return dict(hit[1], out=amount*hit[1]["rate"]) if hit[1] else None
+        self.stats["searches"] += 1
+        route = self._search(ex.all_tickers(), start, target, max_hops, CFG["TAKER_FEE_PCT"]/100.0)
+        self.memo[key] = (now, route)
+        return dict(route, out=amount*route["rate"]) if route else None
+
+    def _search(self, tickers, start, target, max_hops, fee):
+        # Bellman-Ford limité en sauts sur -log(taux): plus court chemin = meilleur taux de conversion
+        best = {start: (0.0, [start], [])}
+        frontier = dict(best)
+        for _ in range(max_hops):
+            nxt = {}
+            for cur, (cost, path, legs) in frontier.items():
+                for to, (pair, side) in self.adj.get(cur, {}).items():
+                    if to in path: continue   # chemins simples seulement
+                    tick = tickers.get(pair)
+                    r = self.rate(tick, side, fee)
+                    if r <= 0: continue
+                    c = cost - math.log(r)
+                    if c < best.get(to, (math.inf,))[0] and c < nxt.get(to, (math.inf,))[0]:
+                        px = float(tick["bestBid"] if side == "sell" else tick["bestAsk"])
+                        nxt[to] = (c, path+[to], legs+[(pair, side, px)])
+            best.update(nxt)
+            frontier = {k: v for k, v in nxt.items() if k != target}
+            if not frontier: break
+        if target not in best: return None
+        cost, path, legs = best[target]
+        return {"path": path, "legs": legs, "rate": math.exp(-cost)}
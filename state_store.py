@@ -0,0 +1,68 @@
+# state_store.py — état persistant (positions, cooldowns, legs de routage) : journal append-only + snapshot compacté
+import os, json, time, threading
+
+class StateStore:
+    def __init__(self, folder, compact_every=200):
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.snap_path = os.path.join(folder, "snapshot.json")
+        self.journal_path = os.path.join(folder, "journal.jsonl")
+        self.compact_every = compact_every
+        self.state = {"positions": {}, "cooldown": {}, "legs": {}}
+        self.lock = threading.Lock()
+        self._fh = None; self._n = 0
+
+    # ========= Lecture au boot =========
+    def load(self):
+        if os.path.exists(self.snap_path):
+            with open(self.snap_path) as f: self.state = json.load(f)
+        replayed = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path) as f:
+                for line in f:
+                    try: rec = json.loads(line)
+                    except ValueError: break   # dernière ligne tronquée par un crash
+                    self._apply(rec); replayed += 1
+        self.compact()   # repart d'un journal vide
+        return self.state, replayed
+
+    def _apply(self, rec):
+        op, s = rec["op"], self.state
+        if   op == "open":      s["positions"][rec["symbol"]] = {"entry": rec["entry"], "size": rec["size"]}
+        elif op == "close":     s["positions"].pop(rec["symbol"], None)
+        elif op == "cooldown":  s["cooldown"][rec["symbol"]] = rec["until"]
+        elif op == "leg":       s["legs"][rec["id"]] = {k: rec[k] for k in ("path", "step", "amount", "ts")}
+        elif op == "leg_done":  s["legs"].pop(rec["id"], None)
+
+    # ========= Écriture =========
+    def append(self, op, **data):
+        rec = {"op": op, "ts": time.time(), **data}
+        with self.lock:
+            if self._fh is None:
+                self._fh = open(self.journal_path, "a")
+            self._fh.write(json.dumps(rec) + "\n")
+            self._fh.flush(); os.fsync(self._fh.fileno())   # durable avant de rendre la main
+            self._apply(rec); self._n += 1
+            if self._n >= self.compact_every:
+                self._compact_locked()
+
+    def compact(self):
+        with self.lock: self._compact_locked()
+
+    def _compact_locked(self):
+        now = time.time()
+        self.state["cooldown"] = {k: v for k, v in self.state["cooldown"].items() if v > now}
+        tmp = self.snap_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f); f.flush(); os.fsync(f.fileno())
+        os.replace(tmp, self.snap_path)   # atomique: ancien ou nouveau snapshot, jamais un mélange
+        self._fsync_dir()   # renommage durable AVANT de tronquer: sinon crash → ancien snapshot + journal vide
+        if self._fh: self._fh.close()
+        self._fh = open(self.journal_path, "w")   # journal tronqué une fois le snapshot durable (rejouer = idempotent)
+        self._fh.flush(); os.fsync(self._fh.fileno())
+        self._n = 0
+
+    def _fsync_dir(self):
+        dfd = os.open(self.folder, os.O_RDONLY)
+        try: os.fsync(dfd)
+        finally: os.close(dfd)
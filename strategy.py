@@ -1,18 +1,92 @@
-def ema(values, period):
-    if not values or period <= 0: return []
-    k = 2/(period+1); ema_vals = []; ema_prev = values[0]
-    for v in values:
-        ema_prev = v * k + ema_prev * (1 - k)
-        ema_vals.append(ema_prev)
-    return ema_vals
-
-def ema_cross_signal(closes):
-    if len(closes) < 60: return None, "insuffisant pour EMA"
-    ema20 = ema(closes, 20); ema50 = ema(closes, 50)
-    e20_prev, e20_last = ema20[-2], ema20[-1]
-    e50_prev, e50_last = ema50[-2], ema50[-1]
-    if e20_prev <= e50_prev and e20_last > e50_last:
-        return "buy", "EMA20 a croisé au-dessus de EMA50"
-    if e20_prev >= e50_prev and e20_last < e50_last:
-        return "sell", "EMA20 a recroisé sous EMA50"
-    return None, "pas de croisement"
\ No newline at end of file
+# strategy.py — registre des signaux: chaque stratégie déclare ses features, lues sur l'IndicatorState du symbole
+# (calculé une fois par bougie, partagé avec le filtre de régime et le sizing). Ensemble choisi/pondéré par CFG["STRATEGY"].
+import functools
+from config import CFG
+
+STRATEGIES = {}   # nom -> (fn(ind) -> "buy"|"sell"|None, clé de vote, features)
+FEATURES = ("ema", "rsi", "donchian")   # lus via ind.ema(n), ind.rsi_at(n), ind.hh_at(n) / ind.ll_at(n)
+
+def register(name, key, needs):
+    # needs: [("ema", n), ("rsi", n), ("donchian", n)]; ADX/ATR (filtre de régime, sizing) restent à 14
+    bad = [f for f, _ in needs if f not in FEATURES]
+    if bad: raise ValueError(f"{name}: features inconnues {bad} (dispo: {', '.join(FEATURES)})")
+    def deco(fn):
+        STRATEGIES[name] = (fn, key, tuple(needs))
+        return fn
+    return deco
+
+# ========= Stratégies =========
+@register("EMA_CROSS", "ema", [("ema", 20), ("ema", 50)])
+def ema_cross(ind):
+    e20p, e20 = ind.ema(20, prev=True), ind.ema(20)
+    e50p, e50 = ind.ema(50, prev=True), ind.ema(50)
+    if e20p <= e50p and e20 > e50: return "buy"
+    if e20p >= e50p and e20 < e50: return "sell"
+    return None
+
+@register("BREAKOUT", "bo", [("donchian", 20)])
+def breakout(ind):
+    if ind.close > ind.hh_at(20): return "buy"
+    if ind.close < ind.ll_at(20): return "sell"
+    return None
+
+@register("MEAN_REVERT", "mr", [("rsi", 14)])
+def mean_revert(ind):
+    r = ind.rsi_at(14)
+    if r is None: return None
+    if r < 30: return "buy"
+    if r > 70: return "sell"
+    return None
+
+# ========= Ensemble =========
+def parse(spec=None):
+    return _parse(spec if spec is not None else CFG["STRATEGY"])
+
+@functools.lru_cache(maxsize=32)
+def _parse(spec):
+    # "EMA_CROSS,BREAKOUT:2,MEAN_REVERT:0.5" -> ((nom, poids), ...)
+    out = []
+    for item in spec.split(","):
+        name, _, w = item.strip().partition(":")
+        if not name: continue
+        if name not in STRATEGIES: raise ValueError(f"stratégie inconnue: {name} (dispo: {', '.join(STRATEGIES)})")
+        out.append((name, float(w) if w else 1.0))
+    return tuple(out)
+
+def state_spec(reg_ema=None, spec=None):
+    # arguments d'IndicatorState couvrant toutes les features déclarées (+ EMA de régime); plusieurs périodes
+    # RSI / Donchian possibles, une accumulation chacune
+    per = {f: set() for f in FEATURES}; per["ema"] |= {20, 50}
+    if reg_ema: per["ema"].add(reg_ema)
+    for name, _ in parse(spec):
+        for feat, n in STRATEGIES[name][2]: per[feat].add(n)
+    primary = lambda ps, d: d if not ps or d in ps else min(ps)   # période lue par ind.rsi / ind.hh / ind.ll
+    return {"ema_periods": tuple(sorted(per["ema"])),
+            "rsi_period": primary(per["rsi"], 14), "rsi_periods": tuple(sorted(per["rsi"])),
+            "hl_period": primary(per["donchian"], 20), "hl_periods": tuple(sorted(per["donchian"]))}
+
+def ensemble_threshold(spec=None):
+    # ENSEMBLE_THRESHOLD explicite, sinon min(2, poids total): STRATEGY=EMA_CROSS seul → son vote suffit
+    th = CFG.get("ENSEMBLE_THRESHOLD")
+    return float(th) if th not in (None, "") else min(2.0, sum(w for _, w in parse(spec)))
+
+def check(spec=None):
+    # au démarrage: seuil inatteignable = bot qui n'ouvre jamais de position sans rien dire
+    total = sum(w for _, w in parse(spec)); th = ensemble_threshold(spec)
+    if total < th:
+        raise ValueError(f"STRATEGY={spec if spec is not None else CFG['STRATEGY']}: poids total {total:g} "
+                         f"< ENSEMBLE_THRESHOLD {th:g}, aucun signal possible")
+    return th
+
+def vote(ind, spec=None, threshold=None):
+    # votes pondérés: "buy" si le poids acheteur atteint le seuil et dépasse le vendeur (et inversement)
+    ens = parse(spec)
+    votes = {STRATEGIES[n][1]: STRATEGIES[n][0](ind) for n, _ in ens}
+    th = float(ensemble_threshold(spec) if threshold is None else threshold)
+    b = sum(w for n, w in ens if votes[STRATEGIES[n][1]] == "buy")
+    s = sum(w for n, w in ens if votes[STRATEGIES[n][1]] == "sell")
+    final = "buy" if b >= th and b > s else ("sell" if s >= th and s > b else None)
+    return final, votes
+
+def empty_votes(spec=None):
+    return {STRATEGIES[n][1]: None for n, _ in parse(spec)}
@@ -0,0 +1,182 @@
+# supervisor.py — mode multi-process: univers réparti sur N workers (un Ku / une clé / un budget de requêtes chacun)
+# + coordinateur de risque partagé (MAX_POSITIONS global, réservations de capital) via socket locale.
+# Usage: MODE=supervisor python main.py   (WORKERS=N, clés par worker: KUCOIN_API_KEY_<k> / _SECRET_<k> / _PASSPHRASE_<k>)
+import os, sys, time, zlib, hashlib, secrets, threading, subprocess
+from collections import defaultdict
+from multiprocessing.connection import Listener, Client
+from config import CFG
+import metrics
+
+def shard_of(symbol, n):
+    # hash stable (≠ hash() randomisé par process): un symbole reste sur le même worker d'un run à l'autre
+    return zlib.crc32(symbol.encode()) % n
+
+def account_id(api_key):
+    return hashlib.sha1((api_key or "").encode()).hexdigest()[:10]
+
+# ========= Coordinateur (process superviseur) =========
+class Coordinator:
+    def __init__(self, max_positions, hold_sec):
+        self.max_positions = max_positions
+        self.hold_sec = hold_sec   # capital engagé gardé réservé le temps que les soldes en cache des workers se rafraîchissent
+        self.slots = {}            # symbol -> {"worker", "acct", "open"}
+        self.holds = {}            # symbol -> [acct, ccy, montant, expiration (None = ordre en cours)]
+        self.reports = {}          # worker -> dernières stats poussées
+        self.lock = threading.Lock()
+        self.denied = defaultdict(int)
+
+    def _reserved(self, acct, ccy, now):
+        return sum(h[2] for h in self.holds.values() if h[0] == acct and h[1] == ccy and (h[3] is None or h[3] > now))
+
+    # opérations (appelées sous self.lock)
+    def reserve(self, worker, symbol, acct, ccy, amount, free):
+        now = time.time()
+        for s in [s for s, h in self.holds.items() if h[3] is not None and h[3] <= now]: self.holds.pop(s)
+        if symbol in self.slots: why = "held"
+        elif len(self.slots) >= self.max_positions: why = "max_positions"
+        elif self._reserved(acct, ccy, now) + amount > free + 1e-12: why = "capital_reserved"
+        else:
+            self.slots[symbol] = {"worker": worker, "acct": acct, "open": False}
+            self.holds[symbol] = [acct, ccy, amount, None]
+            return True, None
+        self.denied[why] += 1
+        return False, why
+
+    def commit(self, worker, symbol):
+        if symbol in self.slots: self.slots[symbol]["open"] = True
+        if symbol in self.holds: self.holds[symbol][3] = time.time() + self.hold_sec
+
+    def release(self, worker, symbol):
+        self.slots.pop(symbol, None); self.holds.pop(symbol, None)
+
+    def close(self, worker, symbol):
+        self.slots.pop(symbol, None); self.holds.pop(symbol, None)
+
+    def sync(self, worker, symbols):
+        # positions rechargées par le worker au boot: il en est propriétaire, ses anciens slots disparus sont libérés
+        for s in [s for s, v in self.slots.items() if v["worker"] == worker and s not in symbols]: self.slots.pop(s)
+        for s in symbols: self.slots[s] = {"worker": worker, "acct": None, "open": True}
+
+    def report(self, worker, stats):
+        self.reports[worker] = dict(stats, ts=time.time())
+
+    def _drop_pending(self, worker):
+        # worker mort/déconnecté: ses réservations sans ordre confirmé sont rendues
+        for s in [s for s, v in self.slots.items() if v["worker"] == worker and not v["open"]]:
+            self.slots.pop(s); self.holds.pop(s, None)
+
+    def _serve_conn(self, conn):
+        worker = None
+        try:
+            while True:
+                op, worker, args = conn.recv()
+                with self.lock:
+                    res = getattr(self, op)(worker, *args) if op in ("reserve", "commit", "release", "close", "sync", "report") else None
+                conn.send(res)
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self.lock: self._drop_pending(worker)
+            conn.close()
+
+    def serve(self, port, authkey):
+        lst = Listener(("127.0.0.1", port), backlog=64, authkey=authkey)   # backlog 1 par défaut: connexions simultanées perdues
+        def accept():
+            while True:
+                try: conn = lst.accept()
+                except Exception: continue   # client non authentifié / coupé pendant la poignée de main
+                threading.Thread(target=self._serve_conn, args=(conn,), daemon=True).start()
+        threading.Thread(target=accept, name="coordinator", daemon=True).start()
+        return self
+
+    def snapshot(self):
+        with self.lock:
+            return {"positions": len(self.slots), "reserved": {s: h[2] for s, h in self.holds.items()},
+                    "denied": dict(self.denied), "workers": dict(self.reports)}
+
+# ========= Client (process worker) =========
+class RiskClient:
+    def __init__(self, port, authkey, worker, api_key):
+        self.worker = worker; self.acct = account_id(api_key)
+        self.addr = ("127.0.0.1", port); self.authkey = authkey
+        self.conn = None; self.lock = threading.Lock()   # boucle + thread d'exits partagent la connexion
+
+    def _call(self, op, *args):
+        with self.lock:
+            for attempt in range(2):
+                try:
+                    if self.conn is None: self.conn = Client(self.addr, authkey=self.authkey)
+                    self.conn.send((op, self.worker, args)); return self.conn.recv()
+                except (EOFError, OSError, ConnectionError):
+                    self.conn = None
+            raise ConnectionError("coordinateur injoignable")
+
+    def reserve(self, symbol, ccy, amount, free):
+        # fail-closed: sans coordinateur, pas de nouvel achat
+        try: return tuple(self._call("reserve", symbol, self.acct, ccy, amount, free))
+        except ConnectionError: return False, "coordinator_down"
+
+    def commit(self, symbol): self._safe("commit", symbol)
+    def release(self, symbol): self._safe("release", symbol)
+    def close(self, symbol): self._safe("close", symbol)
+    def sync(self, symbols): self._safe("sync", list(symbols))
+    def report(self, stats): self._safe("report", stats)
+
+    def _safe(self, op, *args):
+        try: self._call(op, *args)
+        except ConnectionError: pass
+
+# ========= Superviseur =========
+def worker_env(k, n, shard, port, authkey):
+    env = dict(os.environ, MODE="live", WORKER_ID=str(k), SHARD=f"{k}/{n}", SYMBOLS=",".join(shard),
+               COORD_PORT=str(port), COORD_AUTHKEY=authkey.hex(),
+               STATE_DIR=os.path.join(CFG["STATE_DIR"], f"w{k}") if CFG["STATE_DIR"] else "",
+               METRICS_PORT=str(CFG["METRICS_PORT"]+1+k) if CFG["METRICS_PORT"] else "0")
+    for var in ("KUCOIN_API_KEY", "KUCOIN_API_SECRET", "KUCOIN_API_PASSPHRASE"):
+        if os.getenv(f"{var}_{k}"): env[var] = os.environ[f"{var}_{k}"]   # clé dédiée → budget de requêtes dédié
+    return env
+
+def run(logger):
+    n = max(1, CFG["WORKERS"] or os.cpu_count() or 1)
+    shards = [[s for s in CFG["SYMBOLS"] if shard_of(s, n) == k] for k in range(n)]
+    authkey = secrets.token_bytes(16)
+    coord = Coordinator(int(CFG.get("MAX_POSITIONS", 3)), CFG["ACCOUNTS_TTL_SEC"]).serve(CFG["COORD_PORT"], authkey)
+    if CFG["METRICS_PORT"]: metrics.serve(CFG["METRICS_HOST"], CFG["METRICS_PORT"])
+    logger.info(f"[Supervisor] {n} workers, MAX_POSITIONS global={coord.max_positions}, shards={[len(s) for s in shards]}")
+    procs, backoff, next_start = {}, defaultdict(lambda: 1.0), defaultdict(float)
+    last_log = 0.0
+    try:
+        while True:
+            now = time.time()
+            for k in range(n):
+                if not shards[k] and not CFG["SCREENER"]: continue
+                p = procs.get(k)
+                if p is not None and p.poll() is None: continue
+                if p is not None:
+                    logger.warning(f"[Supervisor] worker {k} arrêté (code {p.returncode}), relance dans {backoff[k]:.0f}s")
+                    next_start[k] = now + backoff[k]; backoff[k] = min(backoff[k]*2, 300); procs[k] = None
+                if now >= next_start[k]:
+                    procs[k] = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")],
+                                                env=worker_env(k, n, shards[k], CFG["COORD_PORT"], authkey))
+                    logger.info(f"[Supervisor] worker {k} lancé (pid {procs[k].pid}, {len(shards[k])} symboles)")
+            snap = coord.snapshot()
+            for w, r in snap["workers"].items():
+                for key in ("cycle_sec", "symbols", "positions", "orders"):
+                    if key in r: metrics.gauge(f"worker_{key}", r[key], worker=w)
+            metrics.gauge("global_positions", snap["positions"])
+            for why, c in snap["denied"].items(): metrics.gauge("risk_denied", c, reason=why)
+            if now - last_log > CFG["POLL_INTERVAL_SEC"]:
+                last_log = now
+                logger.info(f"[Supervisor] positions globales {snap['positions']}/{coord.max_positions} | "
+                            f"réservé {snap['reserved']} | refus {snap['denied']} | workers "
+                            f"{ {w: {k: r.get(k) for k in ('cycle_sec', 'symbols', 'positions')} for w, r in snap['workers'].items()} }")
+            time.sleep(1)
+    except KeyboardInterrupt:
+        logger.info("Arrêt manuel: arrêt des workers.")
+    finally:
+        for p in procs.values():
+            if p is not None and p.poll() is None: p.terminate()
+        for p in procs.values():
+            if p is not None:
+                try: p.wait(10)
+                except subprocess.TimeoutExpired: p.kill()
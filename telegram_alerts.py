@@ -1,11 +1,83 @@
-import requests
+import time, queue, threading, requests
 from config import CFG
 
+MAX_LEN = 4096   # limite Telegram par message
+
+class AlertDispatcher:
+    # file bornée + worker: la boucle de trading ne fait qu'un put_nowait
+    def __init__(self, maxsize=100, coalesce_sec=2.0, timeout=(3, 10)):
+        self.q = queue.Queue(maxsize)
+        self.coalesce_sec = coalesce_sec; self.timeout = timeout
+        self.session = requests.Session()   # keep-alive vers api.telegram.org
+        self.sent = 0; self.failed = 0; self.dropped = 0
+        self._thread = None; self._lock = threading.Lock()
+
+    def submit(self, text):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="telegram", daemon=True)
+                self._thread.start()
+        try:
+            self.q.put_nowait(text)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self.q.get()]
+            # rafale → un seul message
+            deadline = time.time() + self.coalesce_sec
+            while len(batch) < 50:
+                left = deadline - time.time()
+                if left <= 0: break
+                try: batch.append(self.q.get(timeout=left))
+                except queue.Empty: break
+            for msg in self._chunks(batch):
+                self._post(msg)
+            for _ in batch: self.q.task_done()
+
+    @staticmethod
+    def _chunks(batch):
+        out, cur = [], ""
+        for t in batch:
+            t = t[:MAX_LEN]
+            if cur and len(cur) + 1 + len(t) > MAX_LEN:
+                out.append(cur); cur = t
+            else:
+                cur = f"{cur}\n{t}" if cur else t
+        if cur: out.append(cur)
+        return out
+
+    def _post(self, text):
+        token = CFG["TELEGRAM_TOKEN"]; chat_id = CFG["TELEGRAM_CHAT_ID"]
+        if not token or not chat_id: return
+        for attempt in range(4):
+            try:
+                r = self.session.post(f"https://api.telegram.org/bot{token}/sendMessage",
+                                      json={"chat_id": chat_id, "text": text}, timeout=self.timeout)
+                if r.status_code == 429:
+                    # rate-limit Telegram: attendre retry_after
+                    wait = (r.json().get("parameters") or {}).get("retry_after", 2**attempt)
+                    time.sleep(min(float(wait), 60)); continue
+                if r.status_code >= 500:
+                    time.sleep(2**attempt); continue
+                if r.ok: self.sent += 1
+                else: self.failed += 1
+                return
+            except Exception:
+                time.sleep(2**attempt)
+        self.failed += 1
+
+    def flush(self, timeout=10):
+        end = time.time() + timeout
+        while self.q.unfinished_tasks and time.time() < end: time.sleep(0.05)
+
+    def stats(self):
+        return {"queued": self.q.qsize(), "sent": self.sent, "failed": self.failed, "dropped": self.dropped}
+
+dispatcher = AlertDispatcher(CFG["ALERT_QUEUE_MAX"], CFG["ALERT_COALESCE_SEC"])
+
 def send_alert(text: str):
     token = CFG["TELEGRAM_TOKEN"]; chat_id = CFG["TELEGRAM_CHAT_ID"]
     if not token or not chat_id: return
-    try:
-        requests.post(f"https://api.telegram.org/bot{token}/sendMessage",
-                      json={"chat_id": chat_id, "text": text})
-    except Exception:
-        pass
\ No newline at end of file
+    dispatcher.submit(text)
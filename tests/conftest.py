@@ -0,0 +1,12 @@
+# conftest.py — tests hors ligne: MODE non-live (pas de clés API requises), racine du repo importable
+import os, sys, time
+os.environ.setdefault("MODE", "backtest")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def wait_for(cond, timeout=5.0, step=0.02):
+    # attend qu'une condition devienne vraie (threads du flux / du serveur)
+    end = time.time() + timeout
+    while time.time() < end:
+        if cond(): return True
+        time.sleep(step)
+    return cond()
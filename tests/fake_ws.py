@@ -0,0 +1,49 @@
+# fake_ws.py — serveur WebSocket local imitant KuCoin: welcome, souscriptions enregistrées, script par connexion
+import asyncio, json, threading
+import websockets
+
+class FakeWS:
+    def __init__(self, script):
+        # script(srv, ws, n) coroutine: n = numéro de connexion (1, 2, ...); retour → connexion fermée
+        self.script = script
+        self.subs = []; self.conns = 0; self.url = None
+        self._ready = threading.Event(); self._loop = None; self._stopped = None; self._thread = None
+
+    async def subscribed(self, ws, count):
+        # lit `count` souscriptions (les pings sont ignorés)
+        while count > 0:
+            m = json.loads(await ws.recv())
+            if m.get("type") == "subscribe":
+                self.subs.append((m["topic"], m.get("privateChannel"))); count -= 1
+
+    async def send(self, ws, topic, data):
+        await ws.send(json.dumps({"type": "message", "topic": topic, "subject": "x", "data": data}))
+
+    async def hold(self, ws):
+        # garde la connexion ouverte jusqu'à sa fermeture (pings consommés)
+        async for _ in ws: pass
+
+    async def _conn(self, ws):
+        self.conns += 1
+        await ws.send(json.dumps({"type": "welcome", "id": str(self.conns)}))
+        try:
+            await self.script(self, ws, self.conns)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop(); self._stopped = self._loop.create_future()
+        async with websockets.serve(self._conn, "127.0.0.1", 0) as srv:
+            self.url = f"ws://127.0.0.1:{srv.sockets[0].getsockname()[1]}"
+            self._ready.set()
+            await self._stopped
+
+    def start(self):
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._main()), name="fake-ws", daemon=True)
+        self._thread.start(); self._ready.wait(5)
+        return self
+
+    def stop(self):
+        if not self._thread.is_alive(): return
+        self._loop.call_soon_threadsafe(self._stopped.set_result, None)
+        self._thread.join(timeout=5)
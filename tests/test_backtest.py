@@ -0,0 +1,35 @@
+# test_backtest.py — Ku simulé (volume 24h glissant) et moteur backtest.run
+import random
+import pytest
+from backtest import SimKu
+
+def rows(n, seed, t0=0):
+    rnd = random.Random(seed); p = 100.0; out = []
+    for i in range(n):
+        c = p*(1 + rnd.gauss(0, 0.01)); out.append((t0 + i*900.0, p, c, max(p, c), min(p, c), rnd.uniform(1, 50), 0.0)); p = c
+    return out
+
+def test_rolling_volume_matches_window_sum():
+    candles = {"A-USDT": rows(400, 1), "B-USDT": rows(300, 2, t0=50*900)}   # B commence plus tard
+    ex = SimKu(candles, {"USDT": 1000})
+    for ts in ex.timeline():
+        ex.step(ts)
+        tick = ex.all_tickers()
+        assert tick is ex.all_tickers()   # une seule construction par barre
+        for s, j in ex.idx.items():
+            if j < 0: assert s not in tick; continue
+            ref = sum(r[5]*r[2] for r in candles[s][max(0, j-95):j+1])
+            assert tick[s]["volValue"] == pytest.approx(ref, rel=1e-9)
+            assert tick[s]["price"] == candles[s][j][2]
+
+def test_consecutive_runs_do_not_leak_state():
+    import backtest, main
+    candles = {"A-USDT": rows(600, 3), "B-USDT": rows(600, 4)}
+    cfg = {"SYMBOLS": sorted(candles), "QUOTES": ["USDT"], "ENSEMBLE_THRESHOLD": 1, "EXEC_STYLE": "market"}
+    run = lambda: backtest.run(candles, {"USDT": 1000.0}, 0.1, 0.02, 0.0, cfg)[1]
+    first = run()
+    # reliquats d'un run précédent (combo de l'optimizer interrompu en pleine vente, screener, routes mémorisées)
+    main.exits.claimed["A-USDT"] = (1e9, 0.0); main.active_set[:] = ["ZZZ-USDT"]; main.router.memo[("X", "Y", 0, 3)] = (0, None)
+    second = run()
+    assert {k: v for k, v in second.items() if k != "elapsed_sec"} == {k: v for k, v in first.items() if k != "elapsed_sec"}
+    assert not main.router.memo.get(("X", "Y", 0, 3)) and "ZZZ-USDT" not in main.active_set
@@ -0,0 +1,104 @@
+# test_candle_store.py — CandleStore / Aggregator et synchro REST de Ku (fin, début, trous, agrégation multi-intervalles)
+import logging, time
+import pytest
+from config import CFG
+from candle_store import CandleStore, Aggregator, resample
+import exchange
+
+STEP = 900
+
+class FakeMarket:
+    # get_kline KuCoin: bougies [start, end) les plus récentes d'abord; `missing` = ts sans trade, `flaky` = absents une fois
+    def __init__(self, origin, missing=(), flaky=()):
+        self.origin = origin; self.missing = set(missing); self.flaky = set(flaky); self.calls = []
+    def get_kline(self, symbol, ktype, startAt=None, endAt=None):
+        self.calls.append((startAt, endAt))
+        now = int(time.time()); lo = max(self.origin, -(-startAt//STEP)*STEP); out = []
+        for ts in range(lo, min(endAt, now), STEP):
+            if ts in self.missing: continue
+            if ts in self.flaky: self.flaky.discard(ts); continue
+            out.append([str(ts), "1", str(ts % 97 + 1), "100", "0.5", "1", "1"])
+        return list(reversed(out))
+
+@pytest.fixture
+def ku(tmp_path, monkeypatch):
+    monkeypatch.setitem(CFG, "CANDLE_STORE", str(tmp_path/"c.sqlite"))
+    t = time.time()//STEP*STEP + STEP/2; monkeypatch.setattr(time, "time", lambda: t)   # milieu de bougie: comptes stables
+    k = exchange.Ku(logging.getLogger("test"))
+    def make(bars_back=2000, **kw):
+        k.market = FakeMarket((int(time.time())//STEP - bars_back)*STEP, **kw)
+        return k, k.market
+    return make
+
+def test_tail_sync_fetches_only_the_end(ku):
+    k, src = ku()
+    rows = k._sync_store("A-USDT", "15min", 100)
+    assert len(rows) == 100 and int(rows[-1][0]) == int(time.time())//STEP*STEP
+    last = k.store.last_ts("A-USDT", "15min"); src.calls.clear()
+    assert k._sync_store("A-USDT", "15min", 100) == rows
+    assert [c[0] for c in src.calls] == [last]   # bougie en cours seulement
+
+def test_larger_limit_fetches_history_before_first_stored_bar(ku):
+    k, src = ku(bars_back=500)
+    k._sync_store("A-USDT", "15min", 100)
+    first = k.store.first_ts("A-USDT", "15min")
+    rows = k._sync_store("A-USDT", "15min", 300)
+    assert len(rows) == 300 and int(rows[0][0]) < first
+    rows = k._sync_store("A-USDT", "15min", 1000)   # la source n'a que ~500 bougies → trou de tête vérifié
+    assert len(rows) == 501 and int(rows[0][0]) == src.origin
+    src.calls.clear(); k._sync_store("A-USDT", "15min", 1000)
+    assert len(src.calls) == 1   # début connu: seule la fin est redemandée
+
+def test_gap_refilled_and_hole_marked_only_if_still_empty(ku):
+    now = int(time.time())//STEP*STEP
+    k, src = ku(missing={now - 50*STEP}, flaky={now - 30*STEP})
+    rows = k._sync_store("A-USDT", "15min", 100)
+    ts = {int(r[0]) for r in rows}
+    assert now - 30*STEP in ts   # absent au premier passage, récupéré par la relecture du trou
+    assert now - 50*STEP not in ts and len(rows) == 99
+    assert k.store.gaps("A-USDT", "15min") == []   # trou sans trade marqué, l'autre comblé
+    holes = k.store.db.execute("SELECT ts_from, ts_to FROM holes").fetchall()
+    assert holes == [(now - 50*STEP, now - 49*STEP)]
+    src.calls.clear(); k._sync_store("A-USDT", "15min", 100)
+    assert len(src.calls) == 1
+
+def test_read_limits_and_bounds(tmp_path):
+    st = CandleStore(str(tmp_path/"c.sqlite"))
+    st.upsert("A-USDT", "15min", [[str(t*STEP), "1", "2", "3", "0.5", "1", "1"] for t in range(10)])
+    assert [int(r[0]) for r in st.read("A-USDT", "15min", 3)] == [7*STEP, 8*STEP, 9*STEP]
+    assert [int(r[0]) for r in st.read("A-USDT", "15min", start=2*STEP, end=4*STEP)] == [2*STEP, 3*STEP]
+    assert len(st.read("A-USDT", "15min")) == 10 and st.read("B-USDT", "15min") == []
+    assert st.read("A-USDT", "15min", 1)[0] == [str(9*STEP), "1", "2", "3", "0.5", "1", "1"]
+
+def row(ts, o, c, h, l):
+    return [str(ts), str(o), str(c), str(h), str(l), "1", "2"]
+
+def test_resample_and_ingest():
+    base = [row(3600 + i*STEP, 10+i, 11+i, 20+i, 5+i) for i in range(-1, 8)]   # 1re barre 1hour partielle
+    bars = resample(base, 3600)
+    assert [b[0] for b in bars] == ["3600", "7200"]
+    assert bars[0][1:5] == ["10", "14", "23", "5"] and bars[0][5:] == ["4.0", "8.0"]
+    agg = Aggregator("15min")
+    agg.seed("A-USDT", "1hour", base[:-1], now=100.0)
+    assert agg.get("A-USDT", "1hour", 5)[-1][:3] == ["7200", "14", "17"]   # barre en cours partielle
+    agg.ingest("A-USDT", base[-3:], now=150.0)   # ne remonte pas au début de la barre en cours → ignoré
+    assert agg.get("A-USDT", "1hour", 5)[-1][2] == "17"
+    agg.ingest("A-USDT", base[-4:] + [row(3600 + 8*STEP, 1, 2, 99, 0.1)], now=200.0)
+    last = agg.get("A-USDT", "1hour", 5)
+    assert [b[0] for b in last] == ["3600", "7200", "10800"] and last[1][2] == "18" and last[2][3] == "99"
+
+def test_fresh_requires_history_unless_source_exhausted():
+    base = [row(i*STEP, 1, 1, 1, 1) for i in range(64)]   # 16 barres 1hour
+    agg = Aggregator("15min")
+    agg.seed("A-USDT", "1hour", base, now=1000.0)
+    assert agg.fresh("A-USDT", "1hour", 10, now=1000.0) and not agg.fresh("A-USDT", "1hour", 50, now=1000.0)
+    assert not agg.fresh("A-USDT", "1hour", 10, now=1000.0 + STEP)   # périmé après une bougie de base
+    agg.seed("A-USDT", "1hour", base, exhausted=True, now=1000.0)
+    assert agg.fresh("A-USDT", "1hour", 50, now=1000.0)
+
+def test_htf_on_existing_short_store_gets_full_history(ku, monkeypatch):
+    monkeypatch.setitem(CFG, "MTF_LOCAL", True)
+    k, src = ku(bars_back=2000)
+    k.klines("A-USDT", "15min", 240)   # store amorcé avec 240 bougies seulement
+    bars = k.klines("A-USDT", "4hour", 50)
+    assert len(bars) == 50 and k.mtf.fresh("A-USDT", "4hour", 50)
@@ -0,0 +1,107 @@
+# test_exchange.py — Ku contre des clients SDK factices (pas de réseau): ordres idempotents par clientOid, cache REST
+import logging, threading, time
+import pytest
+from conftest import wait_for
+from config import CFG
+import exchange
+
+class Timeout(Exception): pass
+
+def sdk_error(code):
+    return Exception('200-{"code":"%s","msg":"refus"}' % code)
+
+class FakeTrade:
+    # create_*: lève les erreurs de `fail` une à une puis accepte; `lost` = ordres créés côté serveur malgré l'erreur
+    def __init__(self, fail=(), lost=False):
+        self.fail = list(fail); self.lost = lost; self.submits = []; self.orders = {}
+    def _create(self, oid):
+        self.submits.append(oid)
+        if self.fail:
+            if self.lost: self.orders[oid] = {"id": f"S{len(self.submits)}", "clientOid": oid}
+            raise self.fail.pop(0)
+        self.orders[oid] = {"id": f"S{len(self.submits)}", "clientOid": oid}
+        return {"orderId": self.orders[oid]["id"]}
+    def create_market_order(self, symbol, side, clientOid=None, size=None): return self._create(clientOid)
+    def create_limit_order(self, symbol, side, size, price, clientOid=None, **kw): return self._create(clientOid)
+    def get_client_order_details(self, oid):
+        if oid not in self.orders: raise sdk_error("400100")
+        return self.orders[oid]
+
+@pytest.fixture
+def ku(monkeypatch):
+    monkeypatch.setitem(CFG, "DRY_RUN", False); monkeypatch.setitem(CFG, "CANDLE_STORE", "")
+    monkeypatch.setattr(exchange.time, "sleep", lambda s: None)   # backoff sans attente réelle
+    k = exchange.Ku(logging.getLogger("test"))
+    def make(**kw):
+        k.trade = FakeTrade(**kw); return k
+    return make
+
+def test_timeout_then_order_found_by_client_oid_is_not_resubmitted(ku):
+    k = ku(fail=[Timeout("read timed out")], lost=True)
+    res = k.place_order("BTC-USDT", "buy", size="0.1", type_="market")
+    assert len(k.trade.submits) == 1
+    assert res == {"orderId": "S1", "clientOid": k.trade.submits[0]}
+
+def test_timeout_not_found_retries_with_same_client_oid(ku):
+    k = ku(fail=[Timeout("read timed out"), Exception("503-unavailable")])
+    res = k.place_order("BTC-USDT", "sell", size="0.1", price="100", client_oid="abc")
+    assert k.trade.submits == ["abc"]*3 and res == {"orderId": "S3", "clientOid": "abc"}
+
+def test_business_refusal_not_retried(ku):
+    k = ku(fail=[sdk_error("400100")])
+    with pytest.raises(Exception, match="400100"):
+        k.place_order("BTC-USDT", "buy", size="0.1", type_="market")
+    assert len(k.trade.submits) == 1
+
+@pytest.mark.parametrize("err,retry", [
+    (Exception('200-{"code":"400100","msg":"balance"}'), False),   # code métier 6 chiffres
+    (Exception('200-{"code":"900001","msg":"symbol"}'), False),
+    (Exception('200-{"code":"429000","msg":"too many"}'), True),   # quota: rejouable
+    (Exception("429-Too Many Requests"), True),
+    (Exception("404-not found"), False),
+    (Exception("503-unavailable"), True),
+    (Timeout("read timed out"), True),   # réseau
+])
+def test_retryable_classification(err, retry):
+    assert exchange._retryable(err) is retry
+
+# ========= Cache / coalescence =========
+class FakeMarket:
+    def __init__(self):
+        self.calls = 0; self.gate = threading.Event(); self.gate.set(); self.fail = None
+    def get_ticker(self, symbol):
+        self.calls += 1; self.gate.wait(5)
+        if self.fail: raise self.fail
+        return {"price": str(self.calls), "symbol": symbol}
+
+@pytest.fixture
+def cached(ku):
+    k = ku(); k.market = FakeMarket()
+    return k, k.market
+
+def test_concurrent_misses_share_one_fetch(cached):
+    k, src = cached; src.gate.clear(); got = []
+    threads = [threading.Thread(target=lambda: got.append(k.ticker("A-USDT"))) for _ in range(8)]
+    for t in threads: t.start()
+    assert wait_for(lambda: k.hits["ticker"] == 7)   # 7 threads attendent la requête du premier
+    src.gate.set()
+    for t in threads: t.join(5)
+    assert src.calls == 1 and len(got) == 8 and all(g is got[0] for g in got)
+    assert k.cache_stats()["ticker"] == {"hits": 7, "misses": 1} and not k._inflight
+
+def test_ttl_expiry_and_invalidate(cached, monkeypatch):
+    k, src = cached; k.ttl["ticker"] = 5
+    assert k.ticker("A-USDT")["price"] == "1" and k.ticker("A-USDT")["price"] == "1"
+    t = time.time() + 6; monkeypatch.setattr(time, "time", lambda: t)
+    assert k.ticker("A-USDT")["price"] == "2"   # TTL dépassé → relu
+    k.ttl["ticker"] = 60
+    k.ticker("B-USDT"); k.invalidate("ticker", "A-USDT")
+    assert k.ticker("A-USDT")["price"] == "4" and k.ticker("B-USDT")["price"] == "3"   # B encore en cache
+    k.invalidate()
+    assert k.ticker("B-USDT")["price"] == "5" and src.calls == 5
+
+def test_failed_fetch_is_shared_but_not_cached(cached):
+    k, src = cached; src.fail = ConnectionError("boom")
+    with pytest.raises(ConnectionError): k.ticker("A-USDT")
+    src.fail = None
+    assert k.ticker("A-USDT")["price"] == "2" and not k._inflight
@@ -0,0 +1,37 @@
+# test_execution.py — arrondis Decimal aux incréments KuCoin et tailles envoyées par l'Executor
+import logging
+import pytest
+from config import CFG
+from execution import snap, size_str, price_str, funds_ok, Executor
+
+M = {"symbol": "A-USDT", "baseIncrement": "0.001", "priceIncrement": "0.05", "minFunds": "1", "baseMinSize": "0.01"}
+
+class Ex:
+    def __init__(self): self.orders = []
+    def symbols_map(self): return {"A-USDT": M}
+    def ticker(self, s): return {"price": "10", "bestBid": "9.99", "bestAsk": "10.01"}
+    def place_order(self, symbol, side, size=None, price=None, type_="limit", client_oid=None, post_only=False):
+        self.orders.append((side, size, price, type_)); return {"orderId": "DRYRUN"}
+    def invalidate(self, *a): pass
+
+@pytest.mark.parametrize("value,step,up,out", [
+    (0.3, "0.1", False, "0.3"), (0.1 + 0.2, "0.1", False, "0.3"),   # pas de 0.30000000000000004
+    (1.23456, "0.0001", False, "1.2345"), (1.23451, "0.0001", True, "1.2346"),
+    (7.9, "1", False, "7"), (7.1, "1", True, "8"), (0.0000123, "0.00000001", False, "0.00001230"),
+    (12.34, "0.05", False, "12.30"), (12.34, "0.05", True, "12.35"),
+])
+def test_snap_exact_multiples(value, step, up, out):
+    assert snap(value, step, up) == out
+
+def test_size_price_and_min_funds():
+    ex = Ex()
+    assert size_str(ex, "A-USDT", 0.12399) == "0.123" and size_str(ex, "A-USDT", 0.0099) is None   # < baseMinSize
+    assert price_str(ex, "A-USDT", 10.03, "buy") == "10.00" and price_str(ex, "A-USDT", 10.03, "sell") == "10.05"
+    assert funds_ok(ex, "A-USDT", "0.1", "10") and not funds_ok(ex, "A-USDT", "0.099", "10")
+
+def test_market_sends_snapped_size_and_skips_below_min_funds(monkeypatch):
+    monkeypatch.setitem(CFG, "TAKER_FEE_PCT", 0.1)
+    ex, exe = Ex(), Executor(logging.getLogger("test"))
+    agg = exe.market(ex, "A-USDT", "buy", 0.56789)
+    assert ex.orders == [("buy", "0.567", None, "market")] and agg["size"] == 0.567
+    assert exe.market(ex, "A-USDT", "buy", 0.0995)["orders"] == 0 and len(ex.orders) == 1   # 0.099 × 10.01 < minFunds
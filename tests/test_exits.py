@@ -0,0 +1,70 @@
+# test_exits.py — TP/SL: une seule vente quand un signal et un déclenchement se croisent, poll isolé par symbole
+import logging, threading
+import pytest
+from config import CFG
+import metrics
+from exits import ExitManager
+
+M = {"baseIncrement": "0.0001", "priceIncrement": "0.01", "minFunds": "0.1", "baseMinSize": "0.0001"}
+
+class Ex:
+    feed = None
+    def __init__(self, prices=None, fail=()):
+        self.prices = prices or {}; self.fail = set(fail); self.sells = []; self.gate = None; self.entered = threading.Event()
+    def symbols_map(self): return {s: M for s in ("A-USDT", "B-USDT", "C-USDT")}
+    def ticker(self, s):
+        if s not in self.prices: raise ConnectionError("ticker timeout")
+        return {"price": str(self.prices[s])}
+    def place_order(self, symbol, side, size=None, price=None, type_="limit", client_oid=None, post_only=False):
+        self.entered.set()
+        if self.gate: self.gate.wait(5)
+        if symbol in self.fail: raise Exception('200-{"code":"400100"}')
+        self.sells.append((symbol, size)); return {"orderId": "X"}
+
+@pytest.fixture
+def mgr(monkeypatch):
+    monkeypatch.setitem(CFG, "TP_PCT", 2.0); monkeypatch.setitem(CFG, "SL_PCT", 1.0)
+    def make(ex):
+        m = ExitManager({}, {}, logging.getLogger("test"), lambda msg: None).bind(ex)
+        for s in ("A-USDT", "B-USDT", "C-USDT"): m.arm(s, 100.0, 1.0)
+        return m
+    return make
+
+def test_claim_suspends_tp_sl_and_release_rearms(mgr):
+    ex = Ex(); m = mgr(ex)
+    assert m.claim("A-USDT") and not m.claim("A-USDT")   # déjà réservé par une vente sur signal
+    assert m.on_price("A-USDT", 103.0) is None and ex.sells == []
+    m.release("A-USDT")
+    assert m.on_price("A-USDT", 103.0) == "TP" and ex.sells == [("A-USDT", "1.0000")]
+    assert not m.claim("A-USDT")   # soldée par le TP: plus rien à vendre
+
+def test_claim_then_disarm_after_signal_sell(mgr):
+    ex = Ex(); m = mgr(ex)
+    assert m.claim("B-USDT")
+    assert m.disarm("B-USDT") == {"entry": 100.0, "size": 1.0}   # vente sur signal exécutée
+    m.release("B-USDT")   # no-op: la position n'existe plus
+    assert "B-USDT" not in m.levels and "B-USDT" not in m.claimed and m.on_price("B-USDT", 50.0) is None
+
+def test_signal_claim_waits_for_in_flight_trigger(mgr):
+    ex = Ex(); ex.gate = threading.Event(); m = mgr(ex)
+    t = threading.Thread(target=m.on_price, args=("C-USDT", 98.0)); t.start()   # SL en cours d'envoi
+    assert ex.entered.wait(5)
+    got = []; c = threading.Thread(target=lambda: got.append(m.claim("C-USDT"))); c.start()
+    c.join(0.1); assert c.is_alive()   # claim bloqué tant que l'ordre SL n'est pas accepté
+    ex.gate.set(); t.join(5); c.join(5)
+    assert got == [False] and ex.sells == [("C-USDT", "1.0000")] and m.fired["SL"] == 1
+
+def test_poll_isolates_failing_symbols(mgr):
+    # A: ticker en erreur, B: ordre refusé, C: SL exécuté quand même
+    ex = Ex(prices={"B-USDT": 105.0, "C-USDT": 98.0}, fail={"B-USDT"}); m = mgr(ex)
+    m.poll(now=1000.0)
+    assert ex.sells == [("C-USDT", "1.0000")]
+    assert set(m.levels) == {"A-USDT", "B-USDT"} and m.cooldown == {"C-USDT": 1000.0 + CFG.get("COOLDOWN_SEC", 90)}
+
+def test_trigger_latency_exported(mgr):
+    ex = Ex(); m = mgr(ex)
+    key = metrics._key("exit_trigger_to_order_seconds", {"reason": "TP"})
+    before = sum(metrics.hists.get(key, [0])[:-1])
+    m.on_price("A-USDT", 110.0)
+    assert sum(metrics.hists[key][:-1]) == before + 1
+    assert "exit_trigger_to_order_seconds_bucket" in metrics.render()
@@ -0,0 +1,61 @@
+# test_indicators.py — IndicatorState: recalcul exact sur la fenêtre du cycle (défaut) vs état continu (INDICATOR_STREAM)
+import pytest
+import indicators
+import backtest
+import indicators_np
+import main
+from config import CFG
+from test_indicators_np import klines
+
+EMAS = (20, 50, 200)
+
+def window_ref(kl):
+    closes = [float(k[2]) for k in kl]
+    return {"ema": {p: indicators.ema(closes, p)[-1] for p in EMAS}, "rsi": indicators.rsi(closes, 14)[-1],
+            "adx": indicators.adx(kl, 14), "atr_pct": indicators.atr_pct(kl, 14)}
+
+def test_state_on_window_matches_scalar_functions():
+    kl = klines(240, 1)
+    st = indicators.IndicatorState(EMAS).update(kl)
+    ref = window_ref(kl)
+    assert {p: st.ema(p) for p in EMAS} == ref["ema"]
+    assert (st.rsi, st.adx, st.atr_pct) == (ref["rsi"], ref["adx"], ref["atr_pct"])
+    rev = [list(r) for r in kl]; rev[-1][2] = str(float(rev[-1][2])*1.01)   # bougie en formation révisée → rejouée
+    st.update(rev[-1:])
+    assert st.ema(20) == indicators.ema([float(k[2]) for k in rev], 20)[-1] and st.n == 240
+
+def test_ind_for_recomputes_window_by_default(monkeypatch):
+    monkeypatch.setitem(CFG, "INDICATOR_STREAM", False); monkeypatch.setattr(main, "ind_states", {})
+    kl = klines(600, 2)
+    for i in range(main.WINDOW, 600, 50):
+        ind = main.ind_for("A-USDT", kl[i-main.WINDOW:i], 200)
+        ref = window_ref(kl[i-main.WINDOW:i])
+        assert {p: ind.ema(p) for p in EMAS} == ref["ema"] and (ind.rsi, ind.adx) == (ref["rsi"], ref["adx"])
+
+def test_stream_drift_is_bounded(monkeypatch):
+    # état continu: EMA courtes quasi exactes, EMA200 / RSI / ADX s'écartent de la fenêtre (bornes ci-dessous)
+    monkeypatch.setitem(CFG, "INDICATOR_STREAM", True); monkeypatch.setattr(main, "ind_states", {})
+    kl = klines(3000, 7); worst = dict.fromkeys(("e20", "e50", "e200", "rsi", "adx", "atr"), 0.0)
+    for i in range(main.WINDOW, 3000, 37):
+        st = main.ind_for("A-USDT", kl[i-main.WINDOW:i], 200)
+        ref = window_ref(kl[i-main.WINDOW:i])
+        for p in EMAS: worst[f"e{p}"] = max(worst[f"e{p}"], abs(st.ema(p)/ref["ema"][p] - 1))
+        worst["rsi"] = max(worst["rsi"], abs(st.rsi - ref["rsi"]))
+        worst["adx"] = max(worst["adx"], abs(st.adx - ref["adx"]))
+        worst["atr"] = max(worst["atr"], abs(st.atr_pct - ref["atr_pct"]))
+    assert worst["e20"] < 1e-9 and worst["e50"] < 1e-4 and worst["atr"] == 0
+    assert 1e-4 < worst["e200"] < 0.05
+    assert worst["rsi"] < 1e-3 and worst["adx"] < 1e-3
+
+@pytest.mark.parametrize("numpy_backend", [True, False])
+def test_tape_window_matches_state_per_window(monkeypatch, numpy_backend):
+    if numpy_backend and not indicators_np.available(): pytest.skip("numpy absent")
+    if not numpy_backend: monkeypatch.setattr(indicators_np, "available", lambda: False)
+    rows = [(float(k[0]), float(k[1]), float(k[2]), float(k[3]), float(k[4]), 1.0, 1.0) for k in klines(400, 5)]
+    tape = backtest.TapeState(rows, EMAS, window=240, rsi_periods=(7,), hl_periods=(55,))
+    for i in (0, 100, 239, 240, 321, 399):
+        st = indicators.IndicatorState(EMAS, rsi_periods=(7,), hl_periods=(55,)).update(rows[max(0, i-239):i+1])
+        tape.update(rows[i:i+1])
+        assert (tape.n, tape.close, tape.rsi, tape.rsi_at(7), tape.adx, tape.atr_pct, tape.hh_at(55), tape.ll) == \
+               (st.n, st.close, st.rsi, st.rsi_at(7), st.adx, st.atr_pct, st.hh_at(55), st.ll)
+        assert all(tape.ema(p) == st.ema(p) and tape.ema(p, True) == st.ema(p, True) for p in EMAS)
@@ -0,0 +1,66 @@
+# test_indicators_np.py — parité du backend NumPy avec les fonctions scalaires d'indicators.py (au bit près)
+import random
+import pytest
+np = pytest.importorskip("numpy")
+import indicators
+import indicators_np
+
+def klines(n, seed, flat=False):
+    rnd = random.Random(seed); p = 100.0; out = []
+    for i in range(n):
+        o = p; c = p if flat else p*(1 + rnd.gauss(0, 0.01))
+        h = max(o, c)*(1 + abs(rnd.gauss(0, 0.003))); l = min(o, c)*(1 - abs(rnd.gauss(0, 0.003)))
+        out.append([str(1_700_000_000 + i*900), str(o), str(c), str(h), str(l), "1", "1"]); p = c
+    return out
+
+def scalar(kl, ema_periods, rsi_p=14, hl_p=20):
+    closes = [float(k[2]) for k in kl]
+    r = indicators.rsi(closes, rsi_p)
+    return {"ema": {p: indicators.ema(closes, p)[-2:] for p in ema_periods}, "rsi": r[-1] if r else None,
+            "adx": indicators.adx(kl, 14), "atr_pct": indicators.atr_pct(kl, 14),
+            "hh": max(float(k[3]) for k in kl[-hl_p:]), "ll": min(float(k[4]) for k in kl[-hl_p:])}
+
+@pytest.mark.parametrize("bars", [240, 60, 30, 16])
+def test_batch_matches_scalar_functions(bars):
+    payloads = {f"S{i}-USDT": klines(300, i) for i in range(12)}
+    payloads["FLAT-USDT"] = klines(300, 99, flat=True)   # pertes nulles → RS = 999999
+    views = indicators_np.batch(payloads, bars, ema_periods=(20, 50, 200))
+    assert sorted(views) == sorted(payloads)
+    for sym, v in views.items():
+        ref = scalar(payloads[sym][-bars:], (20, 50, 200))
+        for p, (prev, last) in ref["ema"].items():
+            assert v.ema(p) == last and v.ema(p, prev=True) == prev
+        assert v.rsi == ref["rsi"]
+        assert v.adx == ref["adx"] and v.atr_pct == ref["atr_pct"]
+        assert v.hh == ref["hh"] and v.ll == ref["ll"]
+        assert v.n == bars and v.close == float(payloads[sym][-1][2])
+
+def test_extra_periods_match_scalar():
+    payloads = {f"S{i}-USDT": klines(240, i) for i in range(5)}
+    views = indicators_np.batch(payloads, 240, (20, 50), rsi_period=14, hl_period=20, rsi_periods=(7, 21), hl_periods=(10, 55))
+    for sym, v in views.items():
+        kl = payloads[sym]; closes = [float(k[2]) for k in kl]
+        for p in (7, 14, 21): assert v.rsi_at(p) == indicators.rsi(closes, p)[-1]
+        for p in (10, 20, 55):
+            assert v.hh_at(p) == max(float(k[3]) for k in kl[-p:]) and v.ll_at(p) == min(float(k[4]) for k in kl[-p:])
+
+def test_matches_indicator_state_on_window():
+    kl = klines(240, 3)
+    v = indicators_np.batch({"A-USDT": kl}, 240)["A-USDT"]
+    st = indicators.IndicatorState((20, 50, 200)).update(kl)
+    for p in (20, 50, 200): assert v.ema(p) == st.ema(p) and v.ema(p, True) == st.ema(p, True)
+    assert (v.rsi, v.adx, v.atr_pct, v.hh, v.ll) == (st.rsi, st.adx, st.atr_pct, st.hh, st.ll)
+
+def test_short_history_skipped_and_rsi_warmup():
+    views = indicators_np.batch({"A-USDT": klines(100, 1), "B-USDT": klines(300, 2)}, 240)
+    assert list(views) == ["B-USDT"]
+    v = indicators_np.batch({"A-USDT": klines(15, 1)}, 15)["A-USDT"]   # 14 différences: RSI pas encore défini
+    assert v.rsi is None and indicators.rsi([float(k[2]) for k in klines(15, 1)], 14)[-1] is None
+
+def test_parse_once_and_donchian():
+    kl = klines(50, 4)
+    a = indicators_np.parse_klines(kl)
+    assert a.flags["C_CONTIGUOUS"] and a.dtype == np.float64
+    assert a[7].tolist() == [float(kl[7][j]) for j in (0, 1, 3, 4, 2, 5)]
+    hi, lo = indicators_np.donchian(a[None, :, indicators_np.H], a[None, :, indicators_np.L], 20)
+    assert np.isnan(hi[0, 18]) and hi[0, -1] == max(float(k[3]) for k in kl[-20:]) and lo[0, -1] == min(float(k[4]) for k in kl[-20:])
@@ -0,0 +1,77 @@
+# test_ledger.py — Ledger + AccountFeed contre un serveur WebSocket local (soldes poussés, reconnexion, réconciliation)
+import logging, time
+import pytest
+from conftest import wait_for
+from config import CFG
+from fake_ws import FakeWS
+from ledger import Ledger, AccountFeed
+
+log = logging.getLogger("test")
+TOPICS = [("/account/balance", True), ("/spotMarket/tradeOrders", True)]
+
+def acct(typ, ccy, bal, avail=None, holds=0):
+    return {"type": typ, "currency": ccy, "balance": str(bal), "available": str(bal if avail is None else avail), "holds": str(holds)}
+
+def push(ccy, total, event="trade.setted"):
+    return {"currency": ccy, "total": str(total), "available": str(total), "hold": "0", "relationEvent": event}
+
+@pytest.fixture
+def run():
+    started = []
+    def go(script, accounts=()):
+        srv = FakeWS(script).start()
+        ledger = Ledger(log); ledger.load(list(accounts))
+        feed = AccountFeed(log, ledger, url=srv.url)
+        started.append((srv, feed))
+        feed.start()
+        return srv, ledger
+    yield go
+    for srv, feed in started:
+        srv.stop(); feed.stop()
+
+def test_balance_pushes_applied(run):
+    async def script(srv, ws, n):
+        await srv.subscribed(ws, 2)
+        await srv.send(ws, "/account/balance", push("USDT", 90))
+        await srv.send(ws, "/account/balance", push("USDT", 5, "main.deposit"))
+        await srv.hold(ws)
+    srv, ledger = run(script, [acct("trade", "USDT", 100), acct("trade", "BTC", 0.5, 0.4, 0.1)])
+    assert wait_for(lambda: ledger.events == 2)
+    assert ledger.live() and srv.subs == TOPICS
+    assert ledger.get("trade", "USDT") == 90 and ledger.get("main", "USDT") == 5
+    assert ledger.bal[("trade", "BTC")] == [0.5, 0.4, 0.1] and ledger.get("trade", "ETH") == 0.0
+
+def test_reconnects_resubscribes_and_not_live_when_down(run):
+    async def script(srv, ws, n):
+        await srv.subscribed(ws, 2)
+        await srv.send(ws, "/account/balance", push("USDT", 100 + n))
+        if n > 1: await srv.hold(ws)   # 1re connexion coupée par le serveur
+    srv, ledger = run(script, [acct("trade", "USDT", 100)])
+    assert wait_for(lambda: srv.conns == 2 and ledger.live() and ledger.get("trade", "USDT") == 102)
+    assert ledger.feed.reconnects == 1 and srv.subs == TOPICS*2
+    srv.stop()   # flux perdu → Ku relit les soldes par REST
+    assert wait_for(lambda: not ledger.live())
+
+def test_fill_without_balance_event_makes_reconcile_due(run, monkeypatch):
+    monkeypatch.setitem(CFG, "LEDGER_GRACE_SEC", 0.05); monkeypatch.setitem(CFG, "LEDGER_RECONCILE_SEC", 3600)
+    async def script(srv, ws, n):
+        await srv.subscribed(ws, 2)
+        await srv.send(ws, "/spotMarket/tradeOrders", {"type": "open", "symbol": "BTC-USDT"})
+        await srv.send(ws, "/spotMarket/tradeOrders", {"type": "filled", "symbol": "BTC-USDT"})
+        await srv.send(ws, "/account/balance", push("USDT", 40))   # solde quote reçu, base manquante
+        await srv.hold(ws)
+    srv, ledger = run(script, [acct("trade", "USDT", 100)])
+    assert wait_for(lambda: ledger.events == 1)
+    assert set(ledger.touched) == {"BTC"}
+    assert not ledger.due(time.time()) and ledger.due(time.time() + 0.1)
+    drift = ledger.reconcile([acct("trade", "USDT", 40), acct("trade", "BTC", 0.001)])
+    assert drift == {("trade", "BTC"): (0.0, 0.001)}
+    assert ledger.get("trade", "BTC") == 0.001 and not ledger.touched and not ledger.due()
+    assert ledger.stats() == {"live": True, "currencies": 2, "events": 1, "reconciles": 1, "drifts": 1}
+
+def test_reconcile_drops_vanished_balances_and_seed_has_no_drift():
+    ledger = Ledger(log)
+    assert ledger.load([acct("trade", "USDT", 100), acct("trade", "USDT", 1)]) == {}   # amorçage: pas d'écart
+    assert ledger.get("trade", "USDT") == 101 and ledger.seeded and not ledger.live()   # pas de flux → REST
+    assert ledger.reconcile([]) == {("trade", "USDT"): (101.0, 0.0)}
+    assert ledger.get("trade", "USDT") == 0.0 and ledger.drifts == 1
@@ -0,0 +1,77 @@
+# test_market_feed.py — MarketFeed contre un serveur WebSocket local (tickers, bougies, level2, reconnexion)
+import logging
+import pytest
+from conftest import wait_for
+from fake_ws import FakeWS
+from market_feed import MarketFeed
+
+log = logging.getLogger("test")
+ROW = ["1700000000", "1", "2", "3", "0.5", "10", "20"]
+
+@pytest.fixture
+def run():
+    started = []
+    def go(script, symbols=("BTC-USDT",), books=None):
+        srv = FakeWS(script).start()
+        feed = MarketFeed(log, symbols, url=srv.url)
+        if books is not None: feed.attach_books(books)
+        started.append((srv, feed))
+        return srv, feed.start()
+    yield go
+    for srv, feed in started:
+        srv.stop(); feed.stop()
+
+async def _ticks(srv, ws, prices):
+    for p in prices:
+        await srv.send(ws, "/market/ticker:BTC-USDT", {"price": str(p), "bestBid": "99", "bestAsk": "101", "time": 1})
+    await srv.send(ws, "/market/candles:BTC-USDT_15min", {"symbol": "BTC-USDT", "candles": ROW, "time": 1})
+
+def test_subscribes_and_caches_ticks(run):
+    async def script(srv, ws, n):
+        await srv.subscribed(ws, 2)
+        await _ticks(srv, ws, [100, 101])
+        await srv.hold(ws)
+    got = []
+    srv, feed = run(script)
+    feed.listeners.append(lambda s, p: got.append((s, p)))
+    assert wait_for(lambda: feed.live_klines("BTC-USDT") and len(got) == 2)
+    assert feed.ticker("BTC-USDT")["price"] == "101"
+    assert feed.live_klines("BTC-USDT") == [ROW]
+    assert got == [("BTC-USDT", 100.0), ("BTC-USDT", 101.0)]
+    assert srv.subs == [("/market/ticker:BTC-USDT", False), ("/market/candles:BTC-USDT_15min", False)]
+    assert feed.ticker("ETH-USDT") is None
+
+def test_reconnects_and_resubscribes(run):
+    async def script(srv, ws, n):
+        await srv.subscribed(ws, 2)
+        await _ticks(srv, ws, [100 + n])
+        if n > 1: await srv.hold(ws)   # 1re connexion coupée par le serveur
+    srv, feed = run(script)
+    assert wait_for(lambda: srv.conns == 2 and feed.connected and (feed.ticker("BTC-USDT") or {}).get("price") == "102")
+    assert feed.reconnects == 1
+    assert [t for t, _ in srv.subs] == ["/market/ticker:BTC-USDT", "/market/candles:BTC-USDT_15min"]*2
+
+def test_not_fresh_when_disconnected(run):
+    async def script(srv, ws, n):
+        await srv.subscribed(ws, 2)
+        await _ticks(srv, ws, [100])
+        await srv.hold(ws)
+    srv, feed = run(script)
+    assert wait_for(lambda: feed.ticker("BTC-USDT"))
+    srv.stop()   # serveur perdu → Ku repasse en REST
+    assert wait_for(lambda: not feed.connected)
+    assert feed.ticker("BTC-USDT") is None and feed.live_klines("BTC-USDT") == []
+
+def test_level2_routed_to_books(run):
+    class Books:
+        diffs = []
+        def on_diff(self, symbol, d): self.diffs.append((symbol, d["sequenceEnd"]))
+    books = Books()
+    async def script(srv, ws, n):
+        await srv.subscribed(ws, 3)
+        await srv.send(ws, "/market/level2:BTC-USDT", {"sequenceStart": 5, "sequenceEnd": 5, "changes": {}})
+        await srv.hold(ws)
+    srv, feed = run(script, books=books)
+    assert wait_for(lambda: books.diffs)
+    assert books.diffs == [("BTC-USDT", 5)] and books.live()
+    assert srv.subs[-1] == ("/market/level2:BTC-USDT", False)
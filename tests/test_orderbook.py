@@ -0,0 +1,48 @@
+# test_orderbook.py — carnet L2: taille max sous budget d'impact, diffs, resynchro sur trou de séquence
+import pytest
+from orderbook import OrderBook, BookManager
+
+SNAP = {"sequence": "10", "bids": [["99", "1"], ["98", "2"], ["97", "5"]], "asks": [["101", "1"], ["102", "2"], ["104", "5"]]}
+
+def diff(start, end, bids=(), asks=()):
+    return {"sequenceStart": start, "sequenceEnd": end, "changes": {"bids": list(bids), "asks": list(asks)}}
+
+def book():
+    return OrderBook("A-USDT").load(SNAP, 100)
+
+@pytest.mark.parametrize("side,impact", [("buy", 0.5), ("buy", 1.5), ("buy", 10), ("sell", 0.5), ("sell", 1.2)])
+def test_max_qty_vwap_sits_on_the_budget(side, impact):
+    b = book()
+    q = b.max_qty(side, impact)
+    assert b.slippage_pct(side, q) == pytest.approx(min(impact, b.slippage_pct(side, 8)), abs=1e-9)
+    assert b.slippage_pct(side, q*1.001) > impact or q == 8   # plus gros → budget dépassé (ou carnet entier)
+
+def test_max_qty_levels():
+    b = book()
+    assert b.max_qty("buy", 0) == 1   # meilleur niveau seul
+    # 1@101 + x@102: (101 + 102x)/(1 + x) = 101.505 → x = 0.505/0.495
+    assert b.max_qty("buy", 0.5) == pytest.approx(1 + 0.505/0.495)
+    assert b.max_qty("buy", 50) == 8 and OrderBook("B-USDT").max_qty("buy", 1) == 0.0
+
+def test_diffs_applied_and_stale_ignored():
+    b = book()
+    assert b.apply(diff(11, 12, bids=[["100", "3", "11"]], asks=[["101", "0", "12"]]), 100)
+    assert b.best("sell") == 100 and b.best("buy") == 102 and b.seq == 12
+    assert b.apply(diff(5, 9, asks=[["50", "1", "9"]]), 100) and b.best("buy") == 102   # déjà couvert par le snapshot
+
+def test_sequence_gap_triggers_resync():
+    class Ex:
+        calls = 0
+        def call(self, method, depth, symbol):
+            self.calls += 1
+            return dict(SNAP, sequence=str(20 + 4*(self.calls - 1)), asks=[["103", "1"]])
+    ex, bm = Ex(), BookManager(depth=100, ttl=60)
+    assert bm.book(ex, "A-USDT").seq == 20 and ex.calls == 1
+    bm.book(ex, "A-USDT"); assert ex.calls == 1   # snapshot encore frais
+    bm.on_diff("A-USDT", diff(25, 26, asks=[["103", "4", "26"]]))   # 21..24 perdus
+    b = bm.books["A-USDT"]
+    assert bm.resyncs == 1 and not b.synced and b.pending
+    bm.on_diff("A-USDT", diff(27, 27, asks=[["105", "1", "27"]]))   # mis de côté jusqu'au snapshot
+    b = bm.book(ex, "A-USDT")
+    assert ex.calls == 2 and b.synced and b.seq == 27   # diffs en attente rejoués sur le nouveau snapshot (seq 24)
+    assert b.ap == [103.0, 105.0] and b.az == [4.0, 1.0]
@@ -0,0 +1,63 @@
+# test_portfolio.py — conversion entre quotes, photo mark-to-market et plafonds rapportés à l'équité totale
+import pytest
+from config import CFG
+import portfolio
+from portfolio import rate, snapshot
+
+TICK = {"BTC-USDT": {"price": "40000"}, "ETH-BTC": {"price": "0.05"}, "USDT-EUR": {"price": "0.9"},
+        "SOL-USDT": {"price": "100"}, "DEAD-USDT": {"price": "0"}}
+
+class Quotes:
+    # exchange sans accounts(): seules les quotes et positions suivies sont valorisées
+    def __init__(self, bal): self.bal = bal
+    def all_tickers(self): return TICK
+    def balance(self, typ, ccy): return self.bal.get(ccy, 0.0) if typ == "trade" else 0.0
+
+class Ex(Quotes):
+    def accounts(self): return {"trade": [{"currency": c} for c in self.bal]}
+
+@pytest.fixture(autouse=True)
+def cfg(monkeypatch):
+    for k, v in dict(QUOTES=["USDT", "BTC"], PORTFOLIO_CCY="USDT", MAX_POS_ALLOCATION_PCT=50, MAX_EXPOSURE_PCT=100,
+                     MAX_QUOTE_EXPOSURE_PCT=100, MAX_RISK_PCT=0, PORTFOLIO_ATR_FALLBACK_PCT=3).items():
+        monkeypatch.setitem(CFG, k, v)
+
+@pytest.mark.parametrize("ccy,home,out", [
+    ("USDT", "USDT", 1.0), ("BTC", "USDT", 40000.0),   # paire directe
+    ("EUR", "USDT", 1/0.9), ("USDT", "BTC", 1/40000),   # inverse
+    ("ETH", "USDT", 0.05*40000),                        # via BTC
+    ("XRP", "USDT", 0.0), ("DEAD", "USDT", 0.0),        # introuvable / prix nul
+])
+def test_rate(ccy, home, out):
+    assert rate(TICK, ccy, home) == pytest.approx(out)
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_snapshot_values_all_holdings_in_home_ccy(monkeypatch, use_numpy):
+    if not use_numpy: monkeypatch.setattr(portfolio, "np", None)
+    ex = Ex({"USDT": 1000.0, "BTC": 0.05, "ETH": 2.0, "SOL": 5.0})
+    pf = snapshot(ex, {"ETH-BTC": {}}, {"ETH-BTC": 4.0})
+    assert pf.ccys == ["USDT", "BTC", "ETH", "SOL"]
+    assert pf.value("BTC") == pytest.approx(2000) and pf.value("ETH") == pytest.approx(4000) and pf.value("SOL") == 500
+    assert pf.equity == pytest.approx(7500) and pf.exposure == pytest.approx(4500)   # quotes hors exposition
+    assert pf.per_quote == pytest.approx([500, 4000])   # ETH rattaché à sa paire suivie ETH-BTC, SOL à USDT
+    assert pf.risk == pytest.approx(4000*0.04 + 500*0.03)   # ATR connu sinon repli
+    assert pf.stats()["exposure_pct"] == 60.0
+
+def test_allocation_cap_uses_total_equity_not_quote_balance():
+    # 100 USDT libres mais 10 000 d'équité: l'ancien calcul (valeur / solde de la quote) bloquait tout achat de SOL
+    pf = snapshot(Ex({"USDT": 100.0, "BTC": 0.245, "SOL": 1.0}), {}, {})
+    assert pf.equity == pytest.approx(10000)
+    room, why = pf.headroom("SOL-USDT", 2.0)
+    assert why == "allocation" and room == pytest.approx(5000 - 100)   # 50 % de l'équité − SOL déjà détenu
+    room, why = pf.headroom("ETH-BTC", 2.0)
+    assert room == pytest.approx(5000/40000)   # en quote du symbole (BTC)
+
+def test_caps_and_fill(monkeypatch):
+    monkeypatch.setitem(CFG, "MAX_EXPOSURE_PCT", 30); monkeypatch.setitem(CFG, "MAX_RISK_PCT", 1)
+    pf = snapshot(Quotes({"USDT": 10000.0}), {}, {})
+    assert pf.headroom("SOL-USDT", 2.0) == (pytest.approx(3000), "exposure")
+    assert pf.headroom("SOL-USDT", 5.0) == (pytest.approx(2000), "atr_risk")   # 1 % de 10 000 / 5 % d'ATR
+    pf.fill("SOL-USDT", "buy", 10, 100, atr_pct=5.0)
+    assert pf.value("SOL") == 1000 and pf.value("USDT") == 9000 and pf.equity == pytest.approx(10000)
+    assert pf.headroom("SOL-USDT", 5.0) == (pytest.approx(1000), "atr_risk")
+    assert pf.headroom("XRP-EUR", 1.0) == (0.0, "no_rate")
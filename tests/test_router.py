@@ -0,0 +1,54 @@
+# test_router.py — QuoteRouter: meilleur chemin de conversion sur un petit graphe, mémo et invalidation
+import math
+import pytest
+from config import CFG
+from router import QuoteRouter
+
+def tk(bid, ask): return {"bestBid": str(bid), "bestAsk": str(ask)}
+
+class Ex:
+    def __init__(self, tickers):
+        self.tickers = tickers; self.calls = 0
+    def symbols_map(self): return {s: {"symbol": s} for s in self.tickers}
+    def all_tickers(self):
+        self.calls += 1; return self.tickers
+
+@pytest.fixture(autouse=True)
+def cfg(monkeypatch):
+    monkeypatch.setitem(CFG, "TAKER_FEE_PCT", 0.1); monkeypatch.setitem(CFG, "ROUTE_TTL_SEC", 60)
+
+F = 1 - 0.001
+
+def test_direct_route():
+    ex = Ex({"BTC-USDT": tk(100, 101)})
+    r = QuoteRouter().best(ex, "USDT", "BTC", 202)
+    assert r["path"] == ["USDT", "BTC"] and r["legs"] == [("BTC-USDT", "buy", 101.0)]
+    assert r["rate"] == pytest.approx(F/101) and r["out"] == pytest.approx(202*F/101)
+    assert QuoteRouter().best(ex, "BTC", "USDT")["legs"] == [("BTC-USDT", "sell", 100.0)]
+
+def test_two_hop_beats_bad_direct_pair():
+    ex = Ex({"ETH-USDC": tk(1500, 1600),   # direct: carnet très large
+             "ETH-BTC": tk(0.05, 0.0501), "BTC-USDC": tk(40000, 40010)})
+    r = QuoteRouter().best(ex, "ETH", "USDC")
+    assert r["path"] == ["ETH", "BTC", "USDC"] and [l[0] for l in r["legs"]] == ["ETH-BTC", "BTC-USDC"]
+    assert r["rate"] == pytest.approx(0.05*40000*F*F)
+    assert QuoteRouter().best(ex, "ETH", "USDC", max_hops=1)["path"] == ["ETH", "USDC"]   # limité à 1 saut
+
+def test_no_path():
+    ex = Ex({"BTC-USDT": tk(100, 101), "DOGE-EUR": tk(1, 1.1)})
+    assert QuoteRouter().best(ex, "USDT", "EUR") is None
+    assert QuoteRouter().best(ex, "USDT", "XRP") is None
+    assert QuoteRouter().best(Ex({"BTC-USDT": tk(0, 0)}), "USDT", "BTC") is None   # carnet vide
+
+def test_memo_reused_then_invalidated_on_symbol_change():
+    ex = Ex({"BTC-USDT": tk(100, 101)}); q = QuoteRouter()
+    a = q.best(ex, "USDT", "BTC", 100); b = q.best(ex, "USDT", "BTC", 120)   # même tranche log2 du montant
+    assert ex.calls == 1 and q.stats["memo_hits"] == 1 and b["out"] == pytest.approx(a["out"]*1.2)
+    q.best(ex, "USDT", "BTC", 1000)
+    assert ex.calls == 2   # autre tranche de montant: recherche
+    ex.tickers["ETH-BTC"] = tk(0.05, 0.051)   # nouveau symbole → graphe mis à jour, mémo vidé
+    r = q.best(ex, "USDT", "ETH", 100)
+    assert q.stats["rebuilds"] == 2 and len(q.memo) == 1 and r["path"] == ["USDT", "BTC", "ETH"]
+    del ex.tickers["ETH-BTC"]
+    assert q.best(ex, "USDT", "ETH", 100) is None and "ETH" not in q.adj["BTC"]
+    assert math.isclose(q.best(ex, "USDT", "BTC", 100)["rate"], F/101)
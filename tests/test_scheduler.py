@@ -0,0 +1,47 @@
+# test_scheduler.py — TokenBucket: ordre de priorité, réserve priorité 0, blocage après 429 / 429000
+import threading, time
+from conftest import wait_for
+import exchange
+from exchange import TokenBucket
+
+def test_waiters_served_by_priority_then_fifo():
+    b = TokenBucket("t", 10, window=1.0)   # 10 jetons/s
+    b.acquire(10, 0); b.penalize(0)   # seau vide et bloqué ~1 s: tout le monde fait la queue
+    order = []
+    def go(tag, prio): b.acquire(1, prio); order.append(tag)
+    threads = []
+    for tag, prio in (("scan1", 2), ("balance", 1), ("scan2", 2), ("exit", 0)):
+        threads.append(threading.Thread(target=go, args=(tag, prio))); threads[-1].start()
+        assert wait_for(lambda: len(b.queue) == len(threads))
+    for t in threads: t.join(5)
+    assert order == ["exit", "balance", "scan1", "scan2"] and b.stats()["waits"] == 4
+
+def test_reserve_floor_kept_for_priority_zero():
+    b = TokenBucket("t", 10, window=1.0, reserve=0.1)   # plancher 1 jeton
+    b.sync(1.5, 1.0)   # serveur: 1.5 jetons restants (pas encore sous la moitié du plancher)
+    t0 = time.monotonic(); b.acquire(1, 0); urgent = time.monotonic() - t0
+    t0 = time.monotonic(); b.acquire(1, 2); scan = time.monotonic() - t0
+    assert urgent < 0.02   # ordre/sortie: puise dans la réserve
+    assert scan >= 0.1     # scan: attend 1 + plancher (≈0.15 s à 10 jetons/s)
+
+def test_penalize_blocks_until_reset():
+    b = TokenBucket("t", 1000, window=1.0)
+    b.penalize(0.3)   # au moins 1 s
+    t0 = time.monotonic(); b.acquire(1, 0)
+    assert time.monotonic() - t0 >= 0.9 and b.stats()["429"] == 1
+
+class Resp:
+    def __init__(self, status, text, headers): self.status_code = status; self.text = text; self.headers = headers
+
+def test_429000_body_and_headers_feed_the_bucket():
+    class Client:
+        def check_response_data(self, resp): return resp.text
+    k = exchange.Ku.__new__(exchange.Ku)
+    b = TokenBucket("spot", 100); c = Client()
+    k._watch_headers(c, b)
+    c.check_response_data(Resp(200, '{"data":1}', {"gw-ratelimit-remaining": "40", "gw-ratelimit-reset": "5000"}))
+    assert b.tokens <= 40 and b.limited == 0 and b.blocked_until < time.monotonic()
+    c.check_response_data(Resp(200, '{"code":"429000","msg":"Too Many Requests"}', {"gw-ratelimit-reset": "2000"}))
+    assert b.limited == 1 and b.tokens == 0 and b.blocked_until >= time.monotonic() + 1.5
+    c.check_response_data(Resp(200, '{"data":1}', {"gw-ratelimit-remaining": "2", "gw-ratelimit-reset": "3000"}))
+    assert b.blocked_until >= time.monotonic() + 1.5   # presque à sec (< plancher/2) → attente du reset
@@ -0,0 +1,44 @@
+# test_state_store.py — journal + snapshot: rejeu après crash (ligne tronquée, compaction interrompue)
+import os, json
+import pytest
+import state_store
+from state_store import StateStore
+
+def fill(folder):
+    st = StateStore(folder, compact_every=1000); st.load()
+    st.append("open", symbol="BTC-USDT", entry=100.0, size=0.5)
+    st.append("open", symbol="ETH-USDT", entry=10.0, size=2.0)
+    st.append("close", symbol="ETH-USDT")
+    st.append("cooldown", symbol="ETH-USDT", until=4e9)
+    return st
+
+def test_replay_after_torn_last_line(tmp_path):
+    fill(str(tmp_path))
+    with open(tmp_path/"journal.jsonl", "a") as f:
+        f.write('{"op": "open", "symbol": "SOL-US')   # crash au milieu d'une écriture
+    state, replayed = StateStore(str(tmp_path)).load()
+    assert replayed == 4
+    assert state["positions"] == {"BTC-USDT": {"entry": 100.0, "size": 0.5}} and state["cooldown"] == {"ETH-USDT": 4e9}
+    assert os.path.getsize(tmp_path/"journal.jsonl") == 0   # recompacté au boot
+
+def test_compaction_interrupted_between_rename_and_truncate(tmp_path, monkeypatch):
+    st = fill(str(tmp_path))
+    def crash(): raise KeyboardInterrupt("crash")
+    monkeypatch.setattr(st, "_fsync_dir", crash)   # snapshot renommé, journal pas encore tronqué
+    with pytest.raises(KeyboardInterrupt): st.compact()
+    assert json.load(open(tmp_path/"snapshot.json"))["positions"] and os.path.getsize(tmp_path/"journal.jsonl") > 0
+    state, replayed = StateStore(str(tmp_path)).load()   # nouveau snapshot + ancien journal rejoué: même état
+    assert replayed == 4
+    assert state["positions"] == {"BTC-USDT": {"entry": 100.0, "size": 0.5}} and state["cooldown"] == {"ETH-USDT": 4e9}
+
+def test_dir_fsync_before_journal_truncation(tmp_path, monkeypatch):
+    st = fill(str(tmp_path)); calls = []
+    real_replace, real_open = os.replace, open
+    monkeypatch.setattr(state_store.os, "replace", lambda a, b: (calls.append("rename"), real_replace(a, b)))
+    monkeypatch.setattr(st, "_fsync_dir", lambda: calls.append("dir_fsync"))
+    def spy_open(path, mode="r", *a, **k):
+        if path == st.journal_path and mode == "w": calls.append("truncate")
+        return real_open(path, mode, *a, **k)
+    monkeypatch.setattr(state_store, "open", spy_open, raising=False)
+    st.compact()
+    assert calls == ["rename", "dir_fsync", "truncate"]